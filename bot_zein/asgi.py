@@ -5,6 +5,9 @@ It exposes the ASGI callable as a module-level variable named ``application``.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
+
+Асинхронные эндпоинты викторины (/async/quiz/...) имеют смысл только здесь:
+uvicorn bot_zein.asgi:application --workers N.
 """
 
 import os
@@ -12,5 +15,7 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'bot_zein.settings')
+# settings по нему выбирают CONN_MAX_AGE для ASGI
+os.environ.setdefault('DJANGO_ASGI', '1')
 
 application = get_asgi_application()
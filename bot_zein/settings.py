@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+import os
 from pathlib import Path
 from datetime import timedelta
 
@@ -47,10 +48,14 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'zein_app.metrics.MetricsMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    # Ниже AuthenticationMiddleware: заголовок X-Profile проверяется по request.user (сессия админки)
+    'zein_app.profiling.ProfilingMiddleware',
+    'zein_app.db_router.ReplicaPinMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
     'corsheaders.middleware.CorsMiddleware',
@@ -69,7 +74,7 @@ TELEGRAM_ADMIN_CHAT_ID = 'adminchatidsi'
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'zein_app.authentication.StatelessJWTAuthentication',
     ),
     'DEFAULT_FILTER_BACKENDS': [
         'django_filters.rest_framework.DjangoFilterBackend',
@@ -77,7 +82,14 @@ REST_FRAMEWORK = {
     ],
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.AllowAny',
-    ]
+    ],
+    # Token bucket для входа и регистрации (zein_app.throttling): <throttle_scope>_ip / _username
+    'DEFAULT_THROTTLE_RATES': {
+        'login_ip': '30/min',
+        'login_username': '5/min',
+        'register_ip': '10/hour',
+        'register_username': '5/hour',
+    },
 }
 
 
@@ -106,13 +118,56 @@ WSGI_APPLICATION = 'bot_zein.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 #
+# Веб-процессы и run_bot пишут в один файл SQLite. WAL: читатели не ждут
+# писателя; BEGIN IMMEDIATE: писатель берёт блокировку в начале транзакции и
+# ждёт в очереди до SQLITE_BUSY_TIMEOUT секунд, а не падает с "database is
+# locked" при попытке повысить блокировку посреди транзакции.
+#
+# journal_mode=WAL хранится в файле базы, поэтому его включает один раз
+# миграция zein_app 0010_sqlite_wal (manage.py migrate), а не init_command:
+# иначе каждое соединение, включая manage.py test, переписывало бы db.sqlite3.
+# Здесь только настройки, которые действуют в пределах соединения.
+SQLITE_BUSY_TIMEOUT = float(os.environ.get('SQLITE_BUSY_TIMEOUT', 20))
+SQLITE_MMAP_SIZE = int(os.environ.get('SQLITE_MMAP_SIZE', 256 * 1024 * 1024))
+SQLITE_CACHE_SIZE = int(os.environ.get('SQLITE_CACHE_SIZE', -64 * 1024))  # < 0 — в КиБ
+SQLITE_PRAGMAS = {
+    'synchronous': 'NORMAL',
+    'mmap_size': SQLITE_MMAP_SIZE,
+    'cache_size': SQLITE_CACHE_SIZE,
+    'temp_store': 'MEMORY',
+}
+
+# Под ASGI (bot_zein/asgi.py выставляет DJANGO_ASGI) синхронный код каждого
+# запроса идёт в своём потоке, постоянные соединения не переиспользуются и
+# только копятся, поэтому по умолчанию там CONN_MAX_AGE = 0.
+CONN_MAX_AGE = int(os.environ.get('CONN_MAX_AGE', 0 if os.environ.get('DJANGO_ASGI') else 600))
+
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        'CONN_MAX_AGE': CONN_MAX_AGE,
+        'CONN_HEALTH_CHECKS': True,
+        'OPTIONS': {
+            'timeout': SQLITE_BUSY_TIMEOUT,
+            'transaction_mode': 'IMMEDIATE',
+            'init_command': ';'.join(f'PRAGMA {name}={value}' for name, value in SQLITE_PRAGMAS.items()),
+        },
     }
 }
 
+# Реплика для чтения каталога и истории (zein_app.db_router). Локально — копия
+# db.sqlite3, которую обновляет `manage.py refresh_replica --interval 2`.
+if os.environ.get('REPLICA_DATABASE_NAME'):
+    DATABASES['replica'] = {
+        **DATABASES['default'],
+        'NAME': os.environ['REPLICA_DATABASE_NAME'],
+        'TEST': {'MIRROR': 'default'},
+    }
+DATABASE_ROUTERS = ['zein_app.db_router.ReplicaRouter']
+# Насколько реплика может отставать: столько же после записи пользователь читает с default
+REPLICA_LAG_SECONDS = float(os.environ.get('REPLICA_LAG_SECONDS', 5))
+
 
 
 
@@ -135,6 +190,46 @@ AUTH_USER_MODEL = 'zein_app.CustomUser'
 
 
 
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    # Общий для всех процессов (веб-воркеры и run_bot) кэш на диске
+    'shared': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': BASE_DIR / 'cache',
+    },
+}
+
+CATALOG_CACHE_ALIAS = 'shared'
+CATALOG_CACHE_MAX_ENTRIES = 512
+
+# Аутентификация по claims JWT (zein_app.authentication): сколько секунд живёт
+# строка пользователя в памяти процесса и версия токенов в общем кэше
+AUTH_USER_CACHE_TTL = 30
+AUTH_USER_CACHE_SIZE = 1024
+AUTH_TOKEN_VERSION_TIMEOUT = 300
+
+# Имя пользователя после стольких неудачных входов подряд отклоняется без
+# проверки пароля, пока не пройдёт AUTH_FAILED_LOGIN_TIMEOUT секунд
+AUTH_FAILED_LOGIN_LIMIT = 10
+AUTH_FAILED_LOGIN_TIMEOUT = 15 * 60
+
+# Профилирование запросов (zein_app.profiling): доля случайных запросов и
+# заголовок, по которому сотрудник может запросить профиль конкретного запроса
+PROFILING_SAMPLE_RATE = float(os.environ.get('PROFILING_SAMPLE_RATE', 0))
+PROFILING_HEADER = 'X-Profile'
+PROFILING_DIR = BASE_DIR / 'profiles'
+
+# Метрики Prometheus (zein_app.metrics): файлы процессов, которые складывает /metrics
+METRICS_DIR = os.environ.get('METRICS_DIR', BASE_DIR / 'metrics')
+METRICS_FLUSH_INTERVAL = 1.0
+METRICS_ALLOWED_IPS = ('127.0.0.1', '::1')
+# manage.py test пишет метрики во временный каталог, а не в METRICS_DIR
+TEST_RUNNER = 'zein_app.test_runner.TestRunner'
+
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
 
@@ -216,7 +311,7 @@ SIMPLE_JWT = {
     # "SLIDING_TOKEN_LIFETIME": timedelta(minutes=5),
     # "SLIDING_TOKEN_REFRESH_LIFETIME": timedelta(days=1),
 
-    "TOKEN_OBTAIN_SERIALIZER": "rest_framework_simplejwt.serializers.TokenObtainPairSerializer",
+    "TOKEN_OBTAIN_SERIALIZER": "zein_app.authentication.TokenObtainPairSerializer",
     "TOKEN_REFRESH_SERIALIZER": "rest_framework_simplejwt.serializers.TokenRefreshSerializer",
     "TOKEN_VERIFY_SERIALIZER": "rest_framework_simplejwt.serializers.TokenVerifySerializer",
     "TOKEN_BLACKLIST_SERIALIZER": "rest_framework_simplejwt.serializers.TokenBlacklistSerializer",
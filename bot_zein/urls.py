@@ -28,8 +28,8 @@ from django.urls import path, include
 from django.conf import settings
 from django.conf.urls.static import static
 
-from rest_framework_simplejwt.views import TokenObtainPairView
-from zein_app.views import RegisterView, LoginView, DashboardView
+from zein_app.views import RegisterView, LoginView, DashboardView, RevokeTokensView, TokenObtainPairView
+from zein_app.metrics import metrics_view
 
 
 
@@ -53,10 +53,12 @@ urlpatterns = [
     path('admin/', admin.site.urls),
     path('api/auth/register/', RegisterView.as_view(),name='auth_register'),
     path('api/auth/login/', LoginView.as_view(),name='auth_login'),
+    path('api/auth/revoke/', RevokeTokensView.as_view(), name='auth_revoke'),
 
     path('api/token/', TokenObtainPairView.as_view(), name='token_obtain_pair'),
     # path('api/token/refresh/', TokenRefreshView.as_view(), name='token_refresh'),
     path('api/dashboard/', DashboardView.as_view(), name='dashboard'),
+    path('metrics', metrics_view, name='metrics'),
 
 
 
@@ -14,3 +14,8 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'bot_zein.settings')
 
 application = get_wsgi_application()
+
+# Список BadPassword читается в память процесса при старте, а не на первой регистрации
+from zein_app.bad_passwords import bad_password_filter  # noqa: E402
+
+bad_password_filter.warm_up()
@@ -1,8 +1,12 @@
+import functools
 import logging
 from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.contrib.sites import requests
+from django.db.models import Prefetch
 
+from zein_app.catalog_cache import catalog_cache
+from zein_app.db_router import replica_reads
 from zein_app.models import Subject, Topic, Quiz, Question, UserAnswer, CustomUser, Choice
 
 logger = logging.getLogger(__name__)
@@ -10,33 +14,33 @@ logger = logging.getLogger(__name__)
 
 class APIService:
     @staticmethod
+    @replica_reads()
     def get_subjects(language_code='ru'):
         try:
-            subjects = Subject.objects.all()
-            return [
+            return catalog_cache.get_or_set(('bot', 'subjects'), lambda: [
                 {
                     'id': subject.id,
                     'title': subject.name,
                     'description': subject.description
                 }
-                for subject in subjects
-            ]
+                for subject in Subject.objects.all()
+            ])
         except Exception as e:
             logger.error(f"Ошибка при получении предметов: {e}")
             return []
 
     @staticmethod
+    @replica_reads()
     def get_topics(subject_id, language_code='ru'):
         try:
-            topics = Topic.objects.filter(subject_id=subject_id)
-            return [
+            return catalog_cache.get_or_set(('bot', 'topics', subject_id), lambda: [
                 {
                     'id': topic.id,
                     'title': topic.name,
                     'description': topic.description
                 }
-                for topic in topics
-            ]
+                for topic in Topic.objects.filter(subject_id=subject_id)
+            ])
         except Exception as e:
             logger.error(f"Ошибка при получении тем для предмета {subject_id}: {e}")
             return []
@@ -54,6 +58,12 @@ class APIService:
             logger.error(f"Тема с id={topic_id} не найдена")
             return None
 
+        # Список вопросов читается только при создании викторины, и один раз:
+        # total_questions — его длина, а не счётчик темы, который может отставать
+        @functools.cache
+        def question_ids():
+            return list(Quiz.questions_for_topic(topic.id))
+
         quiz, created = Quiz.objects.get_or_create(
             user=user,
             topic=topic,
@@ -61,7 +71,8 @@ class APIService:
                 # 'status': Quiz.Status.IN_PROGRESS,
                 # 'total_questions': Question.objects.filter(topic=topic).count()
                 'status': 'in_progress',
-                'total_questions': Question.objects.filter(topic=topic).count()
+                'total_questions': lambda: len(question_ids()),
+                'question_ids': question_ids
             }
         )
 
@@ -72,18 +83,19 @@ class APIService:
         return quiz
 
     @staticmethod
+    @replica_reads()
     def get_quizzes(topic_id, language_code='ru'):
         try:
-            quizzes = Quiz.objects.filter(topic_id=topic_id, language_code='ru')
+            # Название и число вопросов берём из темы тем же запросом, без чтения по каждой викторине
+            quizzes = Quiz.objects.filter(topic_id=topic_id).order_by('id').values(
+                'id', 'topic__name', 'topic__description', 'topic__question_count'
+            )
             return [
                 {
-                    'id': quiz.id,
-                    # 'title': getattr(quiz, 'title', ''),
-                    # 'description': getattr(quiz, 'description', ''),
-                    'title': quiz.topic.name,
-                    'description': quiz.topic.description,
-                    # 'questions_count': quiz.questions.count()
-                    'questions_count': Question.objects.filter(topic=quiz.topic).count()
+                    'id': quiz['id'],
+                    'title': quiz['topic__name'],
+                    'description': quiz['topic__description'],
+                    'questions_count': quiz['topic__question_count']
                 }
                 for quiz in quizzes
             ]
@@ -91,41 +103,48 @@ class APIService:
             logger.error(f"Ошибка при получении тестов для темы {topic_id}: {e}")
             return []
 
-
     @staticmethod
-    def get_quiz_with_questions(quiz_id, language_code='ru'):
-        try:
-            quiz = Quiz.objects.get(id=quiz_id)
-            # questions = Question.objects.filter(topic=quiz.topic)
-            questions = Question.objects.filter(topic=quiz.topic)
-
-            quiz_data = {
-                'id': quiz.id,
-                # 'title': quiz.name,
-                # 'description': quiz.description,
-                'title': quiz.topic.name,
-                'description': quiz.topic.description,
-                'questions': []
-            }
-
-            for question in questions:
-                # answers = UserAnswer.objects.filter(question=question)
-                choices = Choice.objects.filter(question=question)
-                question_data = {
+    @replica_reads()
+    def get_topic_questions(topic_id):
+        """
+        Вопросы темы с вариантами ответа для бота. Два запроса (вопросы и
+        prefetch вариантов) независимо от числа вопросов; результат хранится в
+        catalog_cache до изменения каталога. Список общий для всех вызовов —
+        менять его нельзя.
+        """
+        def build():
+            questions = Question.objects.filter(topic_id=topic_id).order_by('created_at', 'id').prefetch_related(
+                Prefetch('choices', queryset=Choice.objects.order_by('id'))
+            )
+            return [
+                {
                     'id': question.id,
                     'text': question.text,
                     'answers': [
                         {
-                        'id': choice.id,
-                        'text': choice.text,
-                        'is_correct': choice.is_correct
+                            'id': choice.id,
+                            'text': choice.text,
+                            'is_correct': choice.is_correct
                         }
-                        for choice in choices
-                        ]
+                        for choice in question.choices.all()
+                    ]
                 }
-                quiz_data['questions'].append(question_data)
+                for question in questions
+            ]
+
+        return catalog_cache.get_or_set(('bot', 'topic-questions', topic_id), build)
 
-            return quiz_data
+    @staticmethod
+    def get_quiz_with_questions(quiz_id, language_code='ru'):
+        try:
+            # Викторину бот обычно создал только что — её читаем с основной базы, вопросы — с реплики
+            quiz = Quiz.objects.select_related('topic').get(id=quiz_id)
+            return {
+                'id': quiz.id,
+                'title': quiz.topic.name,
+                'description': quiz.topic.description,
+                'questions': APIService.get_topic_questions(quiz.topic_id)
+            }
         except Quiz.DoesNotExist:
             logger.warning(f"Викторина с ID {quiz_id} не найдена")
             return None
@@ -8,6 +8,7 @@ from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup, ReplyKe
 from telegram.ext import Application, CommandHandler, CallbackQueryHandler, MessageHandler, filters, ContextTypes, \
     ConversationHandler
 
+from zein_app.metrics import observe_handler
 from ..models import TelegramUser
 from .api_service import APIService
 
@@ -93,6 +94,7 @@ class BotService:
         self.application.add_handler(conv_handler)
         self.application.run_polling()
 
+    @observe_handler
     async def restart_subjects_handler(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
         try:
             query = update.callback_query
@@ -124,6 +126,7 @@ class BotService:
             await update.callback_query.message.reply_text("Произошла ошибка. Пожалуйста, попробуйте позже.")
             return ConversationHandler.END
 
+    @observe_handler
     async def next_question_handler(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
         try:
             query = update.callback_query
@@ -182,6 +185,7 @@ class BotService:
         telegram_user.user = CustomUser.objects.get(id=user_id)
         telegram_user.save()
 
+    @observe_handler
     async def start_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
         user = update.effective_user
 
@@ -219,6 +223,7 @@ class BotService:
             await update.message.reply_text("Произошла ошибка при запуске. Пожалуйста, попробуйте позже.")
             return ConversationHandler.END
 
+    @observe_handler
     async def language_handler(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
         try:
             query = update.callback_query
@@ -248,6 +253,7 @@ class BotService:
             await update.callback_query.message.reply_text("Произошла ошибка. Пожалуйста, попробуйте позже.")
             return ConversationHandler.END
 
+    @observe_handler
     async def phone_handler(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
         try:
             contact = update.message.contact
@@ -266,6 +272,7 @@ class BotService:
             await update.message.reply_text("Произошла ошибка. Пожалуйста, попробуйте позже.")
             return ConversationHandler.END
 
+    @observe_handler
     async def name_handler(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
         try:
             full_name = update.message.text
@@ -312,6 +319,7 @@ class BotService:
             await update.message.reply_text("Произошла ошибка. Пожалуйста, попробуйте позже.")
             return ConversationHandler.END
 
+    @observe_handler
     async def subject_handler(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
         try:
             query = update.callback_query
@@ -348,6 +356,7 @@ class BotService:
 
 
 
+    @observe_handler
     async def show_question(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
        try:
         quiz_data = context.user_data["quiz_data"]
@@ -421,6 +430,7 @@ class BotService:
 
 
 
+    @observe_handler
     async def topic_handler(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
         try:
             query = update.callback_query
@@ -472,6 +482,7 @@ class BotService:
 
 
 
+    @observe_handler
     async def quiz_handler(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
         try:
             query = update.callback_query
@@ -504,6 +515,7 @@ class BotService:
             await update.callback_query.message.reply_text("Произошла ошибка. Пожалуйста, попробуйте позже.")
             return ConversationHandler.END
 
+    @observe_handler
     async def restart_quiz_handler(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
         try:
             query = update.callback_query
@@ -539,6 +551,7 @@ class BotService:
 
 
 
+    @observe_handler
     async def poll_answer_handler(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
         try:
             pa: PollAnswer = update.poll_answer
@@ -648,12 +661,14 @@ class BotService:
 
 
     #
+    @observe_handler
     async def cancel_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
         await update.message.reply_text("Операция отменена.")
         return ConversationHandler.END
 
 
 
+@observe_handler
 async def show_quiz_results(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     try:
         quiz_data = context.user_data.get("quiz_data")
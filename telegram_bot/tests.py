@@ -1,3 +1,108 @@
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
 
-# Create your tests here.
+from zein_app.catalog_cache import catalog_cache
+from zein_app.models import CustomUser, Subject, Topic, Question, Choice, Quiz
+from telegram_bot.services.api_service import APIService
+
+
+class APIServiceQueryBudgetTests(TestCase):
+    """
+    Бюджет SQL-запросов для методов APIService, которые вызывает бот.
+
+    Как и для HTTP-маршрутов (zein_app.tests.QueryBudgetTests), число запросов
+    не должно расти при переходе от SMALL к LARGE строк.
+    """
+    SMALL = 10
+    LARGE = 10_000
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.other = CustomUser.objects.create_user(username='other', password='Secret_123')
+        cls.subject = Subject.objects.create(name='Математика', title_ru='Математика')
+        cls.topic = Topic.objects.create(subject=cls.subject, name='Дроби')
+
+    def setUp(self):
+        self.rows = 0
+
+    def grow(self, count):
+        new = range(self.rows, count)
+        self.rows = count
+        Topic.objects.bulk_create([Topic(subject=self.subject, name=f'Тема {i}') for i in new])
+        questions = Question.objects.bulk_create([Question(topic=self.topic, text=f'Вопрос {i}') for i in new])
+        Choice.objects.bulk_create([
+            Choice(question=question, text=text, is_correct=is_correct)
+            for question in questions
+            for text, is_correct in (('Верно', True), ('Неверно', False))
+        ])
+        Quiz.objects.bulk_create([Quiz(user=self.other, topic=self.topic) for _ in new])
+
+    def methods(self, suffix):
+        """(метод, вызов, бюджет запросов)."""
+        quiz_id = Quiz.objects.filter(user=self.other).values_list('id', flat=True).first()
+        player = CustomUser.objects.create(username=f'player{suffix}')
+        return [
+            ('get_subjects', lambda: APIService.get_subjects(), 1),
+            ('get_topics', lambda: APIService.get_topics(self.subject.id), 1),
+            # Новая викторина: пользователь, тема, поиск, id вопросов, INSERT + SAVEPOINT/RELEASE
+            ('get_or_create_quiz', lambda: APIService.get_or_create_quiz(player.id, self.topic.id), 7),
+            ('get_quizzes', lambda: APIService.get_quizzes(self.topic.id), 1),
+            ('register_user', lambda: APIService.register_user(f'+998{suffix}', 'Иван Петров'), 4),
+            ('save_quiz_results', lambda: APIService.save_quiz_results(quiz_id, {}, 0, 0), 2),
+        ]
+
+    def count_queries(self, call):
+        catalog_cache.clear()
+        with CaptureQueriesContext(connection) as queries:
+            call()
+        return len(queries)
+
+    def run_methods(self, suffix):
+        counts = {}
+        for name, call, budget in self.methods(suffix):
+            counts[name] = self.count_queries(call)
+            self.assertLessEqual(counts[name], budget, name)
+        return counts
+
+    def test_query_counts_do_not_grow_with_data(self):
+        self.grow(self.SMALL)
+        small = self.run_methods('1')
+        self.grow(self.LARGE)
+        large = self.run_methods('2')
+        self.assertEqual(small, large)
+
+    def test_get_quiz_with_questions_query_count(self):
+        quiz = Quiz.objects.create(user=self.other, topic=self.topic)
+        self.grow(self.SMALL)
+        small = self.count_queries(lambda: APIService.get_quiz_with_questions(quiz.id))
+        self.grow(self.LARGE)
+        large = self.count_queries(lambda: APIService.get_quiz_with_questions(quiz.id))
+        # Викторина с темой, вопросы, prefetch вариантов
+        self.assertEqual((small, large), (3, 3))
+
+        # Повторный старт: вопросы темы уже в catalog_cache
+        with CaptureQueriesContext(connection) as queries:
+            data = APIService.get_quiz_with_questions(quiz.id)
+        self.assertEqual(len(queries), 1)
+        self.assertEqual(len(data['questions']), self.LARGE)
+        self.assertEqual(
+            [(answer['text'], answer['is_correct']) for answer in data['questions'][0]['answers']],
+            [('Верно', True), ('Неверно', False)]
+        )
+
+    def test_get_quizzes_lists_quizzes_of_topic(self):
+        self.grow(self.SMALL)
+        quizzes = APIService.get_quizzes(self.topic.id)
+        self.assertEqual(len(quizzes), self.SMALL)
+        self.assertEqual(quizzes[0]['title'], 'Дроби')
+        self.assertEqual(quizzes[0]['questions_count'], self.topic.question_count)
+
+    def test_new_quiz_counts_its_own_questions(self):
+        # bulk_create не вызывает сигналы: счётчик вопросов темы отстаёт
+        self.grow(self.SMALL)
+        self.assertEqual(Topic.objects.get(id=self.topic.id).question_count, 0)
+        player = CustomUser.objects.create(username='player')
+        quiz = APIService.get_or_create_quiz(player.id, self.topic.id)
+        self.assertEqual(quiz.total_questions, len(quiz.question_ids))
+        self.assertEqual(quiz.total_questions, self.SMALL)
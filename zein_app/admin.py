@@ -81,20 +81,41 @@
 
 
 from django.contrib import admin
+from django.contrib.admin.views.main import SEARCH_VAR
 from .models import Subject, Topic, Question, Choice, Quiz, UserAnswer
+from .search import search_questions, search_topics
+
+
+class FullTextSearchMixin:
+    """Поиск в админке через FTS5-индекс вместо LIKE '%...%' по search_fields."""
+    search_function = None
+
+    def get_search_results(self, request, queryset, search_term):
+        if not search_term.strip():
+            return queryset, False
+        return self.search_function(queryset, search_term), False
+
+    def get_ordering(self, request):
+        # Без явной сортировки показываем самые релевантные совпадения первыми
+        if request.GET.get(SEARCH_VAR, '').strip():
+            return ['search_index__rank']
+        return super().get_ordering(request)
 
 
 class ChoiceInline(admin.TabularInline):
     model = Choice
     extra = 4
     min_num = 2
+    ordering = ('id',)
 
 
 @admin.register(Question)
-class QuestionAdmin(admin.ModelAdmin):
+class QuestionAdmin(FullTextSearchMixin, admin.ModelAdmin):
     list_display = ('text', 'topic', 'get_subject')
     list_filter = ('topic__subject', 'topic')
     search_fields = ('text', 'topic__name', 'topic__subject__name')
+    search_function = staticmethod(search_questions)
+    ordering = ('topic_id', 'created_at')
     inlines = [ChoiceInline]
 
     def get_subject(self, obj):
@@ -105,13 +126,14 @@ class QuestionAdmin(admin.ModelAdmin):
 
 
 @admin.register(Topic)
-class TopicAdmin(admin.ModelAdmin):
+class TopicAdmin(FullTextSearchMixin, admin.ModelAdmin):
     list_display = ('name', 'subject', 'get_question_count')
     list_filter = ('subject',)
     search_fields = ('name', 'subject__name')
+    search_function = staticmethod(search_topics)
 
     def get_question_count(self, obj):
-        return obj.questions.count()
+        return obj.question_count
     get_question_count.short_description = 'Кол‑во вопросов'
 
 
@@ -121,7 +143,7 @@ class SubjectAdmin(admin.ModelAdmin):
     search_fields = ('name',)
 
     def get_topic_count(self, obj):
-        return obj.topics.count()
+        return obj.topic_count
     get_topic_count.short_description = 'Кол‑во тем'
 
 
@@ -130,6 +152,7 @@ class UserAnswerInline(admin.TabularInline):
     extra = 0
     readonly_fields = ('question', 'selected_choice', 'is_correct', 'answered_at')
     can_delete = False
+    ordering = ('id',)
 
 
 @admin.register(Quiz)
@@ -141,6 +164,7 @@ class QuizAdmin(admin.ModelAdmin):
     )
     list_filter = ('status', 'topic__subject', 'topic')
     search_fields = ('user__username', 'topic__name', 'topic__subject__name')
+    ordering = ('-started_at',)
     readonly_fields = (
         'user', 'topic', 'status', 'score',
         'total_questions', 'started_at', 'completed_at'
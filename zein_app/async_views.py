@@ -0,0 +1,221 @@
+"""
+Асинхронные эндпоинты викторины (/async/quiz/...) для запуска под ASGI:
+uvicorn bot_zein.asgi:application, daphne и т.п.
+
+Формат запросов и ответов тот же, что у QuizAPIView, но без DRF — APIView
+синхронный. Данные читаются async-ORM (aget, acreate, asave, async for),
+ответ собирается из строк values() функциями fast_serializers, так что при
+сериализации нет обращений к базе. Проверка ответа, запрос вариантов и
+выражения UPDATE общие с QuizAPIView — из quiz_flow. transaction.atomic в async-коде
+недоступен, поэтому запись ответа (INSERT + UPDATE) идёт одной транзакцией
+через sync_to_async.
+
+Пользователь определяется только по JWT (Authorization: Bearer), как и в
+остальном API, и для токенов с claims не читается из базы. Под WSGI эти
+view тоже работают, но каждый запрос тогда проходит через async_to_sync и
+выигрыша нет.
+"""
+import functools
+import json
+
+from asgiref.sync import sync_to_async
+from django.db import IntegrityError, transaction
+from django.db.models import Prefetch
+from django.http import Http404, HttpResponse
+from django.shortcuts import aget_object_or_404
+from django.utils import timezone
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_http_methods
+from rest_framework import status
+from rest_framework.exceptions import APIException, NotAuthenticated, NotFound, ParseError
+from rest_framework.renderers import JSONRenderer
+
+from .authentication import StatelessJWTAuthentication
+from .db_router import replica_reads
+from .fast_serializers import question_choice_rows, question_payload, quiz_result_payload
+from .models import Quiz, UserAnswer
+from .quiz_flow import (
+    ALREADY_ANSWERED, answer_choices, answer_error, answer_updates, apply_answer, drop_current_question, pick_choice
+)
+from .serializers import QuizCreateSerializer, QuizAnswerSerializer, QuizDetailSerializer
+
+_renderer = JSONRenderer()
+
+
+def json_response(data, status=status.HTTP_200_OK):
+    return HttpResponse(_renderer.render(data), status=status, content_type='application/json')
+
+
+async def authenticate(request):
+    """Пользователь по JWT, как StatelessJWTAuthentication, но с async-обращениями к кэшу и базе."""
+    authentication = StatelessJWTAuthentication()
+    header = authentication.get_header(request)
+    raw_token = authentication.get_raw_token(header) if header is not None else None
+    if raw_token is None:
+        raise NotAuthenticated
+    return await authentication.aget_user(authentication.get_validated_token(raw_token))
+
+
+def parse_json(request):
+    if not request.body:
+        return {}
+    try:
+        return json.loads(request.body)
+    except ValueError as error:
+        raise ParseError(f'JSON parse error - {error}')
+
+
+def async_api_view(*methods):
+    """Аутентификация и ошибки в формате DRF (401/404/400 с {"detail": ...}) для async-view."""
+
+    def decorator(view):
+        @csrf_exempt
+        @require_http_methods(methods)
+        @functools.wraps(view)
+        async def wrapper(request, *args, **kwargs):
+            try:
+                request.user = await authenticate(request)
+                return await view(request, *args, **kwargs)
+            except Http404 as error:
+                return json_response({'detail': str(error) or NotFound.default_detail}, status.HTTP_404_NOT_FOUND)
+            except APIException as error:
+                detail = error.detail if isinstance(error.detail, (dict, list)) else {'detail': error.detail}
+                return json_response(detail, error.status_code)
+
+        return wrapper
+
+    return decorator
+
+
+async def current_question(quiz):
+    while quiz.current_question_id is not None:
+        rows = [row async for row in question_choice_rows(question_id=quiz.current_question_id)]
+        if rows:
+            return question_payload(rows)
+        await quiz.asave(update_fields=drop_current_question(quiz))
+    return None
+
+
+async def complete(quiz):
+    quiz.status = 'completed'
+    quiz.completed_at = timezone.now()
+    await quiz.asave(update_fields=['status', 'completed_at'])
+
+
+@sync_to_async
+def save_answer(quiz, question_id, choice_id, is_correct, updates):
+    with transaction.atomic():
+        UserAnswer.objects.create(
+            quiz=quiz,
+            question_id=question_id,
+            selected_choice_id=choice_id,
+            is_correct=is_correct
+        )
+        Quiz.objects.filter(id=quiz.id).update(**updates)
+
+
+@async_api_view('POST')
+async def quiz_start(request):
+    serializer = QuizCreateSerializer(data=parse_json(request))
+    # PrimaryKeyRelatedField читает тему из базы
+    if not await sync_to_async(serializer.is_valid)():
+        return json_response(serializer.errors, status.HTTP_400_BAD_REQUEST)
+    topic_id = serializer.validated_data['topic'].id
+
+    question_ids = [question_id async for question_id in Quiz.questions_for_topic(topic_id)]
+    if not question_ids:
+        return json_response({"error": "В данной теме нет вопросов"}, status.HTTP_400_BAD_REQUEST)
+
+    quiz = await Quiz.objects.acreate(
+        user=request.user,
+        topic_id=topic_id,
+        total_questions=len(question_ids),
+        question_ids=question_ids
+    )
+    return json_response({
+        "quiz_id": quiz.id,
+        "question": await current_question(quiz)
+    }, status.HTTP_201_CREATED)
+
+
+@async_api_view('GET')
+async def quiz_next_question(request, quiz_id):
+    quiz = await aget_object_or_404(Quiz.objects.select_related('topic__subject'), id=quiz_id, user=request.user)
+
+    if quiz.status == 'completed':
+        return json_response(
+            {"error": "Эта викторина уже завершена", "quiz_id": quiz.id},
+            status.HTTP_400_BAD_REQUEST
+        )
+
+    next_question = await current_question(quiz)
+    if next_question:
+        return json_response({"quiz_id": quiz.id, "question": next_question})
+
+    await complete(quiz)
+    return json_response({"message": "Викторина завершена", "results": quiz_result_payload(quiz)})
+
+
+@async_api_view('POST')
+async def quiz_answer(request, quiz_id):
+    quiz = await aget_object_or_404(Quiz.objects.select_related('topic__subject'), id=quiz_id, user=request.user)
+
+    if quiz.status == 'completed':
+        return json_response({"error": "Эта викторина уже завершена"}, status.HTTP_400_BAD_REQUEST)
+
+    serializer = QuizAnswerSerializer(data=parse_json(request))
+    if not serializer.is_valid():
+        return json_response(serializer.errors, status.HTTP_400_BAD_REQUEST)
+    question_id = serializer.validated_data['question_id']
+    choice_id = serializer.validated_data['choice_id']
+
+    error = answer_error(quiz, question_id)
+    if error:
+        return json_response({"error": error}, status.HTTP_400_BAD_REQUEST)
+
+    choices, is_last = answer_choices(quiz, question_id, choice_id)
+    choice, next_rows = pick_choice([row async for row in choices], question_id, choice_id)
+    if choice is None:
+        raise Http404
+
+    is_correct = choice['is_correct']
+    updates = answer_updates(is_correct, is_last)
+    try:
+        await save_answer(quiz, question_id, choice_id, is_correct, updates)
+    except IntegrityError:
+        return json_response({"error": ALREADY_ANSWERED}, status.HTTP_400_BAD_REQUEST)
+
+    apply_answer(quiz, updates)
+
+    if is_last:
+        return json_response({
+            "message": "Викторина завершена",
+            "is_correct": is_correct,
+            "results": quiz_result_payload(quiz)
+        })
+
+    next_question = question_payload(next_rows) if next_rows else await current_question(quiz)
+    if next_question is None:
+        await complete(quiz)
+        return json_response({
+            "message": "Викторина завершена",
+            "is_correct": is_correct,
+            "results": quiz_result_payload(quiz)
+        })
+
+    return json_response({"is_correct": is_correct, "next_question": next_question})
+
+
+@async_api_view('GET')
+async def quiz_result(request, quiz_id):
+    # replica_reads() как контекстный менеджер: декоратор не действует на корутину
+    with replica_reads():
+        quiz = await aget_object_or_404(
+            Quiz.objects.select_related('topic__subject').prefetch_related(
+                Prefetch('answers', queryset=UserAnswer.objects.order_by('id'))
+            ),
+            id=quiz_id,
+            user=request.user
+        )
+    # Ответы уже загружены prefetch, question/selected_choice берутся из *_id без запросов
+    return json_response(QuizDetailSerializer(quiz).data)
@@ -0,0 +1,217 @@
+"""
+Аутентификация по подписанным claims access-токена, без чтения пользователя из базы.
+
+LoginView и /api/token/ выпускают токены с user_id, is_staff и версией
+токенов пользователя (CustomUser.token_version). StatelessJWTAuthentication
+проверяет подпись и срок, сверяет версию с общим кэшем
+(settings.CATALOG_CACHE_ALIAS) и собирает CustomUser только из claims:
+id, is_staff, is_active=True. Остальные поля отложены: при первом обращении
+к любому из них строка пользователя целиком берётся из TTL-кэша процесса
+(AUTH_USER_CACHE_TTL) или одним запросом.
+
+Отзыв токенов — увеличение token_version: CustomUser.save делает это при
+смене пароля, is_active, is_staff или is_superuser, revoke_tokens() —
+явно. Версия в общем кэше сбрасывается сразу и ещё раз после коммита;
+без сброса (QuerySet.update в обход save) она устаревает не дольше чем
+через AUTH_TOKEN_VERSION_TIMEOUT секунд.
+
+Токены без claim версии, выпущенные раньше, проверяются как прежде — с
+чтением пользователя из базы.
+"""
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+from django.db.models import F
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken
+from rest_framework_simplejwt.serializers import TokenObtainPairSerializer as BaseTokenObtainPairSerializer
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import AccessToken
+
+User = get_user_model()
+
+STAFF_CLAIM = 'is_staff'
+VERSION_CLAIM = 'ver'
+# Для удалённых и неактивных пользователей: ни один токен не совпадёт
+NO_VERSION = -1
+
+
+def add_claims(token, user):
+    token[STAFF_CLAIM] = user.is_staff
+    token[VERSION_CLAIM] = user.token_version
+    return token
+
+
+def access_token_for(user):
+    return add_claims(AccessToken.for_user(user), user)
+
+
+class TokenObtainPairSerializer(BaseTokenObtainPairSerializer):
+    """Для /api/token/: access-токен получает claims из refresh-токена."""
+
+    @classmethod
+    def get_token(cls, user):
+        return add_claims(super().get_token(user), user)
+
+
+def shared_cache():
+    return caches[getattr(settings, 'CATALOG_CACHE_ALIAS', 'default')]
+
+
+def version_key(user_id):
+    # Имя базы в ключе: dev-сервер и тесты на одной машине делят файловый кэш, но не пользователей
+    database = hashlib.md5(str(connections[DEFAULT_DB_ALIAS].settings_dict['NAME']).encode()).hexdigest()[:8]
+    return f'auth:token-version:{database}:{user_id}'
+
+
+def version_timeout():
+    return getattr(settings, 'AUTH_TOKEN_VERSION_TIMEOUT', 300)
+
+
+def _version_from_db(user_id):
+    version = User.objects.filter(pk=user_id, is_active=True).values_list('token_version', flat=True).first()
+    return NO_VERSION if version is None else version
+
+
+def token_version(user_id):
+    key = version_key(user_id)
+    version = shared_cache().get(key)
+    if version is None:
+        version = _version_from_db(user_id)
+        shared_cache().set(key, version, timeout=version_timeout())
+    return version
+
+
+async def atoken_version(user_id):
+    key = version_key(user_id)
+    version = await shared_cache().aget(key)
+    if version is None:
+        version = await sync_to_async(_version_from_db)(user_id)
+        await shared_cache().aset(key, version, timeout=version_timeout())
+    return version
+
+
+def forget_token_version(user_id):
+    """
+    Сбрасывает версию в общем кэше сейчас и после коммита: до коммита
+    другой процесс мог прочитать из базы и закэшировать старую версию.
+    """
+    key = version_key(user_id)
+    shared_cache().delete(key)
+    transaction.on_commit(lambda: shared_cache().delete(key))
+
+
+def revoke_tokens(user_id):
+    """Все ранее выданные пользователю access-токены перестают действовать."""
+    User.objects.filter(pk=user_id).update(token_version=F('token_version') + 1)
+    forget_token_version(user_id)
+    user_rows.discard(user_id)
+
+
+class UserRowCache:
+    """Строки пользователей (dict полей) в памяти процесса с TTL и ограничением размера."""
+
+    def __init__(self):
+        self._rows = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, user_id):
+        with self._lock:
+            item = self._rows.get(user_id)
+            if item is None:
+                return None
+            expires, row = item
+            if expires < time.monotonic():
+                del self._rows[user_id]
+                return None
+            self._rows.move_to_end(user_id)
+            return row
+
+    def set(self, user_id, row):
+        ttl = getattr(settings, 'AUTH_USER_CACHE_TTL', 30)
+        max_entries = getattr(settings, 'AUTH_USER_CACHE_SIZE', 1024)
+        with self._lock:
+            self._rows[user_id] = (time.monotonic() + ttl, row)
+            self._rows.move_to_end(user_id)
+            while len(self._rows) > max_entries:
+                self._rows.popitem(last=False)
+
+    def discard(self, user_id):
+        with self._lock:
+            self._rows.pop(user_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._rows.clear()
+
+
+user_rows = UserRowCache()
+
+
+def load_user_row(user):
+    """Заполняет отложенные поля пользователя из claims строкой из user_rows или из базы."""
+    row = user_rows.get(user.pk)
+    if row is None:
+        row = User.objects.filter(pk=user.pk).values(*(field.attname for field in User._meta.concrete_fields)).first()
+        if row is None:
+            raise User.DoesNotExist
+        user_rows.set(user.pk, row)
+    for name, value in row.items():
+        # Поля из claims оставляем как в токене
+        user.__dict__.setdefault(name, value)
+
+
+def claims_user(user_id, token):
+    loaded = {
+        api_settings.USER_ID_FIELD: user_id,
+        'is_staff': token[STAFF_CLAIM],
+        'is_active': True,
+        'token_version': token[VERSION_CLAIM],
+    }
+    # from_db ждёт значения в порядке полей модели
+    names = [field.attname for field in User._meta.concrete_fields if field.attname in loaded]
+    user = User.from_db(DEFAULT_DB_ALIAS, names, [loaded[name] for name in names])
+    user._deferred_loader = load_user_row
+    return user
+
+
+class StatelessJWTAuthentication(JWTAuthentication):
+    """JWTAuthentication, которая не читает пользователя из базы, если в токене есть наши claims."""
+
+    @staticmethod
+    def is_stateless(validated_token):
+        return VERSION_CLAIM in validated_token and STAFF_CLAIM in validated_token
+
+    @staticmethod
+    def user_id(validated_token):
+        try:
+            return validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken('Token contained no recognizable user identification')
+
+    @staticmethod
+    def check_version(validated_token, version):
+        if validated_token[VERSION_CLAIM] != version:
+            raise AuthenticationFailed('Токен отозван', code='token_revoked')
+
+    def get_user(self, validated_token):
+        if not self.is_stateless(validated_token):
+            return super().get_user(validated_token)
+        user_id = self.user_id(validated_token)
+        self.check_version(validated_token, token_version(user_id))
+        return claims_user(user_id, validated_token)
+
+    async def aget_user(self, validated_token):
+        if not self.is_stateless(validated_token):
+            return await sync_to_async(super().get_user)(validated_token)
+        user_id = self.user_id(validated_token)
+        self.check_version(validated_token, await atoken_version(user_id))
+        return claims_user(user_id, validated_token)
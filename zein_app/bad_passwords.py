@@ -0,0 +1,127 @@
+"""
+Проверка пароля по списку BadPassword без запроса к базе на каждую регистрацию.
+
+Каждый процесс один раз читает из базы хэши (BadPassword.password_hash,
+SHA-1 пароля в нижнем регистре) и держит в памяти отсортированный массив
+их 32-битных префиксов — 4 байта на пароль. Если префикса нет в массиве,
+пароля точно нет в списке; если есть, это подтверждается запросом по
+уникальному индексу password_hash. Ложные срабатывания массива
+(примерно n / 2**32 на проверку) стоят одного лишнего запроса.
+
+Массив перестраивается, когда меняется версия списка в общем кэше
+(settings.CATALOG_CACHE_ALIAS): её обновляют сигналы BadPassword,
+BadPasswordQuerySet.bulk_create и команда load_bad_passwords. Удаление
+пароля версию не меняет — лишний префикс отсечёт запрос к базе.
+"""
+import threading
+import time
+from array import array
+from bisect import bisect_left
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import DatabaseError, transaction
+
+from .models import BadPassword, bad_password_hash
+
+VERSION_KEY = 'bad-passwords:version'
+PREFIX_HEX_DIGITS = 8
+
+
+def hash_prefix(password_hash):
+    return int(password_hash[:PREFIX_HEX_DIGITS], 16)
+
+
+class BadPasswordFilter:
+
+    def __init__(self, alias=None):
+        self.alias = alias
+        self._prefixes = None
+        self._version = None
+        self._lock = threading.Lock()
+        self.builds = 0
+        self.lookups = 0
+        self.confirmations = 0
+
+    @property
+    def shared(self):
+        return caches[self.alias or getattr(settings, 'CATALOG_CACHE_ALIAS', 'default')]
+
+    def current_version(self):
+        version = self.shared.get(VERSION_KEY)
+        if version is None:
+            version = time.time_ns()
+            self.shared.add(VERSION_KEY, version, timeout=None)
+            version = self.shared.get(VERSION_KEY, version)
+        return version
+
+    def bump_version(self):
+        """
+        Новая версия сейчас и ещё раз после коммита: процесс, перестроивший
+        массив до коммита, мог не увидеть новых строк.
+        """
+        self.shared.set(VERSION_KEY, time.time_ns(), timeout=None)
+        transaction.on_commit(lambda: self.shared.set(VERSION_KEY, time.time_ns(), timeout=None))
+
+    @staticmethod
+    def build():
+        # Обход уникального индекса: хэши уже отсортированы, а значит и префиксы
+        prefixes = array('I')
+        rows = BadPassword.objects.order_by('password_hash').values_list('password_hash', flat=True)
+        for password_hash in rows.iterator(chunk_size=10000):
+            prefixes.append(hash_prefix(password_hash))
+        return prefixes
+
+    def prefixes(self):
+        version = self.current_version()
+        if version != self._version:
+            with self._lock:
+                if version != self._version:
+                    self._prefixes = self.build()
+                    self._version = version
+                    self.builds += 1
+        return self._prefixes
+
+    def warm_up(self):
+        """Строит массив при старте WSGI-процесса (вызывается из wsgi.py), если таблица уже есть."""
+        try:
+            self.prefixes()
+        except DatabaseError:
+            pass
+
+    def might_contain(self, password_hash):
+        prefixes = self.prefixes()
+        prefix = hash_prefix(password_hash)
+        index = bisect_left(prefixes, prefix)
+        return index < len(prefixes) and prefixes[index] == prefix
+
+    def contains(self, password):
+        password_hash = bad_password_hash(password)
+        self.lookups += 1
+        if not self.might_contain(password_hash):
+            return False
+        self.confirmations += 1
+        return BadPassword.objects.filter(password_hash=password_hash).exists()
+
+    def clear(self):
+        with self._lock:
+            self._prefixes = None
+            self._version = None
+
+    def stats(self):
+        prefixes = self._prefixes
+        return {
+            'size': len(prefixes) if prefixes is not None else 0,
+            'bytes': prefixes.buffer_info()[1] * prefixes.itemsize if prefixes is not None else 0,
+            'builds': self.builds,
+            'lookups': self.lookups,
+            'confirmations': self.confirmations,
+            'version': self._version,
+        }
+
+
+bad_password_filter = BadPasswordFilter()
+
+
+def is_bad_password(password):
+    return bad_password_filter.contains(password)
@@ -0,0 +1,173 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.utils.cache import get_conditional_response
+from rest_framework.response import Response
+
+from .db_router import primary_reads, replica_is_fresh
+
+VERSION_KEY = 'catalog:version'
+
+
+class CatalogCache:
+    """
+    LRU-кэш сериализованного каталога (предметы → темы → вопросы) в памяти процесса.
+
+    Версия каталога хранится в общем кэше (settings.CATALOG_CACHE_ALIAS) и
+    меняется сигналами при любом изменении Subject/Topic/Question/Choice.
+    Каждый процесс сверяет версию при чтении и сбрасывает устаревшие записи.
+    """
+
+    def __init__(self, max_entries=None, alias=None):
+        self.max_entries = max_entries
+        self.alias = alias
+        self._entries = OrderedDict()
+        self._version = None
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    @property
+    def shared(self):
+        return caches[self.alias or getattr(settings, 'CATALOG_CACHE_ALIAS', 'default')]
+
+    def get_max_entries(self):
+        return self.max_entries or getattr(settings, 'CATALOG_CACHE_MAX_ENTRIES', 512)
+
+    def current_version(self):
+        version = self.shared.get(VERSION_KEY)
+        if version is None:
+            version = time.time_ns()
+            self.shared.add(VERSION_KEY, version, timeout=None)
+            version = self.shared.get(VERSION_KEY, version)
+        return version
+
+    def bump_version(self):
+        # Новое значение, а не инкремент: set атомарен во всех бэкендах кэша
+        self.shared.set(VERSION_KEY, time.time_ns(), timeout=None)
+
+    def bump_version_on_commit(self):
+        transaction.on_commit(self.bump_version)
+
+    def _sync_version(self):
+        version = self.current_version()
+        if version != self._version:
+            if self._entries:
+                self.invalidations += 1
+            self._entries.clear()
+            self._version = version
+
+    def get_or_set(self, key, factory):
+        with self._lock:
+            self._sync_version()
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key]
+            self.misses += 1
+            version = self._version
+
+        if replica_is_fresh(version):
+            value = factory()
+        else:
+            # Свежее изменение могло ещё не дойти до реплики — не кэшируем устаревшие данные
+            with primary_reads():
+                value = factory()
+
+        with self._lock:
+            # Пока строили значение, каталог мог измениться — такое значение не кэшируем
+            if version == self._version:
+                self._entries[key] = value
+                self._entries.move_to_end(key)
+                while len(self._entries) > self.get_max_entries():
+                    self._entries.popitem(last=False)
+                    self.evictions += 1
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._version = None
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_ratio': round(self.hits / lookups, 4) if lookups else 0.0,
+                'evictions': self.evictions,
+                'invalidations': self.invalidations,
+                'size': len(self._entries),
+                'max_entries': self.get_max_entries(),
+                'version': self._version,
+            }
+
+
+catalog_cache = CatalogCache()
+
+
+class CatalogCacheMixin:
+    """
+    Отдаёт list/retrieve каталоговых ViewSet'ов из catalog_cache.
+
+    ETag строится из версии каталога, поэтому на If-None-Match отвечаем
+    304 без запросов к базе и без сериализации. Last-Modified не отдаём:
+    у него точность в секунду, и после изменения каталога в ту же секунду
+    клиент с If-Modified-Since получил бы устаревший 304. Запросы с параметрами из uncached_query_params
+    (например, поиск) идут мимо кэша, чтобы не вытеснять из него каталог.
+    """
+    uncached_query_params = ()
+
+    def is_catalog_cacheable(self, request):
+        return not any(param in request.query_params for param in self.uncached_query_params)
+
+    def get_catalog_cache_key(self, request, **kwargs):
+        return (
+            type(self).__name__,
+            self.action,
+            self.get_serializer_class().__name__,
+            request.build_absolute_uri('/'),
+            kwargs.get(self.lookup_url_kwarg or self.lookup_field),
+            tuple(sorted((key, tuple(values)) for key, values in request.query_params.lists())),
+        )
+
+    def get_catalog_etag(self, key):
+        version = catalog_cache.current_version()
+        digest = hashlib.md5(repr((version, key)).encode(), usedforsecurity=False).hexdigest()
+        return f'"{digest}"'
+
+    def catalog_response(self, request, key, build):
+        etag = self.get_catalog_etag(key)
+        not_modified = get_conditional_response(request, etag=etag)
+        if not_modified is not None:
+            return not_modified
+
+        response = Response(catalog_cache.get_or_set(key, build))
+        response['ETag'] = etag
+        return response
+
+    def list(self, request, *args, **kwargs):
+        if not self.is_catalog_cacheable(request):
+            return super().list(request, *args, **kwargs)
+        return self.catalog_response(
+            request,
+            self.get_catalog_cache_key(request, **kwargs),
+            lambda: super(CatalogCacheMixin, self).list(request, *args, **kwargs).data
+        )
+
+    def retrieve(self, request, *args, **kwargs):
+        if not self.is_catalog_cacheable(request):
+            return super().retrieve(request, *args, **kwargs)
+        return self.catalog_response(
+            request,
+            self.get_catalog_cache_key(request, **kwargs),
+            lambda: super(CatalogCacheMixin, self).retrieve(request, *args, **kwargs).data
+        )
@@ -0,0 +1,36 @@
+from django.db.models import Count, IntegerField, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+from .catalog_cache import catalog_cache
+from .models import Subject, Topic, Question
+
+
+def _count_subquery(model, field):
+    counts = (
+        model.objects.filter(**{field: OuterRef('pk')})
+        .order_by()
+        .values(field)
+        .annotate(total=Count('pk'))
+        .values('total')
+    )
+    return Coalesce(Subquery(counts, output_field=IntegerField()), Value(0))
+
+
+def rebuild_question_counts(topic_ids=None):
+    """Пересчитывает Topic.question_count (после bulk_create/update/delete вопросов)."""
+    topics = Topic.objects.all()
+    if topic_ids is not None:
+        topics = topics.filter(id__in=topic_ids)
+    updated = topics.update(question_count=_count_subquery(Question, 'topic'))
+    catalog_cache.bump_version_on_commit()
+    return updated
+
+
+def rebuild_topic_counts(subject_ids=None):
+    """Пересчитывает Subject.topic_count (после bulk_create/update/delete тем)."""
+    subjects = Subject.objects.all()
+    if subject_ids is not None:
+        subjects = subjects.filter(id__in=subject_ids)
+    updated = subjects.update(topic_count=_count_subquery(Topic, 'subject'))
+    catalog_cache.bump_version_on_commit()
+    return updated
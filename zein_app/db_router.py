@@ -0,0 +1,206 @@
+"""
+Чтение каталога и истории с реплики (алиас 'replica').
+
+На реплику идут только чтения, явно помеченные replica_reads(): GET-запросы
+SubjectViewSet / TopicViewSet / QuestionViewSet / HistoryViewSet, история
+викторин и APIService.get_*. Всё остальное, любые записи и чтения внутри
+транзакции на default остаются на default.
+
+Реплика отстаёт от основной базы не больше чем на REPLICA_LAG_SECONDS.
+Поэтому пользователь, который только что что-то записал, столько же читает
+с основной базы (ReplicaPinMiddleware), а кэш каталога не заполняется с
+реплики, пока его версия моложе этого срока.
+
+Если алиаса 'replica' нет в DATABASES, роутер ничего не делает. Для
+локальной проверки реплика — копия db.sqlite3, которую обновляет команда
+refresh_replica.
+"""
+import time
+from contextlib import ContextDecorator
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.cache import caches
+from django.db import connections
+from rest_framework.permissions import SAFE_METHODS
+
+REPLICA = 'replica'
+PRIMARY = 'default'
+
+# Модели, которые можно читать с реплики; пользователи и токены — только с default
+REPLICA_MODELS = {
+    'zein_app.subject', 'zein_app.topic', 'zein_app.question', 'zein_app.choice',
+    'zein_app.quiz', 'zein_app.useranswer', 'zein_app.history',
+    'zein_app.questionsearchindex', 'zein_app.topicsearchindex',
+}
+
+_replica_reads = ContextVar('replica_reads', default=False)
+_pinned = ContextVar('replica_pinned', default=False)
+
+
+def replica_configured():
+    return REPLICA in connections.settings
+
+
+def lag_seconds():
+    return getattr(settings, 'REPLICA_LAG_SECONDS', 5)
+
+
+class _ReadsContext(ContextDecorator):
+    value = None
+
+    def _recreate_cm(self):
+        # Новый объект на каждый вызов: токен ContextVar у каждого свой
+        return type(self)()
+
+    def __enter__(self):
+        self._token = _replica_reads.set(self.value)
+        return self
+
+    def __exit__(self, *exc_info):
+        _replica_reads.reset(self._token)
+
+
+class replica_reads(_ReadsContext):
+    """Чтения внутри блока (или функции) можно отправлять на реплику."""
+    value = True
+
+
+class primary_reads(_ReadsContext):
+    """Чтения внутри блока идут на default, даже если снаружи replica_reads()."""
+    value = False
+
+
+def replica_is_fresh(version_ns):
+    """Изменение с меткой времени version_ns (time.time_ns()) уже должно быть на реплике."""
+    return time.time_ns() - version_ns > lag_seconds() * 10 ** 9
+
+
+class ReplicaRouter:
+
+    @staticmethod
+    def in_write_transaction():
+        return connections[PRIMARY].in_atomic_block
+
+    def db_for_read(self, model, **hints):
+        if not _replica_reads.get() or _pinned.get():
+            return None
+        if model._meta.label_lower not in REPLICA_MODELS or not replica_configured():
+            return None
+        if self.in_write_transaction():
+            return None
+        return REPLICA
+
+    def db_for_write(self, model, **hints):
+        return PRIMARY
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Реплика — копия default, объекты с обеих баз можно связывать
+        if {obj1._state.db, obj2._state.db} <= {PRIMARY, REPLICA}:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if db == REPLICA:
+            return False
+        return None
+
+
+class ReplicaReadsMixin:
+    """GET/HEAD/OPTIONS запросы ViewSet'а читают каталог с реплики."""
+
+    def dispatch(self, request, *args, **kwargs):
+        if request.method in SAFE_METHODS:
+            with replica_reads():
+                return super().dispatch(request, *args, **kwargs)
+        return super().dispatch(request, *args, **kwargs)
+
+
+class ReplicaPinMiddleware:
+    """
+    После успешного изменяющего запроса пользователь REPLICA_LAG_SECONDS читает
+    только с default: иначе он мог бы не увидеть на реплике свою же запись.
+
+    Метка хранится в общем кэше (settings.CATALOG_CACHE_ALIAS), поэтому
+    действует во всех воркерах. Пользователь определяется по user_id из JWT
+    без запроса к базе, по сессии или, для анонимов, по IP.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    @staticmethod
+    def cache():
+        return caches[getattr(settings, 'CATALOG_CACHE_ALIAS', 'default')]
+
+    @staticmethod
+    def token_key(request):
+        header = request.META.get('HTTP_AUTHORIZATION', '')
+        if header.startswith('Bearer '):
+            from rest_framework_simplejwt.exceptions import TokenError
+            from rest_framework_simplejwt.tokens import AccessToken
+            try:
+                return f"replica-pin:user:{AccessToken(header[7:].strip())['user_id']}"
+            except (TokenError, KeyError):
+                pass
+        return None
+
+    @staticmethod
+    def user_key(request, user):
+        if user is not None and user.is_authenticated:
+            return f'replica-pin:user:{user.pk}'
+        return f"replica-pin:ip:{request.META.get('REMOTE_ADDR')}"
+
+    def client_key(self, request):
+        return self.token_key(request) or self.user_key(request, getattr(request, 'user', None))
+
+    async def aclient_key(self, request):
+        key = self.token_key(request)
+        if key:
+            return key
+        # Ленивый request.user в async-коде читать нельзя — он ходит в базу синхронно
+        auser = getattr(request, 'auser', None)
+        return self.user_key(request, await auser() if auser else None)
+
+    @staticmethod
+    def pin_after(request, response):
+        return request.method not in SAFE_METHODS and response.status_code < 400
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        if not replica_configured():
+            return self.get_response(request)
+
+        key = self.client_key(request)
+        token = _pinned.set(bool(self.cache().get(key)))
+        try:
+            response = self.get_response(request)
+        finally:
+            _pinned.reset(token)
+
+        if self.pin_after(request, response):
+            self.cache().set(key, 1, timeout=lag_seconds())
+        return response
+
+    async def __acall__(self, request):
+        if not replica_configured():
+            return await self.get_response(request)
+
+        key = await self.aclient_key(request)
+        token = _pinned.set(bool(await self.cache().aget(key)))
+        try:
+            response = await self.get_response(request)
+        finally:
+            _pinned.reset(token)
+
+        if self.pin_after(request, response):
+            await self.cache().aset(key, 1, timeout=lag_seconds())
+        return response
@@ -0,0 +1,91 @@
+"""
+Потоковая выгрузка викторин и ответов в NDJSON/CSV.
+
+Строки читаются через values_list().iterator(chunk_size=...), поэтому
+память не растёт с объёмом выгрузки.
+"""
+import csv
+import json
+from datetime import timedelta
+
+from django.core.serializers.json import DjangoJSONEncoder
+
+from .models import Quiz, UserAnswer
+
+EXPORT_FORMATS = ('ndjson', 'csv')
+CONTENT_TYPES = {
+    'ndjson': 'application/x-ndjson',
+    'csv': 'text/csv',
+}
+
+QUIZ_COLUMNS = (
+    ('quiz_id', 'id'),
+    ('user_id', 'user_id'),
+    ('username', 'user__username'),
+    ('topic_id', 'topic_id'),
+    ('topic_name', 'topic__name'),
+    ('subject_id', 'topic__subject_id'),
+    ('subject_name', 'topic__subject__name'),
+    ('status', 'status'),
+    ('score', 'score'),
+    ('total_questions', 'total_questions'),
+    ('started_at', 'started_at'),
+    ('completed_at', 'completed_at'),
+)
+
+ANSWER_COLUMNS = (
+    ('answer_id', 'id'),
+    ('quiz_id', 'quiz_id'),
+    ('user_id', 'quiz__user_id'),
+    ('username', 'quiz__user__username'),
+    ('topic_id', 'quiz__topic_id'),
+    ('topic_name', 'quiz__topic__name'),
+    ('subject_id', 'quiz__topic__subject_id'),
+    ('subject_name', 'quiz__topic__subject__name'),
+    ('question_id', 'question_id'),
+    ('choice_id', 'selected_choice_id'),
+    ('is_correct', 'is_correct'),
+    ('answered_at', 'answered_at'),
+)
+
+EXPORTS = {
+    'quizzes': (Quiz, QUIZ_COLUMNS, 'topic_id', 'started_at'),
+    'answers': (UserAnswer, ANSWER_COLUMNS, 'quiz__topic_id', 'answered_at'),
+}
+
+
+def export_rows(kind, topic_id=None, date_from=None, date_to=None, status=None, chunk_size=2000):
+    """Кортежи значений в порядке колонок выгрузки kind."""
+    model, columns, topic_field, date_field = EXPORTS[kind]
+    queryset = model.objects.order_by('id')
+    if topic_id is not None:
+        queryset = queryset.filter(**{topic_field: topic_id})
+    if date_from is not None:
+        queryset = queryset.filter(**{f'{date_field}__gte': date_from})
+    if date_to is not None:
+        queryset = queryset.filter(**{f'{date_field}__lt': date_to + timedelta(days=1)})
+    if status is not None:
+        status_field = 'status' if model is Quiz else 'quiz__status'
+        queryset = queryset.filter(**{status_field: status})
+    return queryset.values_list(*(path for _, path in columns)).iterator(chunk_size=chunk_size)
+
+
+class _Echo:
+    def write(self, value):
+        return value
+
+
+def stream_export(kind, export_format='ndjson', **filters):
+    """Генератор строк выгрузки (с переводом строки) для StreamingHttpResponse или файла."""
+    header = [name for name, _ in EXPORTS[kind][1]]
+    rows = export_rows(kind, **filters)
+
+    if export_format == 'csv':
+        writer = csv.writer(_Echo())
+        yield writer.writerow(header)
+        for row in rows:
+            yield writer.writerow(row)
+    else:
+        encoder = DjangoJSONEncoder(ensure_ascii=False)
+        for row in rows:
+            yield encoder.encode(dict(zip(header, row))) + '\n'
@@ -0,0 +1,68 @@
+"""
+Быстрые сериализаторы для горячих путей викторины (старт, следующий вопрос, ответ).
+
+Строят обычные dict из строк values() вместо ModelSerializer, формат ответа
+совпадает с QuestionDetailSerializer и QuizResultSerializer.
+"""
+from rest_framework.fields import DateTimeField
+
+from .models import Question, Choice
+
+QUESTION_CHOICE_FIELDS = ('id', 'text', 'question_id', 'question__text', 'question__image')
+
+_question_image = Question._meta.get_field('image')
+_datetime_field = DateTimeField()
+
+
+def image_url(name, field=_question_image, request=None):
+    if not name:
+        return None
+    url = field.storage.url(name)
+    if request is not None:
+        return request.build_absolute_uri(url)
+    return url
+
+
+def question_choice_rows(*fields, **lookup):
+    """Варианты ответа вместе с полями вопроса одним запросом."""
+    return (
+        Choice.objects.filter(**lookup)
+        .order_by('id')
+        .values(*(QUESTION_CHOICE_FIELDS + fields))
+    )
+
+
+def question_payload(rows, request=None):
+    """dict в формате QuestionDetailSerializer из строк question_choice_rows()."""
+    first = rows[0]
+    return {
+        'id': first['question_id'],
+        'text': first['question__text'],
+        'image': image_url(first['question__image'], request=request),
+        'choices': [{'id': row['id'], 'text': row['text']} for row in rows],
+    }
+
+
+def questions_payload(rows, request=None):
+    """Список вопросов из строк question_choice_rows() нескольких вопросов."""
+    grouped = {}
+    for row in rows:
+        grouped.setdefault(row['question_id'], []).append(row)
+    return [question_payload(question_rows, request=request) for question_rows in grouped.values()]
+
+
+def quiz_result_payload(quiz):
+    """dict в формате QuizResultSerializer; topic и subject должны быть загружены через select_related."""
+    percentage = 0
+    if quiz.total_questions:
+        percentage = round((quiz.score / quiz.total_questions) * 100, 2)
+    return {
+        'id': quiz.id,
+        'topic_name': quiz.topic.name,
+        'subject_name': quiz.topic.subject.name,
+        'score': quiz.score,
+        'total_questions': quiz.total_questions,
+        'percentage': percentage,
+        'started_at': _datetime_field.to_representation(quiz.started_at),
+        'completed_at': _datetime_field.to_representation(quiz.completed_at) if quiz.completed_at else None,
+    }
@@ -0,0 +1,235 @@
+"""
+Массовый импорт банка вопросов из CSV / JSON Lines / JSON / XLSX.
+
+Каждая строка описывает один вопрос: subject, topic, question, explanation,
+choices и correct. В CSV/XLSX варианты и флаги правильности разделяются
+символом "|" (например "2|3|4" и "0|1|0"), в JSON это списки; вместо пары
+choices/correct можно передать choices как [{"text": ..., "is_correct": ...}].
+
+Строки читаются потоково и пишутся пачками через bulk_create, каждая пачка
+в своей транзакции.
+"""
+import csv
+import io
+import json
+from itertools import islice
+
+from django.db import connection, transaction
+
+from .counters import rebuild_question_counts, rebuild_topic_counts
+from .models import Subject, Topic, Question, Choice
+
+IMPORT_FORMATS = ('csv', 'jsonl', 'json', 'xlsx')
+LIST_SEPARATOR = '|'
+TRUE_VALUES = {'1', 'true', 'yes', 'y', 'да', '+'}
+
+
+class ImportFormatError(ValueError):
+    pass
+
+
+def detect_format(filename):
+    extension = filename.rsplit('.', 1)[-1].lower() if '.' in filename else ''
+    if extension == 'ndjson':
+        return 'jsonl'
+    if extension not in IMPORT_FORMATS:
+        raise ImportFormatError(f"Неизвестный формат файла: {filename}")
+    return extension
+
+
+def read_rows(binary_file, file_format):
+    """Потоково читает файл и отдаёт строки-словари."""
+    if file_format == 'xlsx':
+        yield from _read_xlsx(binary_file)
+        return
+
+    text = io.TextIOWrapper(binary_file, encoding='utf-8-sig', newline='')
+    if file_format == 'csv':
+        yield from csv.DictReader(text)
+    elif file_format == 'jsonl':
+        for line in text:
+            if line.strip():
+                yield json.loads(line)
+    elif file_format == 'json':
+        # Обычный JSON-массив целиком помещается в память; для больших файлов используйте jsonl
+        yield from json.load(text)
+    else:
+        raise ImportFormatError(f"Неизвестный формат: {file_format}")
+
+
+def _read_xlsx(binary_file):
+    try:
+        from openpyxl import load_workbook
+    except ImportError:
+        raise ImportFormatError("Для импорта XLSX установите пакет openpyxl")
+
+    sheet = load_workbook(binary_file, read_only=True).active
+    rows = sheet.iter_rows(values_only=True)
+    header = [str(cell).strip() if cell is not None else '' for cell in next(rows, ())]
+    for values in rows:
+        yield {key: value for key, value in zip(header, values) if key}
+
+
+def _split(value):
+    if value is None:
+        return []
+    if isinstance(value, (list, tuple)):
+        return list(value)
+    return [part.strip() for part in str(value).split(LIST_SEPARATOR)]
+
+
+def _is_true(value):
+    if isinstance(value, bool):
+        return value
+    return str(value).strip().lower() in TRUE_VALUES
+
+
+def parse_row(row):
+    """Проверяет строку и приводит её к виду (subject, topic, text, explanation, [(choice, is_correct)])."""
+    subject = str(row.get('subject') or '').strip()
+    topic = str(row.get('topic') or '').strip()
+    text = str(row.get('question') or row.get('text') or '').strip()
+    explanation = str(row.get('explanation') or '').strip() or None
+
+    raw_choices = row.get('choices')
+    if isinstance(raw_choices, list) and raw_choices and isinstance(raw_choices[0], dict):
+        choices = [(str(choice.get('text', '')).strip(), _is_true(choice.get('is_correct', False)))
+                   for choice in raw_choices]
+    else:
+        texts = [str(choice).strip() for choice in _split(raw_choices)]
+        flags = [_is_true(flag) for flag in _split(row.get('correct'))]
+        if len(flags) != len(texts):
+            raise ValueError("Количество флагов correct не совпадает с количеством вариантов")
+        choices = list(zip(texts, flags))
+
+    if not subject or not topic or not text:
+        raise ValueError("Поля subject, topic и question обязательны")
+    if len(subject) > Subject._meta.get_field('name').max_length:
+        raise ValueError("Слишком длинное название предмета")
+    if len(topic) > Topic._meta.get_field('name').max_length:
+        raise ValueError("Слишком длинное название темы")
+    if len(choices) < 2:
+        raise ValueError("Нужно минимум два варианта ответа")
+    if any(not choice or len(choice) > Choice._meta.get_field('text').max_length for choice, _ in choices):
+        raise ValueError("Пустой или слишком длинный вариант ответа")
+    if not any(is_correct for _, is_correct in choices):
+        raise ValueError("Нет ни одного правильного варианта")
+    return subject, topic, text, explanation, choices
+
+
+class QuestionImporter:
+    """
+    Импортирует строки пачками по chunk_size.
+
+    Неверные строки пропускаются и попадают в отчёт; в режиме dry_run
+    ничего не записывается, только проверяются строки.
+    """
+
+    def __init__(self, chunk_size=1000, dry_run=False, progress=None, max_errors=100):
+        self.chunk_size = chunk_size
+        self.dry_run = dry_run
+        self.progress = progress
+        self.max_errors = max_errors
+        self._topics = {}
+        self._subjects = {}
+        self.report = {
+            'rows': 0,
+            'questions': 0,
+            'choices': 0,
+            'subjects_created': 0,
+            'topics_created': 0,
+            'invalid': 0,
+            'errors': [],
+            'dry_run': dry_run,
+        }
+
+    def run(self, rows):
+        rows = enumerate(rows, start=1)
+        while True:
+            chunk = list(islice(rows, self.chunk_size))
+            if not chunk:
+                break
+            self._import_chunk(chunk)
+            if self.progress:
+                self.progress(self.report)
+
+        if not self.dry_run and self.report['questions']:
+            with transaction.atomic():
+                rebuild_question_counts(set(self._topics.values()))
+                rebuild_topic_counts(set(self._subjects.values()))
+        return self.report
+
+    def _import_chunk(self, chunk):
+        parsed = []
+        for number, row in chunk:
+            self.report['rows'] += 1
+            try:
+                parsed.append(parse_row(row))
+            except (ValueError, TypeError, AttributeError) as error:
+                self.report['invalid'] += 1
+                if len(self.report['errors']) < self.max_errors:
+                    self.report['errors'].append({'row': number, 'error': str(error)})
+
+        if self.dry_run:
+            for subject, topic, text, explanation, choices in parsed:
+                self._count_new_topic(subject, topic)
+                self.report['questions'] += 1
+                self.report['choices'] += len(choices)
+            return
+
+        with transaction.atomic():
+            questions = [
+                Question(topic_id=self._get_topic_id(subject, topic), text=text, explanation=explanation)
+                for subject, topic, text, explanation, _ in parsed
+            ]
+            questions = self._bulk_create_questions(questions)
+            new_choices = [
+                Choice(question_id=question.id, text=choice, is_correct=is_correct)
+                for question, (*_, choices) in zip(questions, parsed)
+                for choice, is_correct in choices
+            ]
+            Choice.objects.bulk_create(new_choices, batch_size=self.chunk_size)
+
+        self.report['questions'] += len(questions)
+        self.report['choices'] += len(new_choices)
+
+    @staticmethod
+    def _bulk_create_questions(questions):
+        if connection.features.can_return_rows_from_bulk_insert:
+            return Question.objects.bulk_create(questions)
+        for question in questions:
+            question.save()
+        return questions
+
+    def _count_new_topic(self, subject_name, topic_name):
+        key = (subject_name, topic_name)
+        if key in self._topics:
+            return
+        exists = Topic.objects.filter(subject__name=subject_name, name=topic_name).exists()
+        self._topics[key] = None
+        if not exists:
+            self.report['topics_created'] += 1
+            if subject_name not in self._subjects:
+                self._subjects[subject_name] = None
+                if not Subject.objects.filter(name=subject_name).exists():
+                    self.report['subjects_created'] += 1
+
+    def _get_topic_id(self, subject_name, topic_name):
+        key = (subject_name, topic_name)
+        if key not in self._topics:
+            subject_id = self._get_subject_id(subject_name)
+            topic = Topic.objects.filter(subject_id=subject_id, name=topic_name).order_by('id').first()
+            if topic is None:
+                topic = Topic.objects.create(subject_id=subject_id, name=topic_name)
+                self.report['topics_created'] += 1
+            self._topics[key] = topic.id
+        return self._topics[key]
+
+    def _get_subject_id(self, subject_name):
+        if subject_name not in self._subjects:
+            subject = Subject.objects.filter(name=subject_name).order_by('id').first()
+            if subject is None:
+                subject = Subject.objects.create(name=subject_name, title_ru=subject_name)
+                self.report['subjects_created'] += 1
+            self._subjects[subject_name] = subject.id
+        return self._subjects[subject_name]
@@ -0,0 +1,331 @@
+import asyncio
+import json
+import os
+import random
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from http import HTTPStatus
+from urllib.parse import unquote
+
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.core.handlers.asgi import ASGIHandler
+from django.core.management.base import BaseCommand
+from django.core.servers.basehttp import ThreadedWSGIServer, get_internal_wsgi_application
+from django.db import connection, connections
+from django.db.backends.signals import connection_created
+
+from zein_app.authentication import access_token_for
+from zein_app.models import CustomUser, Topic
+from zein_app.scale_data import PRESETS
+
+from .benchmark_load import QuietWSGIRequestHandler, Recorder, Student, seed_catalog
+
+PASSWORD = 'Bench_pass1!'
+
+# Один и тот же сценарий на синхронных и асинхронных эндпоинтах
+MODES = {
+    'wsgi': '/quiz',
+    'asgi': '/async/quiz',
+}
+
+
+class PooledWSGIServer(ThreadedWSGIServer):
+    """WSGI-сервер с фиксированным числом потоков, как gunicorn --threads."""
+    request_queue_size = 1024
+
+    def __init__(self, *args, workers, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.pool = ThreadPoolExecutor(max_workers=workers)
+
+    def process_request(self, request, client_address):
+        self.pool.submit(self.process_request_thread, request, client_address)
+
+    def _close_connections(self):
+        # Потоки живут весь прогон: соединения закрывает request_finished по CONN_MAX_AGE
+        pass
+
+    def server_close(self):
+        super().server_close()
+        self.pool.shutdown(wait=False, cancel_futures=True)
+
+
+class ASGIServer:
+    """
+    Минимальный HTTP/1.1-сервер для ASGI-приложения в одном цикле событий.
+
+    Без keep-alive, chunked-тел и TLS: нужен, чтобы мерить Django, а не
+    сервер, и чтобы не тащить uvicorn в зависимости. В продакшене —
+    uvicorn bot_zein.asgi:application или daphne.
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self.handlers = set()
+
+    def start(self):
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self.loop.run_forever, daemon=True)
+        self.thread.start()
+        self.server = asyncio.run_coroutine_threadsafe(
+            asyncio.start_server(self.handle, '127.0.0.1', 0, backlog=1024), self.loop
+        ).result()
+        return self.server.sockets[0].getsockname()[1]
+
+    def stop(self):
+        async def close():
+            self.server.close()
+            # Ответ уже отправлен, но Django ещё может рассылать request_finished
+            await asyncio.gather(*self.handlers, return_exceptions=True)
+            await self.server.wait_closed()
+
+        asyncio.run_coroutine_threadsafe(close(), self.loop).result()
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join()
+        self.loop.close()
+
+    async def handle(self, reader, writer):
+        self.handlers.add(asyncio.current_task())
+        try:
+            request_line = await reader.readline()
+            if not request_line:
+                return
+            method, target, _ = request_line.decode('latin-1').split(' ', 2)
+            headers = []
+            while True:
+                line = await reader.readline()
+                if line in (b'\r\n', b'\n', b''):
+                    break
+                name, _, value = line.decode('latin-1').partition(':')
+                headers.append((name.strip().lower().encode('latin-1'), value.strip().encode('latin-1')))
+            length = int(dict(headers).get(b'content-length', b'0'))
+            body = await reader.readexactly(length) if length else b''
+
+            path, _, query = target.partition('?')
+            scope = {
+                'type': 'http',
+                'asgi': {'version': '3.0'},
+                'http_version': '1.1',
+                'method': method,
+                'scheme': 'http',
+                'path': unquote(path),
+                'raw_path': path.encode('latin-1'),
+                'query_string': query.encode('latin-1'),
+                'root_path': '',
+                'headers': headers,
+                'client': writer.get_extra_info('peername')[:2],
+                'server': writer.get_extra_info('sockname')[:2],
+            }
+            disconnected = asyncio.Event()
+
+            async def receive():
+                nonlocal body
+                if body is not None:
+                    message, body = {'type': 'http.request', 'body': body, 'more_body': False}, None
+                    return message
+                # Django ждёт http.disconnect, пока выполняется view
+                await disconnected.wait()
+                return {'type': 'http.disconnect'}
+
+            async def send(message):
+                if message['type'] == 'http.response.start':
+                    status = message['status']
+                    lines = [f'HTTP/1.1 {status} {HTTPStatus(status).phrase}'.encode('latin-1')]
+                    lines += [name + b': ' + value for name, value in message.get('headers', [])]
+                    lines.append(b'Connection: close')
+                    writer.write(b'\r\n'.join(lines) + b'\r\n\r\n')
+                elif message['type'] == 'http.response.body':
+                    writer.write(message.get('body', b''))
+                    if not message.get('more_body'):
+                        await writer.drain()
+
+            await self.app(scope, receive, send)
+            disconnected.set()
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+            pass
+        finally:
+            writer.close()
+            self.handlers.discard(asyncio.current_task())
+
+
+class QuizStudent(Student):
+    """Ученик с готовым токеном: старт, следующий вопрос, ответы до конца и результат."""
+
+    def __init__(self, base_url, prefix, token, topic_ids, recorder, rng):
+        self.base_url = base_url
+        self.prefix = prefix
+        self.token = token
+        self.topic_ids = topic_ids
+        self.recorder = recorder
+        self.rng = rng
+
+    def run(self):
+        started = self.request('POST', f'{self.prefix}/', 'start', {'topic': self.rng.choice(self.topic_ids)})
+        if started is None:
+            return
+        quiz_id = started['quiz_id']
+        resumed = self.request('GET', f'{self.prefix}/{quiz_id}/next/', 'next')
+        question = resumed and resumed.get('question')
+        while question:
+            answered = self.request('POST', f'{self.prefix}/{quiz_id}/answer/', 'answer', {
+                'question_id': question['id'],
+                'choice_id': self.rng.choice(question['choices'])['id'],
+            })
+            if answered is None:
+                return
+            question = answered.get('next_question')
+        self.request('GET', f'{self.prefix}/{quiz_id}/', 'result')
+
+
+class QueryDelay:
+    """Задержка перед каждым SQL-запросом — как сетевой круг до базы на другом хосте."""
+
+    def __init__(self, seconds):
+        self.seconds = seconds
+
+    def __call__(self, execute, sql, params, many, context):
+        time.sleep(self.seconds)
+        return execute(sql, params, many, context)
+
+    def install(self, sender, connection, **kwargs):
+        if self not in connection.execute_wrappers:
+            connection.execute_wrappers.append(self)
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнивает пропускную способность сценария викторины на синхронных эндпоинтах под WSGI '
+        '(--workers потоков) и на async-эндпоинтах под ASGI (один цикл событий) в одном процессе'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--students', type=int, default=200, help='Сколько учеников пройдут викторину')
+        parser.add_argument('--concurrency', type=int, default=50, help='Сколько учеников работают одновременно')
+        parser.add_argument('--workers', type=int, default=4, help='Потоков WSGI-сервера')
+        parser.add_argument('--modes', nargs='+', choices=MODES, default=list(MODES))
+        parser.add_argument('--query-delay-ms', type=float, default=0.0,
+                            help='Искусственная задержка каждого SQL-запроса (база по сети)')
+        parser.add_argument('--subjects', type=int, default=2)
+        parser.add_argument('--topics', type=int, default=5, help='Тем в каждом предмете')
+        parser.add_argument('--questions', type=int, default=10, help='Вопросов в каждой теме')
+        parser.add_argument('--choices', type=int, default=4)
+        parser.add_argument('--preset', choices=PRESETS,
+                            help='Вместо --subjects/--topics/... заполнить базу генератором seed_scale_data')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--output', help='Сохранить результаты в JSON')
+
+    def handle(self, *args, **options):
+        database = os.path.join(tempfile.mkdtemp(), 'asgi_benchmark.sqlite3')
+        old_name = connection.settings_dict['NAME']
+        old_max_age = connection.settings_dict['CONN_MAX_AGE']
+        connection.settings_dict['TEST']['NAME'] = database
+        connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+
+        delay = QueryDelay(options['query_delay_ms'] / 1000)
+        if delay.seconds:
+            connection_created.connect(delay.install)
+        results = {}
+        try:
+            seed_catalog(options)
+            tokens = self.create_students(options['students'])
+            topic_ids = list(Topic.objects.filter(question_count__gt=0).values_list('id', flat=True))
+            connections.close_all()
+            for mode in options['modes']:
+                if mode == 'asgi':
+                    # Под ASGI каждый запрос выполняет синхронный код в своём потоке:
+                    # постоянные соединения не переиспользуются, Django советует CONN_MAX_AGE = 0
+                    connection.settings_dict['CONN_MAX_AGE'] = 0
+                results[mode] = self.run_mode(mode, tokens, topic_ids, options)
+                connection.settings_dict['CONN_MAX_AGE'] = old_max_age
+        finally:
+            connection_created.disconnect(delay.install)
+            connection.settings_dict['CONN_MAX_AGE'] = old_max_age
+            connections.close_all()
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+
+        result = {
+            'created_at': datetime.now(timezone.utc).isoformat(),
+            'database': settings.DATABASES['default']['ENGINE'],
+            'students': options['students'],
+            'concurrency': options['concurrency'],
+            'workers': options['workers'],
+            'query_delay_ms': options['query_delay_ms'],
+            'modes': results,
+        }
+        self.report(result)
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as output:
+                json.dump(result, output, ensure_ascii=False, indent=2)
+
+    @staticmethod
+    def create_students(count):
+        password = make_password(PASSWORD)
+        users = CustomUser.objects.bulk_create([
+            CustomUser(username=f'asgi_bench_{i}', password=password) for i in range(count)
+        ])
+        return [str(access_token_for(user)) for user in users]
+
+    def run_mode(self, mode, tokens, topic_ids, options):
+        if mode == 'wsgi':
+            server = PooledWSGIServer(('127.0.0.1', 0), QuietWSGIRequestHandler, workers=options['workers'])
+            server.set_app(get_internal_wsgi_application())
+            server.daemon_threads = True
+            threading.Thread(target=server.serve_forever, daemon=True).start()
+            port = server.server_port
+        else:
+            server = ASGIServer(ASGIHandler())
+            port = server.start()
+        base_url = f'http://127.0.0.1:{port}'
+
+        recorder = Recorder()
+        rng = random.Random(options['seed'])
+        students = [
+            QuizStudent(base_url, MODES[mode], token, topic_ids, recorder, random.Random(rng.random()))
+            for token in tokens
+        ]
+        started = time.perf_counter()
+        try:
+            with ThreadPoolExecutor(max_workers=options['concurrency']) as pool:
+                for future in [pool.submit(student.run) for student in students]:
+                    future.result()
+        finally:
+            if mode == 'wsgi':
+                server.shutdown()
+                server.server_close()
+            else:
+                server.stop()
+        duration = time.perf_counter() - started
+
+        endpoints = recorder.summary(duration)
+        total = sum(endpoint['requests'] for endpoint in endpoints.values())
+        return {
+            'duration_s': round(duration, 3),
+            'requests': total,
+            'errors': sum(endpoint['errors'] for endpoint in endpoints.values()),
+            'rps': round(total / duration, 2),
+            'endpoints': endpoints,
+        }
+
+    def report(self, result):
+        self.stdout.write(
+            f"{result['students']} учеников, одновременно {result['concurrency']}, "
+            f"потоков WSGI {result['workers']}, задержка SQL {result['query_delay_ms']} мс"
+        )
+        self.stdout.write(
+            f"{'режим':<6} {'эндпоинт':<14} {'запросов':>8} {'ошибок':>7} {'RPS':>8} "
+            f"{'p50, мс':>9} {'p95, мс':>9} {'p99, мс':>9}"
+        )
+        for mode, data in result['modes'].items():
+            for name, endpoint in data['endpoints'].items():
+                self.stdout.write(
+                    f"{mode:<6} {name:<14} {endpoint['requests']:>8} {endpoint['errors']:>7} {endpoint['rps']:>8} "
+                    f"{endpoint['p50_ms']:>9} {endpoint['p95_ms']:>9} {endpoint['p99_ms']:>9}"
+                )
+        for mode, data in result['modes'].items():
+            self.stdout.write(
+                f"{mode}: {data['requests']} запросов за {data['duration_s']} с, "
+                f"{data['rps']} RPS, ошибок: {data['errors']}"
+            )
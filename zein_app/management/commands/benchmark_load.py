@@ -0,0 +1,296 @@
+import json
+import math
+import os
+import random
+import subprocess
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.core.servers.basehttp import ThreadedWSGIServer, WSGIRequestHandler, get_internal_wsgi_application
+from django.db import connection, connections
+from django.test.utils import override_settings
+
+from zein_app.models import Subject, Topic, Question, Choice
+from zein_app.scale_data import PRESETS, ScaleDataSeeder
+
+PASSWORD = 'Bench_pass1!'
+
+
+class QuietWSGIRequestHandler(WSGIRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+
+def percentile(values, percent):
+    """Перцентиль по ближайшему рангу для отсортированного списка."""
+    if not values:
+        return None
+    rank = max(1, math.ceil(percent / 100 * len(values)))
+    return values[rank - 1]
+
+
+class Recorder:
+    def __init__(self):
+        self.latencies = {}
+        self.errors = {}
+        self._lock = threading.Lock()
+
+    def add(self, endpoint, elapsed, ok):
+        with self._lock:
+            self.latencies.setdefault(endpoint, []).append(elapsed)
+            if not ok:
+                self.errors[endpoint] = self.errors.get(endpoint, 0) + 1
+
+    def summary(self, duration):
+        endpoints = {}
+        for endpoint, values in sorted(self.latencies.items()):
+            values = sorted(values)
+            endpoints[endpoint] = {
+                'requests': len(values),
+                'errors': self.errors.get(endpoint, 0),
+                'rps': round(len(values) / duration, 2),
+                'mean_ms': round(sum(values) / len(values) * 1000, 2),
+                'p50_ms': round(percentile(values, 50) * 1000, 2),
+                'p95_ms': round(percentile(values, 95) * 1000, 2),
+                'p99_ms': round(percentile(values, 99) * 1000, 2),
+                'max_ms': round(values[-1] * 1000, 2),
+            }
+        return endpoints
+
+
+def seed_catalog(options):
+    """Каталог для прогона: пресет seed_scale_data или --subjects/--topics/--questions/--choices."""
+    if options['preset']:
+        ScaleDataSeeder(preset=options['preset'], seed=options['seed']).run()
+        return
+    subjects = Subject.objects.bulk_create([
+        Subject(name=f'Предмет {i}', title_ru=f'Предмет {i}') for i in range(options['subjects'])
+    ])
+    topics = Topic.objects.bulk_create([
+        Topic(subject=subject, name=f'Тема {j}', question_count=options['questions'])
+        for subject in subjects
+        for j in range(options['topics'])
+    ])
+    Subject.objects.update(topic_count=options['topics'])
+    questions = Question.objects.bulk_create([
+        Question(topic=topic, text=f'Вопрос {k}')
+        for topic in topics
+        for k in range(options['questions'])
+    ])
+    Choice.objects.bulk_create([
+        Choice(question=question, text=f'Вариант {c}', is_correct=c == 0)
+        for question in questions
+        for c in range(options['choices'])
+    ], batch_size=2000)
+
+
+class Student:
+    """Один ученик: регистрация, вход, каталог, викторина целиком и результаты."""
+
+    def __init__(self, base_url, number, recorder, rng):
+        self.base_url = base_url
+        self.username = f'bench_{number}_{rng.randrange(10 ** 9)}'
+        self.recorder = recorder
+        self.rng = rng
+        self.token = None
+
+    def request(self, method, path, endpoint, payload=None):
+        data = json.dumps(payload).encode() if payload is not None else None
+        request = urllib.request.Request(self.base_url + path, data=data, method=method)
+        request.add_header('Content-Type', 'application/json')
+        if self.token:
+            request.add_header('Authorization', f'Bearer {self.token}')
+
+        started = time.perf_counter()
+        try:
+            with urllib.request.urlopen(request, timeout=60) as response:
+                body = response.read()
+            ok = True
+        except urllib.error.HTTPError as error:
+            body = error.read()
+            ok = False
+        except OSError:
+            body = b''
+            ok = False
+        self.recorder.add(f'{method} {endpoint}', time.perf_counter() - started, ok)
+
+        if not ok:
+            return None
+        return json.loads(body) if body else {}
+
+    def run(self):
+        registered = self.request('POST', '/api/auth/register/', '/api/auth/register/', {
+            'username': self.username, 'email': f'{self.username}@example.com', 'password': PASSWORD,
+        })
+        if registered is None:
+            return
+        login = self.request('POST', '/api/auth/login/', '/api/auth/login/', {
+            'username': self.username, 'password': PASSWORD,
+        })
+        if login is None:
+            return
+        self.token = login['access']
+
+        subjects = self.request('GET', '/subjects/', '/subjects/')
+        if not subjects:
+            return
+        subject = self.rng.choice(subjects)
+        self.request('GET', f"/subjects/{subject['id']}/", '/subjects/{id}/')
+        topics = self.request('GET', f"/topics/?subject_id={subject['id']}", '/topics/?subject_id=')
+        topics = [topic for topic in topics or [] if topic['question_count']]
+        if not topics:
+            return
+        topic = self.rng.choice(topics)
+        self.request('GET', f"/topics/{topic['id']}/", '/topics/{id}/')
+
+        started = self.request('POST', '/quiz/', '/quiz/', {'topic': topic['id']})
+        if started is None:
+            return
+        quiz_id, question = started['quiz_id'], started['question']
+        while question:
+            answered = self.request('POST', f'/quiz/{quiz_id}/answer/', '/quiz/{id}/answer/', {
+                'question_id': question['id'],
+                'choice_id': self.rng.choice(question['choices'])['id'],
+            })
+            if answered is None:
+                return
+            question = answered.get('next_question')
+
+        self.request('GET', f'/quiz/{quiz_id}/', '/quiz/{id}/')
+
+
+class Command(BaseCommand):
+    help = (
+        'Нагрузочный прогон сценария ученика (регистрация, вход, каталог, викторина, результаты) '
+        'против WSGI-сервера в этом же процессе на временной базе SQLite. '
+        'Сравнение с ASGI-приложением (bot_zein/asgi.py) — в команде benchmark_asgi'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--students', type=int, default=50, help='Сколько учеников пройдут сценарий')
+        parser.add_argument('--concurrency', type=int, default=10, help='Сколько учеников работают одновременно')
+        parser.add_argument('--subjects', type=int, default=3)
+        parser.add_argument('--topics', type=int, default=5, help='Тем в каждом предмете')
+        parser.add_argument('--questions', type=int, default=10, help='Вопросов в каждой теме')
+        parser.add_argument('--choices', type=int, default=4)
+        parser.add_argument('--preset', choices=PRESETS,
+                            help='Вместо --subjects/--topics/... заполнить базу генератором seed_scale_data')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--database', help='Файл временной базы (по умолчанию во временном каталоге)')
+        parser.add_argument('--output', default='load_benchmark.json', help='Куда сохранить результаты в JSON')
+        parser.add_argument('--compare', help='JSON прошлого прогона для сравнения p95 и RPS')
+
+    def handle(self, *args, **options):
+        database = options['database'] or os.path.join(tempfile.mkdtemp(), 'benchmark.sqlite3')
+        old_name = connection.settings_dict['NAME']
+        connection.settings_dict['TEST']['NAME'] = database
+        connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        # Все студенты ходят с 127.0.0.1: лимиты по IP на вход и регистрацию (zein_app.throttling) отключаем
+        rates = {
+            scope: rate for scope, rate in settings.REST_FRAMEWORK.get('DEFAULT_THROTTLE_RATES', {}).items()
+            if not scope.endswith('_ip')
+        }
+        try:
+            self.seed(options)
+            with override_settings(REST_FRAMEWORK=dict(settings.REST_FRAMEWORK, DEFAULT_THROTTLE_RATES=rates)):
+                result = self.run(options)
+        finally:
+            connections.close_all()
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+
+        self.report(result)
+        with open(options['output'], 'w', encoding='utf-8') as output:
+            json.dump(result, output, ensure_ascii=False, indent=2)
+        self.stdout.write(self.style.SUCCESS(f"Результаты сохранены в {options['output']}"))
+
+        if options['compare']:
+            with open(options['compare'], encoding='utf-8') as previous:
+                self.compare(json.load(previous), result)
+
+    def seed(self, options):
+        seed_catalog(options)
+
+    def run(self, options):
+        server = ThreadedWSGIServer(('127.0.0.1', 0), QuietWSGIRequestHandler)
+        server.set_app(get_internal_wsgi_application())
+        server.daemon_threads = True
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        base_url = f'http://127.0.0.1:{server.server_port}'
+
+        recorder = Recorder()
+        rng = random.Random(options['seed'])
+        students = [
+            Student(base_url, number, recorder, random.Random(rng.random()))
+            for number in range(options['students'])
+        ]
+        started = time.perf_counter()
+        try:
+            with ThreadPoolExecutor(max_workers=options['concurrency']) as pool:
+                for future in [pool.submit(student.run) for student in students]:
+                    future.result()
+        finally:
+            server.shutdown()
+            server.server_close()
+        duration = time.perf_counter() - started
+
+        endpoints = recorder.summary(duration)
+        total = sum(endpoint['requests'] for endpoint in endpoints.values())
+        return {
+            'created_at': datetime.now(timezone.utc).isoformat(),
+            'commit': self.git_commit(),
+            'database': settings.DATABASES['default']['ENGINE'],
+            'students': options['students'],
+            'concurrency': options['concurrency'],
+            'dataset': (
+                {'preset': options['preset']} if options['preset']
+                else {key: options[key] for key in ('subjects', 'topics', 'questions', 'choices')}
+            ),
+            'duration_s': round(duration, 3),
+            'requests': total,
+            'errors': sum(endpoint['errors'] for endpoint in endpoints.values()),
+            'rps': round(total / duration, 2),
+            'endpoints': endpoints,
+        }
+
+    @staticmethod
+    def git_commit():
+        try:
+            return subprocess.run(
+                ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True,
+                cwd=settings.BASE_DIR
+            ).stdout.strip()
+        except (OSError, subprocess.CalledProcessError):
+            return None
+
+    def report(self, result):
+        self.stdout.write(
+            f"{'эндпоинт':<28} {'запросов':>8} {'ошибок':>7} {'RPS':>8} "
+            f"{'p50, мс':>9} {'p95, мс':>9} {'p99, мс':>9}"
+        )
+        for name, endpoint in result['endpoints'].items():
+            self.stdout.write(
+                f"{name:<28} {endpoint['requests']:>8} {endpoint['errors']:>7} {endpoint['rps']:>8} "
+                f"{endpoint['p50_ms']:>9} {endpoint['p95_ms']:>9} {endpoint['p99_ms']:>9}"
+            )
+        self.stdout.write(
+            f"Всего: {result['requests']} запросов за {result['duration_s']} с, "
+            f"{result['rps']} RPS, ошибок: {result['errors']}"
+        )
+
+    def compare(self, previous, current):
+        self.stdout.write(f"Сравнение с {previous.get('commit')} ({previous.get('created_at')}):")
+        for name, endpoint in current['endpoints'].items():
+            before = previous.get('endpoints', {}).get(name)
+            if not before:
+                continue
+            self.stdout.write(
+                f"{name:<28} p95 {before['p95_ms']:>9} → {endpoint['p95_ms']:<9} "
+                f"RPS {before['rps']:>8} → {endpoint['rps']}"
+            )
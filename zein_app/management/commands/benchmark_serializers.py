@@ -0,0 +1,68 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from zein_app.fast_serializers import question_choice_rows, questions_payload
+from zein_app.models import Subject, Topic, Question, Choice
+from zein_app.serializers import QuestionDetailSerializer
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = 'Сравнивает QuestionDetailSerializer с быстрыми dict-сериализаторами викторины'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', type=int, nargs='+', default=[1, 100, 10000])
+        parser.add_argument('--choices', type=int, default=4)
+        parser.add_argument('--repeat', type=int, default=5)
+
+    def handle(self, *args, **options):
+        self.stdout.write(f"{'вопросов':>10} {'DRF, мс':>12} {'dict, мс':>12} {'ускорение':>10}")
+        try:
+            with transaction.atomic():
+                # Данные для замера создаются во временной транзакции и откатываются
+                subject = Subject.objects.create(name='benchmark', title_ru='benchmark')
+                for size in options['sizes']:
+                    topic = self.create_topic(subject, size, options['choices'])
+                    drf = self.measure(options['repeat'], lambda: self.drf_payload(topic))
+                    fast = self.measure(options['repeat'], lambda: self.fast_payload(topic))
+                    self.stdout.write(f"{size:>10} {drf * 1000:>12.2f} {fast * 1000:>12.2f} {drf / fast:>9.1f}x")
+                raise Rollback
+        except Rollback:
+            pass
+
+    def create_topic(self, subject, size, choices):
+        topic = Topic.objects.create(subject=subject, name=f'benchmark {size}')
+        questions = Question.objects.bulk_create([
+            Question(topic=topic, text=f'Вопрос {i}', image=f'questions/{i}.png' if i % 2 else '')
+            for i in range(size)
+        ])
+        Choice.objects.bulk_create([
+            Choice(question=question, text=f'Вариант {j}', is_correct=j == 0)
+            for question in questions
+            for j in range(choices)
+        ])
+        return topic
+
+    @staticmethod
+    def drf_payload(topic):
+        questions = Question.objects.filter(topic=topic).prefetch_related('choices')
+        return QuestionDetailSerializer(questions, many=True).data
+
+    @staticmethod
+    def fast_payload(topic):
+        return questions_payload(question_choice_rows(question__topic=topic))
+
+    @staticmethod
+    def measure(repeat, func):
+        best = None
+        for _ in range(repeat):
+            started = time.perf_counter()
+            func()
+            elapsed = time.perf_counter() - started
+            best = elapsed if best is None else min(best, elapsed)
+        return best
@@ -0,0 +1,171 @@
+import json
+import multiprocessing
+import os
+import random
+import tempfile
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import OperationalError, connection, connections, transaction
+from django.db.models import F
+
+from zein_app.models import CustomUser, Subject, Topic, Question, Choice, Quiz, Request
+
+from .benchmark_load import percentile
+
+# Настройки соединения «как было» (стандартный backend без OPTIONS) и из settings.DATABASES
+PROFILES = {
+    'stock': {
+        'options': {'init_command': 'PRAGMA journal_mode=DELETE'},
+        'persistent': False,
+    },
+    'tuned': {
+        # WAL в проекте включает миграция 0010_sqlite_wal, а профиль stock переводит файл обратно в DELETE
+        'options': dict(
+            settings.DATABASES['default'].get('OPTIONS', {}),
+            init_command=';'.join(filter(None, [
+                'PRAGMA journal_mode=WAL', settings.DATABASES['default'].get('OPTIONS', {}).get('init_command'),
+            ])),
+        ),
+        'persistent': True,
+    },
+}
+
+
+def worker(number, options, persistent, duration, write_ratio, seed, results):
+    """Процесс-нагрузчик: читает каталог и пишет ответы, пока не выйдет время."""
+    connection.settings_dict['OPTIONS'] = dict(options)
+    connection.settings_dict['CONN_MAX_AGE'] = None if persistent else 0
+    rng = random.Random(seed * 1000 + number)
+    topic_ids = list(Topic.objects.values_list('id', flat=True))
+    quiz_id = Quiz.objects.filter(user__username=f'sqlite_bench_{number}').values_list('id', flat=True).get()
+
+    stats = {'reads': 0, 'writes': 0, 'errors': 0, 'read_latencies': [], 'write_latencies': []}
+    deadline = time.monotonic() + duration
+    while time.monotonic() < deadline:
+        write = rng.random() < write_ratio
+        started = time.perf_counter()
+        try:
+            if write:
+                # Чтение, затем запись в одной транзакции — как в ответе на вопрос викторины
+                with transaction.atomic():
+                    position = Quiz.objects.filter(pk=quiz_id).values_list('position', flat=True).get()
+                    Quiz.objects.filter(pk=quiz_id).update(position=position + 1, score=F('score') + 1)
+                    Request.objects.create(name=f'bench {number}', phone_number=str(position))
+            else:
+                topic_id = rng.choice(topic_ids)
+                rows = list(Question.objects.filter(topic_id=topic_id).values('id', 'text')[:20])
+                list(Choice.objects.filter(question_id__in=[row['id'] for row in rows]).values('id', 'text'))
+        except OperationalError:
+            stats['errors'] += 1
+        else:
+            stats['writes' if write else 'reads'] += 1
+            stats['write_latencies' if write else 'read_latencies'].append(time.perf_counter() - started)
+        if not persistent:
+            # CONN_MAX_AGE = 0: новое соединение на каждый запрос
+            connection.close()
+    connection.close()
+    results.put(stats)
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнивает пропускную способность SQLite при одновременном чтении и записи из нескольких '
+        'процессов: стандартные настройки против WAL / BEGIN IMMEDIATE / busy_timeout из settings'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--processes', type=int, default=4)
+        parser.add_argument('--seconds', type=float, default=5.0, help='Длительность прогона каждого профиля')
+        parser.add_argument('--write-ratio', type=float, default=0.3, help='Доля пишущих операций')
+        parser.add_argument('--profiles', nargs='+', choices=PROFILES, default=list(PROFILES))
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--output', help='Сохранить результаты в JSON')
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'sqlite':
+            raise CommandError('Бенчмарк только для SQLite')
+        if 'fork' not in multiprocessing.get_all_start_methods():
+            raise CommandError('Нужна платформа с fork()')
+
+        database = os.path.join(tempfile.mkdtemp(), 'sqlite_benchmark.sqlite3')
+        old_name = connection.settings_dict['NAME']
+        connection.settings_dict['TEST']['NAME'] = database
+        connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        results = {}
+        try:
+            self.seed(options)
+            for name in options['profiles']:
+                results[name] = self.run_profile(name, options)
+        finally:
+            connections.close_all()
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+
+        self.report(results, options)
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as output:
+                json.dump(results, output, ensure_ascii=False, indent=2)
+
+    def seed(self, options):
+        subject = Subject.objects.create(name='Математика', title_ru='Математика')
+        topics = Topic.objects.bulk_create([Topic(subject=subject, name=f'Тема {i}') for i in range(20)])
+        questions = Question.objects.bulk_create([
+            Question(topic=topic, text=f'Вопрос {j}') for topic in topics for j in range(50)
+        ])
+        Choice.objects.bulk_create([
+            Choice(question=question, text=f'Вариант {c}', is_correct=c == 0) for question in questions for c in range(4)
+        ])
+        for number in range(options['processes']):
+            user = CustomUser.objects.create(username=f'sqlite_bench_{number}')
+            Quiz.objects.create(user=user, topic=topics[0])
+
+    def run_profile(self, name, options):
+        profile = PROFILES[name]
+        # Режим журнала меняется, пока к файлу подключён только этот процесс
+        connections.close_all()
+        connection.settings_dict['OPTIONS'] = dict(profile['options'])
+        connection.ensure_connection()
+        connections.close_all()
+
+        context = multiprocessing.get_context('fork')
+        queue = context.Queue()
+        processes = [
+            context.Process(target=worker, args=(
+                number, profile['options'], profile['persistent'], options['seconds'],
+                options['write_ratio'], options['seed'], queue,
+            ))
+            for number in range(options['processes'])
+        ]
+        for process in processes:
+            process.start()
+        stats = [queue.get() for _ in processes]
+        for process in processes:
+            process.join()
+
+        reads = sum(item['reads'] for item in stats)
+        writes = sum(item['writes'] for item in stats)
+        read_latencies = sorted(value for item in stats for value in item['read_latencies'])
+        write_latencies = sorted(value for item in stats for value in item['write_latencies'])
+        return {
+            'reads_per_s': round(reads / options['seconds'], 1),
+            'writes_per_s': round(writes / options['seconds'], 1),
+            'errors': sum(item['errors'] for item in stats),
+            'read_p95_ms': round((percentile(read_latencies, 95) or 0) * 1000, 2),
+            'write_p95_ms': round((percentile(write_latencies, 95) or 0) * 1000, 2),
+            'write_max_ms': round((write_latencies[-1] if write_latencies else 0) * 1000, 2),
+        }
+
+    def report(self, results, options):
+        self.stdout.write(
+            f"{options['processes']} процессов, {options['seconds']} с, доля записи {options['write_ratio']}"
+        )
+        self.stdout.write(
+            f"{'профиль':<8} {'чтений/с':>9} {'записей/с':>10} {'ошибок':>7} "
+            f"{'p95 чтения, мс':>15} {'p95 записи, мс':>15} {'max записи, мс':>15}"
+        )
+        for name, result in results.items():
+            self.stdout.write(
+                f"{name:<8} {result['reads_per_s']:>9} {result['writes_per_s']:>10} {result['errors']:>7} "
+                f"{result['read_p95_ms']:>15} {result['write_p95_ms']:>15} {result['write_max_ms']:>15}"
+            )
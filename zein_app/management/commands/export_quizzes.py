@@ -0,0 +1,46 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+
+from zein_app.exports import EXPORT_FORMATS, EXPORTS, stream_export
+from zein_app.models import Quiz
+
+
+class Command(BaseCommand):
+    help = 'Потоково выгружает викторины или ответы пользователей в NDJSON/CSV'
+
+    def add_arguments(self, parser):
+        parser.add_argument('kind', choices=sorted(EXPORTS))
+        parser.add_argument('--format', dest='export_format', choices=EXPORT_FORMATS, default='ndjson')
+        parser.add_argument('--output', help='Файл для выгрузки (по умолчанию stdout)')
+        parser.add_argument('--topic-id', type=int)
+        parser.add_argument('--status', choices=[value for value, _ in Quiz.STATUS_CHOICES])
+        parser.add_argument('--date-from', type=date.fromisoformat)
+        parser.add_argument('--date-to', type=date.fromisoformat)
+        parser.add_argument('--chunk-size', type=int, default=2000)
+
+    def handle(self, *args, **options):
+        if options['date_from'] and options['date_to'] and options['date_from'] > options['date_to']:
+            raise CommandError('--date-from не может быть позже --date-to')
+
+        lines = stream_export(
+            options['kind'],
+            options['export_format'],
+            topic_id=options['topic_id'],
+            status=options['status'],
+            date_from=options['date_from'],
+            date_to=options['date_to'],
+            chunk_size=options['chunk_size'],
+        )
+
+        if not options['output']:
+            for line in lines:
+                self.stdout.write(line, ending='')
+            return
+
+        count = 0
+        with open(options['output'], 'w', encoding='utf-8', newline='') as output:
+            for line in lines:
+                output.write(line)
+                count += 1
+        self.stderr.write(self.style.SUCCESS(f'Выгружено строк: {count} → {options["output"]}'))
@@ -0,0 +1,47 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from zein_app.importers import IMPORT_FORMATS, ImportFormatError, QuestionImporter, detect_format, read_rows
+
+
+class Command(BaseCommand):
+    help = 'Импортирует банк вопросов из CSV / JSON Lines / JSON / XLSX'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+        parser.add_argument('--format', dest='file_format', choices=IMPORT_FORMATS,
+                            help='Формат файла (по умолчанию — по расширению)')
+        parser.add_argument('--chunk-size', type=int, default=1000)
+        parser.add_argument('--dry-run', action='store_true', help='Только проверить строки, ничего не записывать')
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+
+        def progress(report):
+            self.stdout.write(
+                f"Строк: {report['rows']}, вопросов: {report['questions']}, "
+                f"ошибок: {report['invalid']} ({time.perf_counter() - started:.1f} с)"
+            )
+
+        importer = QuestionImporter(
+            chunk_size=options['chunk_size'],
+            dry_run=options['dry_run'],
+            progress=progress,
+        )
+        try:
+            file_format = options['file_format'] or detect_format(options['path'])
+            with open(options['path'], 'rb') as source:
+                report = importer.run(read_rows(source, file_format))
+        except (OSError, ImportFormatError, ValueError) as error:
+            raise CommandError(f'Ошибка импорта: {error}')
+
+        for error in report['errors']:
+            self.stderr.write(f"Строка {error['row']}: {error['error']}")
+
+        prefix = 'Проверка завершена' if report['dry_run'] else 'Импорт завершён'
+        self.stdout.write(self.style.SUCCESS(
+            f"{prefix}: вопросов — {report['questions']}, вариантов — {report['choices']}, "
+            f"новых тем — {report['topics_created']}, новых предметов — {report['subjects_created']}, "
+            f"пропущено строк — {report['invalid']} за {time.perf_counter() - started:.1f} с"
+        ))
@@ -0,0 +1,67 @@
+import gzip
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import models, transaction
+
+from zein_app.bad_passwords import bad_password_filter
+from zein_app.models import BadPassword, bad_password_hash
+
+
+def read_passwords(path, encoding):
+    opener = gzip.open if path.endswith('.gz') else open
+    with opener(path, 'rt', encoding=encoding, errors='replace', newline='') as source:
+        for line in source:
+            password = line.rstrip('\r\n')
+            if password:
+                yield password
+
+
+class Command(BaseCommand):
+    help = (
+        'Загружает список распространённых паролей (по одному в строке, можно .gz) в BadPassword: '
+        'хранятся только SHA-1 в нижнем регистре, дубликаты пропускаются'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+        parser.add_argument('--encoding', default='utf-8')
+        parser.add_argument('--chunk-size', type=int, default=5000)
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        before = BadPassword.objects.count()
+        read = 0
+        chunk = set()
+        try:
+            for password in read_passwords(options['path'], options['encoding']):
+                read += 1
+                chunk.add(bad_password_hash(password))
+                if len(chunk) >= options['chunk_size']:
+                    self.save(chunk)
+                    chunk = set()
+                    self.stdout.write(f'Прочитано строк: {read} ({time.perf_counter() - started:.1f} с)')
+            self.save(chunk)
+        except (OSError, LookupError, UnicodeError) as error:
+            raise CommandError(f'Ошибка чтения {options["path"]}: {error}')
+
+        # Процессы перестроят массив префиксов при следующей проверке пароля
+        bad_password_filter.bump_version()
+        added = BadPassword.objects.count() - before
+        self.stdout.write(self.style.SUCCESS(
+            f'Загружено: строк — {read}, новых паролей — {added}, '
+            f'всего в списке — {before + added} за {time.perf_counter() - started:.1f} с'
+        ))
+
+    @staticmethod
+    def save(hashes):
+        if not hashes:
+            return
+        with transaction.atomic():
+            # В обход BadPasswordQuerySet.bulk_create: он обновляет версию фильтра, и процессы
+            # перестраивали бы массив на каждом чанке, а не один раз после загрузки
+            models.QuerySet.bulk_create(
+                BadPassword.objects.all(),
+                [BadPassword(password_hash=password_hash) for password_hash in sorted(hashes)],
+                ignore_conflicts=True,
+            )
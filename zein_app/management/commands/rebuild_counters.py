@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from zein_app.counters import rebuild_question_counts, rebuild_topic_counts
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает счётчики Topic.question_count и Subject.topic_count'
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            topics = rebuild_question_counts()
+            subjects = rebuild_topic_counts()
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Счётчики пересчитаны: тем — {topics}, предметов — {subjects}'
+        ))
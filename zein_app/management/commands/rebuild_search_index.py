@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from zein_app.models import QuestionSearchIndex, TopicSearchIndex
+from zein_app.search import fts_enabled, rebuild_search_index
+
+
+class Command(BaseCommand):
+    help = 'Пересоздаёт полнотекстовый индекс (FTS5) вопросов и тем вместе с триггерами'
+
+    def handle(self, *args, **options):
+        if not fts_enabled():
+            raise CommandError('Полнотекстовый индекс поддерживается только на SQLite (FTS5)')
+
+        with transaction.atomic():
+            rebuild_search_index()
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Индекс пересобран: вопросов — {QuestionSearchIndex.objects.count()}, '
+            f'тем — {TopicSearchIndex.objects.count()}'
+        ))
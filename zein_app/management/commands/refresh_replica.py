@@ -0,0 +1,45 @@
+import sqlite3
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from zein_app.db_router import PRIMARY, REPLICA, replica_configured
+
+
+class Command(BaseCommand):
+    help = (
+        'Копирует основную базу SQLite в реплику (алиас replica) через backup API. '
+        'С --interval повторяет копирование, имитируя отстающую реплику'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--interval', type=float, help='Обновлять реплику каждые N секунд, пока не прервут')
+        parser.add_argument('--pages', type=int, default=1024,
+                            help='Страниц за шаг копирования: между шагами писатели не ждут')
+
+    def handle(self, *args, **options):
+        if not replica_configured():
+            raise CommandError('Алиас replica не настроен: задайте REPLICA_DATABASE_NAME')
+        source, target = connections[PRIMARY].settings_dict, connections[REPLICA].settings_dict
+        if source['ENGINE'] != 'django.db.backends.sqlite3' or target['ENGINE'] != source['ENGINE']:
+            raise CommandError('refresh_replica только для SQLite: настоящую реплику ведёт сама СУБД')
+
+        while True:
+            started = time.perf_counter()
+            self.copy(str(source['NAME']), str(target['NAME']), options['pages'])
+            self.stdout.write(f"Реплика обновлена за {time.perf_counter() - started:.2f} с")
+            if not options['interval']:
+                break
+            time.sleep(options['interval'])
+
+    @staticmethod
+    def copy(source_name, target_name, pages):
+        source = sqlite3.connect(source_name)
+        target = sqlite3.connect(target_name, timeout=30)
+        try:
+            # Копия пишется в тот же файл реплики: открытые соединения читателей её увидят
+            source.backup(target, pages=pages)
+        finally:
+            target.close()
+            source.close()
@@ -0,0 +1,48 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from zein_app.scale_data import PRESETS, ScaleDataSeeder, flush_scale_data
+
+
+class Command(BaseCommand):
+    help = (
+        'Создаёт синтетические данные для нагрузочных прогонов: предметы, темы, вопросы, '
+        'пользователей, викторины и ответы. Повторный запуск продолжает прерванную загрузку'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--preset', choices=PRESETS, default='small')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--chunk-size', type=int, default=5000)
+        parser.add_argument('--flush', action='store_true', help='Удалить ранее созданные данные и выйти')
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+
+        if options['flush']:
+            deleted = flush_scale_data()
+            summary = ', '.join(f'{label} — {count}' for label, count in deleted.items() if count)
+            self.stdout.write(self.style.SUCCESS(f"Удалено: {summary or 'ничего'}"))
+            return
+
+        def progress(stage, done, total):
+            self.stdout.write(f'{stage}: {done}/{total} ({time.perf_counter() - started:.1f} с)')
+
+        seeder = ScaleDataSeeder(
+            preset=options['preset'],
+            seed=options['seed'],
+            chunk_size=options['chunk_size'],
+            progress=progress,
+        )
+        try:
+            report = seeder.run()
+        except ValueError as error:
+            raise CommandError(str(error))
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Создано: предметов — {report['subjects']}, тем — {report['topics']}, "
+            f"вопросов — {report['questions']}, вариантов — {report['choices']}, "
+            f"пользователей — {report['users']}, викторин — {report['quizzes']}, "
+            f"ответов — {report['answers']} за {time.perf_counter() - started:.1f} с"
+        ))
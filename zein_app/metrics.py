@@ -0,0 +1,318 @@
+"""
+Метрики в текстовом формате Prometheus (GET /metrics).
+
+Каждый процесс (веб-воркеры gunicorn, run_bot) копит значения в памяти и
+не чаще раза в METRICS_FLUSH_INTERVAL секунд атомарно переписывает свой
+файл в METRICS_DIR. /metrics складывает файлы всех процессов, поэтому
+числа сходятся при любом числе воркеров. Файлы завершившихся процессов
+(PID в имени файла больше не существует) /metrics удаляет — для
+Prometheus это сброс счётчиков, как и при перезапуске единственного
+процесса. Каталог должен быть свой у каждой машины: PID других машин
+здесь не проверить.
+
+Сторонние пакеты и сеть не нужны.
+"""
+import atexit
+import functools
+import json
+import math
+import os
+import tempfile
+import threading
+import time
+import uuid
+from contextlib import ExitStack
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import connections
+from django.http import HttpResponse, HttpResponseForbidden
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SIZE_BUCKETS = (100, 1_000, 10_000, 100_000, 1_000_000, 10_000_000)
+QUERY_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100)
+
+# имя: (тип, описание, границы корзин для гистограмм)
+METRICS = {
+    'http_requests_total': ('counter', 'Запросы по маршруту, методу и статусу', None),
+    'http_request_duration_seconds': ('histogram', 'Время обработки запроса', LATENCY_BUCKETS),
+    'http_response_size_bytes': ('histogram', 'Размер тела ответа', SIZE_BUCKETS),
+    'http_request_sql_queries': ('histogram', 'SQL-запросов на один HTTP-запрос', QUERY_BUCKETS),
+    'http_request_sql_seconds_total': ('counter', 'Суммарное время SQL по маршруту', None),
+    'bot_handler_duration_seconds': ('histogram', 'Время обработчиков Telegram-бота', LATENCY_BUCKETS),
+    'bot_handler_errors_total': ('counter', 'Исключения в обработчиках Telegram-бота', None),
+    'auth_throttled_total': ('counter', 'Отклонённые попытки входа и регистрации (429) по лимиту', None),
+}
+CACHE_METRICS = {
+    'catalog_cache_hits_total': ('hits', 'Попадания в кэш каталога'),
+    'catalog_cache_misses_total': ('misses', 'Промахи кэша каталога'),
+    'catalog_cache_evictions_total': ('evictions', 'Вытеснения из кэша каталога'),
+}
+
+
+class MetricsStore:
+    """Значения метрик этого процесса и их сохранение в файл процесса."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        # После fork (gunicorn --preload) у дочернего процесса свой файл и свои значения
+        self._values = {}
+        self._flushed_at = 0.0
+        self.process_id = f'{os.getpid()}-{uuid.uuid4().hex[:8]}'
+
+    @staticmethod
+    def directory():
+        return getattr(settings, 'METRICS_DIR', None)
+
+    def inc(self, name, labels, amount=1):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+        self.maybe_flush()
+
+    def observe(self, name, labels, value):
+        buckets = METRICS[name][2]
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            histogram = self._values.get(key)
+            if histogram is None:
+                histogram = self._values[key] = {'buckets': [0] * len(buckets), 'sum': 0.0, 'count': 0}
+            for i, bound in enumerate(buckets):
+                if value <= bound:
+                    histogram['buckets'][i] += 1
+            histogram['sum'] += value
+            histogram['count'] += 1
+        self.maybe_flush()
+
+    def snapshot(self):
+        from .catalog_cache import catalog_cache
+
+        with self._lock:
+            samples = [
+                {'name': name, 'labels': dict(labels),
+                 'value': dict(value, buckets=list(value['buckets'])) if isinstance(value, dict) else value}
+                for (name, labels), value in self._values.items()
+            ]
+        stats = catalog_cache.stats()
+        samples += [
+            {'name': name, 'labels': {}, 'value': stats[field]} for name, (field, _) in CACHE_METRICS.items()
+        ]
+        return samples
+
+    def maybe_flush(self):
+        interval = getattr(settings, 'METRICS_FLUSH_INTERVAL', 1.0)
+        if time.monotonic() - self._flushed_at >= interval:
+            self.flush()
+
+    def flush(self):
+        directory = self.directory()
+        if not directory:
+            return
+        self._flushed_at = time.monotonic()
+        os.makedirs(directory, exist_ok=True)
+        handle, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+        try:
+            with os.fdopen(handle, 'w', encoding='utf-8') as output:
+                json.dump(self.snapshot(), output, ensure_ascii=False)
+            os.replace(tmp_path, os.path.join(directory, f'metrics-{self.process_id}.json'))
+        except OSError:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    def collect(self):
+        """Значения всех процессов: {(name, labels): value}, для своего процесса — из памяти."""
+        own_file = f'metrics-{self.process_id}.json'
+        sources = [self.snapshot()]
+        directory = self.directory()
+        if directory and os.path.isdir(directory):
+            for filename in sorted(os.listdir(directory)):
+                if not filename.startswith('metrics-') or not filename.endswith('.json') or filename == own_file:
+                    continue
+                if not process_alive(filename):
+                    try:
+                        os.remove(os.path.join(directory, filename))
+                    except OSError:
+                        pass
+                    continue
+                try:
+                    with open(os.path.join(directory, filename), encoding='utf-8') as source:
+                        sources.append(json.load(source))
+                except (OSError, ValueError):
+                    continue
+
+        totals = {}
+        for samples in sources:
+            for sample in samples:
+                key = (sample['name'], tuple(sorted(sample['labels'].items())))
+                value = sample['value']
+                if isinstance(value, dict):
+                    total = totals.setdefault(key, {'buckets': [0] * len(value['buckets']), 'sum': 0.0, 'count': 0})
+                    total['buckets'] = [a + b for a, b in zip(total['buckets'], value['buckets'])]
+                    total['sum'] += value['sum']
+                    total['count'] += value['count']
+                else:
+                    totals[key] = totals.get(key, 0) + value
+        return totals
+
+
+def process_alive(filename):
+    """Жив ли процесс, записавший metrics-<pid>-<uuid>.json."""
+    try:
+        pid = int(filename[len('metrics-'):].split('-', 1)[0])
+    except ValueError:
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except OSError:
+        # PermissionError: процесс есть, но чужой
+        return True
+    return True
+
+
+store = MetricsStore()
+atexit.register(store.flush)
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=store.reset)
+
+
+def _escape(value):
+    return str(value).replace('\\', r'\\').replace('\n', r'\n').replace('"', r'\"')
+
+
+def _labels(labels, extra=()):
+    pairs = list(labels) + list(extra)
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in pairs) + '}'
+
+
+def _number(value):
+    if isinstance(value, float) and math.isinf(value):
+        return '+Inf'
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+def render(totals):
+    lines = []
+    for name, (kind, description, buckets) in METRICS.items():
+        lines += [f'# HELP {name} {description}', f'# TYPE {name} {kind}']
+        for (sample_name, labels), value in sorted(totals.items()):
+            if sample_name != name:
+                continue
+            if kind == 'histogram':
+                for bound, count in zip(buckets, value['buckets']):
+                    lines.append(f'{name}_bucket{_labels(labels, [("le", _number(float(bound)))])} {count}')
+                lines.append(f'{name}_bucket{_labels(labels, [("le", "+Inf")])} {value["count"]}')
+                lines.append(f'{name}_sum{_labels(labels)} {_number(float(value["sum"]))}')
+                lines.append(f'{name}_count{_labels(labels)} {value["count"]}')
+            else:
+                lines.append(f'{name}{_labels(labels)} {_number(value)}')
+
+    cache = {}
+    for name, (field, description) in CACHE_METRICS.items():
+        cache[field] = totals.get((name, ()), 0)
+        lines += [f'# HELP {name} {description}', f'# TYPE {name} counter', f'{name} {cache[field]}']
+    lookups = cache['hits'] + cache['misses']
+    lines += [
+        '# HELP catalog_cache_hit_ratio Доля попаданий в кэш каталога по всем процессам',
+        '# TYPE catalog_cache_hit_ratio gauge',
+        f'catalog_cache_hit_ratio {_number(cache["hits"] / lookups if lookups else 0.0)}',
+    ]
+    return '\n'.join(lines) + '\n'
+
+
+def metrics_view(request):
+    allowed = getattr(settings, 'METRICS_ALLOWED_IPS', ('127.0.0.1', '::1'))
+    if request.META.get('REMOTE_ADDR') not in allowed and not request.user.is_staff:
+        return HttpResponseForbidden()
+    return HttpResponse(render(store.collect()), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+
+class SQLCounter:
+    def __init__(self):
+        self.queries = 0
+        self.seconds = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries += 1
+            self.seconds += time.perf_counter() - started
+
+
+class MetricsMiddleware:
+    """
+    Время, размер ответа и число SQL-запросов по имени маршрута (quiz-answer, topic-list, ...).
+
+    Под ASGI запросы к базе выполняются в потоках sync_to_async, у которых
+    свои соединения, и execute_wrapper их не видит: SQL-метрики пишутся
+    только для синхронных запросов.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        counter = SQLCounter()
+        started = time.perf_counter()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(counter))
+            response = self.get_response(request)
+        self.record(request, response, time.perf_counter() - started, counter)
+        return response
+
+    async def __acall__(self, request):
+        started = time.perf_counter()
+        response = await self.get_response(request)
+        self.record(request, response, time.perf_counter() - started, None)
+        return response
+
+    @staticmethod
+    def record(request, response, elapsed, counter):
+        match = getattr(request, 'resolver_match', None)
+        # Имя маршрута, а не путь: иначе каждый id давал бы свой ряд
+        route = match.url_name if match and match.url_name else 'unmatched'
+        if route == 'metrics':
+            return
+        labels = {'route': route, 'method': request.method}
+        store.inc('http_requests_total', dict(labels, status=str(response.status_code)))
+        store.observe('http_request_duration_seconds', labels, elapsed)
+        if counter is not None:
+            store.observe('http_request_sql_queries', labels, counter.queries)
+            store.inc('http_request_sql_seconds_total', labels, counter.seconds)
+        if not response.streaming:
+            store.observe('http_response_size_bytes', labels, len(response.content))
+
+
+def observe_handler(handler):
+    """Декоратор для async-обработчиков бота: время и исключения по имени обработчика."""
+    labels = {'handler': handler.__name__}
+
+    @functools.wraps(handler)
+    async def wrapper(*args, **kwargs):
+        started = time.perf_counter()
+        try:
+            return await handler(*args, **kwargs)
+        except Exception:
+            store.inc('bot_handler_errors_total', labels)
+            raise
+        finally:
+            store.observe('bot_handler_duration_seconds', labels, time.perf_counter() - started)
+
+    return wrapper
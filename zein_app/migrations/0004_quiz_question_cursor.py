@@ -0,0 +1,54 @@
+# Generated by Django 5.2 on 2026-10-18 20:20
+
+from django.db import migrations, models
+
+
+def freeze_quiz_questions(apps, schema_editor):
+    Quiz = apps.get_model('zein_app', 'Quiz')
+    Question = apps.get_model('zein_app', 'Question')
+    Choice = apps.get_model('zein_app', 'Choice')
+    UserAnswer = apps.get_model('zein_app', 'UserAnswer')
+
+    for quiz in Quiz.objects.all().iterator():
+        answered_ids = list(
+            UserAnswer.objects.filter(quiz_id=quiz.id)
+            .order_by('answered_at', 'id')
+            .values_list('question_id', flat=True)
+        )
+        remaining_ids = list(
+            Question.objects.filter(topic_id=quiz.topic_id)
+            .exclude(id__in=answered_ids)
+            # Порядок и отбор как у Quiz.questions_for_topic: вопросы без вариантов в викторину не попадают
+            .filter(models.Exists(Choice.objects.filter(question_id=models.OuterRef('pk'))))
+            .order_by('created_at', 'id')
+            .values_list('id', flat=True)
+        )
+        quiz.question_ids = answered_ids + remaining_ids
+        quiz.position = len(answered_ids)
+        update_fields = ['question_ids', 'position']
+        if quiz.status == 'in_progress':
+            # Незавершённую викторину считаем по тем вопросам, которые в ней остались
+            quiz.total_questions = len(quiz.question_ids)
+            update_fields.append('total_questions')
+        quiz.save(update_fields=update_fields)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('zein_app', '0003_request'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='quiz',
+            name='position',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='quiz',
+            name='question_ids',
+            field=models.JSONField(blank=True, default=list),
+        ),
+        migrations.RunPython(freeze_quiz_questions, migrations.RunPython.noop),
+    ]
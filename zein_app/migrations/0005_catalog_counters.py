@@ -0,0 +1,35 @@
+# Generated by Django 5.2 on 2026-10-18 20:23
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def fill_counters(apps, schema_editor):
+    Subject = apps.get_model('zein_app', 'Subject')
+    Topic = apps.get_model('zein_app', 'Topic')
+
+    for topic in Topic.objects.annotate(total=Count('questions')).iterator():
+        Topic.objects.filter(pk=topic.pk).update(question_count=topic.total)
+    for subject in Subject.objects.annotate(total=Count('topics')).iterator():
+        Subject.objects.filter(pk=subject.pk).update(topic_count=subject.total)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('zein_app', '0004_quiz_question_cursor'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='subject',
+            name='topic_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='topic',
+            name='question_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(fill_counters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,168 @@
+# Generated by Django 5.2 on 2026-10-18 20:35
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+# SQL зафиксирован здесь, а не импортирован из zein_app.search: изменения
+# поиска должны идти новой миграцией, а не менять уже применённую
+
+CREATE_SQL = [
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS zein_app_question_fts
+    USING fts5(text, explanation, topic, subject, tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3')
+    """,
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS zein_app_topic_fts
+    USING fts5(name, subject, tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3')
+    """,
+    # Веса колонок для bm25: совпадение в тексте вопроса важнее, чем в названии предмета
+    "INSERT INTO zein_app_question_fts(zein_app_question_fts, rank) VALUES ('rank', 'bm25(4.0, 1.0, 2.0, 1.0)')",
+    "INSERT INTO zein_app_topic_fts(zein_app_topic_fts, rank) VALUES ('rank', 'bm25(4.0, 1.0)')",
+    """
+    CREATE TRIGGER IF NOT EXISTS zein_app_question_fts_insert AFTER INSERT ON zein_app_question BEGIN
+        INSERT INTO zein_app_question_fts(rowid, text, explanation, topic, subject) VALUES (
+            new.id, new.text, coalesce(new.explanation, ''),
+            coalesce((SELECT name FROM zein_app_topic WHERE id = new.topic_id), ''),
+            coalesce((SELECT s.name FROM zein_app_topic t JOIN zein_app_subject s ON s.id = t.subject_id
+                      WHERE t.id = new.topic_id), '')
+        );
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS zein_app_question_fts_update
+    AFTER UPDATE OF text, explanation, topic_id ON zein_app_question BEGIN
+        DELETE FROM zein_app_question_fts WHERE rowid = old.id;
+        INSERT INTO zein_app_question_fts(rowid, text, explanation, topic, subject) VALUES (
+            new.id, new.text, coalesce(new.explanation, ''),
+            coalesce((SELECT name FROM zein_app_topic WHERE id = new.topic_id), ''),
+            coalesce((SELECT s.name FROM zein_app_topic t JOIN zein_app_subject s ON s.id = t.subject_id
+                      WHERE t.id = new.topic_id), '')
+        );
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS zein_app_question_fts_delete AFTER DELETE ON zein_app_question BEGIN
+        DELETE FROM zein_app_question_fts WHERE rowid = old.id;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS zein_app_topic_fts_insert AFTER INSERT ON zein_app_topic BEGIN
+        INSERT INTO zein_app_topic_fts(rowid, name, subject) VALUES (
+            new.id, new.name, coalesce((SELECT name FROM zein_app_subject WHERE id = new.subject_id), '')
+        );
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS zein_app_topic_fts_update
+    AFTER UPDATE OF name, subject_id ON zein_app_topic BEGIN
+        DELETE FROM zein_app_topic_fts WHERE rowid = old.id;
+        INSERT INTO zein_app_topic_fts(rowid, name, subject) VALUES (
+            new.id, new.name, coalesce((SELECT name FROM zein_app_subject WHERE id = new.subject_id), '')
+        );
+        UPDATE zein_app_question_fts
+        SET topic = new.name,
+            subject = coalesce((SELECT name FROM zein_app_subject WHERE id = new.subject_id), '')
+        WHERE rowid IN (SELECT id FROM zein_app_question WHERE topic_id = new.id);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS zein_app_topic_fts_delete AFTER DELETE ON zein_app_topic BEGIN
+        DELETE FROM zein_app_topic_fts WHERE rowid = old.id;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS zein_app_subject_fts_update
+    AFTER UPDATE OF name ON zein_app_subject BEGIN
+        UPDATE zein_app_topic_fts SET subject = new.name
+        WHERE rowid IN (SELECT id FROM zein_app_topic WHERE subject_id = new.id);
+        UPDATE zein_app_question_fts SET subject = new.name
+        WHERE rowid IN (SELECT q.id FROM zein_app_question q JOIN zein_app_topic t ON t.id = q.topic_id
+                        WHERE t.subject_id = new.id);
+    END
+    """,
+]
+
+FILL_SQL = [
+    "DELETE FROM zein_app_question_fts",
+    """
+    INSERT INTO zein_app_question_fts(rowid, text, explanation, topic, subject)
+    SELECT q.id, q.text, coalesce(q.explanation, ''), coalesce(t.name, ''), coalesce(s.name, '')
+    FROM zein_app_question q
+    LEFT JOIN zein_app_topic t ON t.id = q.topic_id
+    LEFT JOIN zein_app_subject s ON s.id = t.subject_id
+    """,
+    "DELETE FROM zein_app_topic_fts",
+    """
+    INSERT INTO zein_app_topic_fts(rowid, name, subject)
+    SELECT t.id, t.name, coalesce(s.name, '')
+    FROM zein_app_topic t
+    LEFT JOIN zein_app_subject s ON s.id = t.subject_id
+    """,
+    "INSERT INTO zein_app_question_fts(zein_app_question_fts) VALUES ('optimize')",
+    "INSERT INTO zein_app_topic_fts(zein_app_topic_fts) VALUES ('optimize')",
+]
+
+DROP_SQL = [
+    "DROP TRIGGER IF EXISTS zein_app_question_fts_insert",
+    "DROP TRIGGER IF EXISTS zein_app_question_fts_update",
+    "DROP TRIGGER IF EXISTS zein_app_question_fts_delete",
+    "DROP TRIGGER IF EXISTS zein_app_topic_fts_insert",
+    "DROP TRIGGER IF EXISTS zein_app_topic_fts_update",
+    "DROP TRIGGER IF EXISTS zein_app_topic_fts_delete",
+    "DROP TRIGGER IF EXISTS zein_app_subject_fts_update",
+    "DROP TABLE IF EXISTS zein_app_question_fts",
+    "DROP TABLE IF EXISTS zein_app_topic_fts",
+]
+
+
+class SQLiteRunSQL(migrations.RunSQL):
+    """FTS5 есть только в SQLite; на других СУБД поиск работает через icontains."""
+
+    def database_forwards(self, app_label, schema_editor, from_state, to_state):
+        if schema_editor.connection.vendor == 'sqlite':
+            super().database_forwards(app_label, schema_editor, from_state, to_state)
+
+    def database_backwards(self, app_label, schema_editor, from_state, to_state):
+        if schema_editor.connection.vendor == 'sqlite':
+            super().database_backwards(app_label, schema_editor, from_state, to_state)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('zein_app', '0005_catalog_counters'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='QuestionSearchIndex',
+            fields=[
+                ('question', models.OneToOneField(db_column='rowid', on_delete=django.db.models.deletion.DO_NOTHING, primary_key=True, related_name='search_index', serialize=False, to='zein_app.question')),
+                ('text', models.TextField()),
+                ('explanation', models.TextField()),
+                ('topic', models.TextField()),
+                ('subject', models.TextField()),
+                ('document', models.TextField(db_column='zein_app_question_fts')),
+                ('rank', models.FloatField()),
+            ],
+            options={
+                'db_table': 'zein_app_question_fts',
+                'managed': False,
+            },
+        ),
+        migrations.CreateModel(
+            name='TopicSearchIndex',
+            fields=[
+                ('topic', models.OneToOneField(db_column='rowid', on_delete=django.db.models.deletion.DO_NOTHING, primary_key=True, related_name='search_index', serialize=False, to='zein_app.topic')),
+                ('name', models.TextField()),
+                ('subject', models.TextField()),
+                ('document', models.TextField(db_column='zein_app_topic_fts')),
+                ('rank', models.FloatField()),
+            ],
+            options={
+                'db_table': 'zein_app_topic_fts',
+                'managed': False,
+            },
+        ),
+        SQLiteRunSQL(CREATE_SQL + FILL_SQL, DROP_SQL),
+    ]
@@ -0,0 +1,53 @@
+# Generated by Django 5.2 on 2026-10-18 20:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('zein_app', '0006_search_index'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='choice',
+            options={},
+        ),
+        migrations.AlterModelOptions(
+            name='question',
+            options={},
+        ),
+        migrations.AlterModelOptions(
+            name='quiz',
+            options={},
+        ),
+        migrations.AlterModelOptions(
+            name='topic',
+            options={'ordering': ['subject_id', 'name']},
+        ),
+        migrations.AlterModelOptions(
+            name='useranswer',
+            options={},
+        ),
+        migrations.AddIndex(
+            model_name='question',
+            index=models.Index(fields=['topic', 'created_at'], name='question_topic_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='quiz',
+            index=models.Index(fields=['user', 'started_at'], name='quiz_user_started_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='quiz',
+            index=models.Index(fields=['user', 'topic', 'started_at'], name='quiz_user_topic_started_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='subject',
+            index=models.Index(fields=['name'], name='subject_name_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='topic',
+            index=models.Index(fields=['subject', 'name'], name='topic_subject_name_idx'),
+        ),
+    ]
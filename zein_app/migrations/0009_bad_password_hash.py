@@ -0,0 +1,46 @@
+# Generated by Django 5.2 on 2026-10-18 22:40
+
+import hashlib
+
+from django.db import migrations, models
+
+
+def fill_password_hash(apps, schema_editor):
+    # Пароли, совпадающие без учёта регистра, схлопываются в одну строку
+    BadPassword = apps.get_model('zein_app', 'BadPassword')
+    seen = set()
+    duplicates = []
+    for bad_password in BadPassword.objects.order_by('id').iterator():
+        password_hash = hashlib.sha1(bad_password.password.lower().encode(), usedforsecurity=False).hexdigest()
+        if password_hash in seen:
+            duplicates.append(bad_password.id)
+            continue
+        seen.add(password_hash)
+        BadPassword.objects.filter(id=bad_password.id).update(password_hash=password_hash)
+    BadPassword.objects.filter(id__in=duplicates).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('zein_app', '0008_customuser_token_version'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='badpassword',
+            name='password_hash',
+            field=models.CharField(editable=False, max_length=40, null=True),
+        ),
+        migrations.RunPython(fill_password_hash, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='badpassword',
+            name='password_hash',
+            field=models.CharField(editable=False, max_length=40, unique=True),
+        ),
+        migrations.AlterField(
+            model_name='badpassword',
+            name='password',
+            field=models.CharField(blank=True, max_length=255, null=True, unique=True),
+        ),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 5.2 on 2026-10-19 12:05
+
+from django.db import migrations
+
+
+def set_journal_mode(mode):
+    def run(apps, schema_editor):
+        # journal_mode хранится в самом файле базы: достаточно включить один раз,
+        # а не в init_command каждого соединения
+        if schema_editor.connection.vendor == 'sqlite':
+            with schema_editor.connection.cursor() as cursor:
+                cursor.execute(f'PRAGMA journal_mode={mode}')
+    return run
+
+
+class Migration(migrations.Migration):
+    # PRAGMA journal_mode не меняется внутри транзакции
+    atomic = False
+
+    dependencies = [
+        ('zein_app', '0009_bad_password_hash'),
+    ]
+
+    operations = [
+        migrations.RunPython(set_journal_mode('WAL'), set_journal_mode('DELETE')),
+    ]
@@ -3,29 +3,92 @@
 
 # Create your models here.
 
+import hashlib
+
 from django.contrib.auth.models import AbstractUser
 from django.db import models
 
 
 
 class CustomUser(AbstractUser):
+    # При изменении этих полей ранее выданные access-токены перестают действовать
+    TOKEN_FIELDS = ('password', 'is_active', 'is_staff', 'is_superuser')
+
     full_name = models.CharField(max_length=255)
     phone = models.CharField(max_length=20, unique=True, null=True, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+    # Версия токенов: входит в claims access-токена, см. zein_app.authentication
+    token_version = models.PositiveIntegerField(default=0, editable=False)
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._token_state = {name: instance.__dict__.get(name) for name in cls.TOKEN_FIELDS}
+        return instance
+
+    def refresh_from_db(self, using=None, fields=None, from_queryset=None):
+        loader = getattr(self, '_deferred_loader', None)
+        if loader is not None and fields:
+            # Пользователь из claims токена: недостающие поля одной строкой, а не запросом на каждое
+            self._deferred_loader = None
+            loader(self)
+            return
+        super().refresh_from_db(using=using, fields=fields, from_queryset=from_queryset)
 
     def save(self, *args, **kwargs):
         if not self.full_name:
             self.full_name = f"{self.first_name} {self.last_name}".strip()
+        state = getattr(self, '_token_state', None)
+        self._token_version_changed = bool(state) and any(
+            name in self.__dict__ and state[name] is not None and self.__dict__[name] != state[name]
+            for name in self.TOKEN_FIELDS
+        )
+        if self._token_version_changed:
+            self.token_version += 1
+            if kwargs.get('update_fields') is not None:
+                kwargs['update_fields'] = {*kwargs['update_fields'], 'token_version'}
         super().save(*args, **kwargs)
+        self._token_state = {name: self.__dict__.get(name) for name in self.TOKEN_FIELDS}
+
+
+
+def bad_password_hash(password):
+    """SHA-1 пароля в нижнем регистре: по нему ищется BadPassword, см. zein_app.bad_passwords."""
+    return hashlib.sha1(password.lower().encode(), usedforsecurity=False).hexdigest()
+
 
+class BadPasswordQuerySet(models.QuerySet):
+
+    def bulk_create(self, objs, *args, **kwargs):
+        # save() и сигналы здесь не вызываются: хэш считаем и фильтр в памяти сбрасываем сами
+        objs = list(objs)
+        for obj in objs:
+            if obj.password and not obj.password_hash:
+                obj.password_hash = bad_password_hash(obj.password)
+        created = super().bulk_create(objs, *args, **kwargs)
+        from .bad_passwords import bad_password_filter
+        bad_password_filter.bump_version()
+        return created
 
 
 class BadPassword(models.Model):
-    password = models.CharField(max_length=255, unique=True)
+    # Команда load_bad_passwords хранит только хэш, без самого пароля
+    password = models.CharField(max_length=255, unique=True, null=True, blank=True)
+    password_hash = models.CharField(max_length=40, unique=True, editable=False)
+
+    objects = BadPasswordQuerySet.as_manager()
+
+    def save(self, *args, **kwargs):
+        if self.password:
+            self.password_hash = bad_password_hash(self.password)
+            update_fields = kwargs.get('update_fields')
+            if update_fields is not None and 'password' in update_fields:
+                kwargs['update_fields'] = {*update_fields, 'password_hash'}
+        super().save(*args, **kwargs)
 
     def __str__(self):
-        return self.password
+        return self.password or self.password_hash
 
 
 
@@ -98,6 +161,7 @@ class Subject(models.Model):
     title_ru = models.TextField(max_length=255)
     description = models.TextField(blank=True, null=True)
     image = models.ImageField(upload_to='subjects/', blank=True, null=True)
+    topic_count = models.PositiveIntegerField(default=0, editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
 
 
@@ -106,6 +170,9 @@ class Subject(models.Model):
 
     class Meta:
         ordering = ['name']
+        indexes = [
+            models.Index(fields=['name'], name='subject_name_idx'),
+        ]
 
 
 class Topic(models.Model):
@@ -113,6 +180,7 @@ class Topic(models.Model):
     name = models.CharField(max_length=100)
     description = models.TextField(blank=True, null=True)
     image = models.ImageField(upload_to='topics/', blank=True, null=True)
+    question_count = models.PositiveIntegerField(default=0, editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
     # is_active = models.BooleanField(default=True)
 
@@ -120,7 +188,11 @@ class Topic(models.Model):
         return f"{self.subject.name} - {self.name}"
 
     class Meta:
-        ordering = ['subject', 'name']
+        # subject_id, а не subject: сортировка по FK не тянет JOIN и сортировку по имени предмета
+        ordering = ['subject_id', 'name']
+        indexes = [
+            models.Index(fields=['subject', 'name'], name='topic_subject_name_idx'),
+        ]
 
 
 class Question(models.Model):
@@ -135,7 +207,9 @@ class Question(models.Model):
         return self.text[:50]
 
     class Meta:
-        ordering = ['topic', 'created_at']
+        indexes = [
+            models.Index(fields=['topic', 'created_at'], name='question_topic_created_idx'),
+        ]
 
 
 class Choice(models.Model):
@@ -146,9 +220,6 @@ class Choice(models.Model):
     def __str__(self):
         return self.text
 
-    class Meta:
-        ordering = ['question', 'id']
-
 
 class Quiz(models.Model):
     STATUS_CHOICES = (
@@ -161,14 +232,35 @@ class Quiz(models.Model):
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='in_progress')
     score = models.IntegerField(default=0)
     total_questions = models.IntegerField(default=0)
+    question_ids = models.JSONField(default=list, blank=True)
+    position = models.PositiveIntegerField(default=0)
     started_at = models.DateTimeField(auto_now_add=True)
     completed_at = models.DateTimeField(blank=True, null=True)
 
     def __str__(self):
         return f"{self.user.username} - {self.topic.name} ({self.status})"
 
+    @property
+    def current_question_id(self):
+        if self.position < len(self.question_ids):
+            return self.question_ids[self.position]
+        return None
+
+    @staticmethod
+    def questions_for_topic(topic_id):
+        """ id вопросов темы в порядке викторины; вопросы без вариантов ответа в неё не попадают """
+        return (
+            Question.objects.filter(topic_id=topic_id)
+            .filter(models.Exists(Choice.objects.filter(question_id=models.OuterRef('pk'))))
+            .order_by('created_at', 'id')
+            .values_list('id', flat=True)
+        )
+
     class Meta:
-        ordering = ['-started_at']
+        indexes = [
+            models.Index(fields=['user', 'started_at'], name='quiz_user_started_idx'),
+            models.Index(fields=['user', 'topic', 'started_at'], name='quiz_user_topic_started_idx'),
+        ]
 
 
 class UserAnswer(models.Model):
@@ -182,10 +274,42 @@ class UserAnswer(models.Model):
         return f"{self.quiz.user.username} - {self.question.text[:30]}"
 
     class Meta:
-        ordering = ['quiz', 'answered_at']
         unique_together = ['quiz', 'question']
 
 
+# Полнотекстовые индексы (SQLite FTS5). Таблицы создаются миграцией и
+# обновляются триггерами, поэтому модели только для чтения (managed=False).
+# document — скрытая колонка FTS5 с именем таблицы: document=... означает MATCH,
+# rank — скрытая колонка с bm25-рангом совпадения.
+
+class QuestionSearchIndex(models.Model):
+    question = models.OneToOneField(Question, on_delete=models.DO_NOTHING, primary_key=True,
+                                    db_column='rowid', related_name='search_index')
+    text = models.TextField()
+    explanation = models.TextField()
+    topic = models.TextField()
+    subject = models.TextField()
+    document = models.TextField(db_column='zein_app_question_fts')
+    rank = models.FloatField()
+
+    class Meta:
+        managed = False
+        db_table = 'zein_app_question_fts'
+
+
+class TopicSearchIndex(models.Model):
+    topic = models.OneToOneField(Topic, on_delete=models.DO_NOTHING, primary_key=True,
+                                 db_column='rowid', related_name='search_index')
+    name = models.TextField()
+    subject = models.TextField()
+    document = models.TextField(db_column='zein_app_topic_fts')
+    rank = models.FloatField()
+
+    class Meta:
+        managed = False
+        db_table = 'zein_app_topic_fts'
+
+
 
 
 
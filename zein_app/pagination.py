@@ -1,7 +1,18 @@
-from rest_framework.pagination import PageNumberPagination
-from rest_framework.response import Response
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+import datetime
+import json
 import math
 
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.filters import OrderingFilter
+from rest_framework.pagination import BasePagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
 class CustomPagination(PageNumberPagination):
     page_size = 10
     page_size_query_param = 'page_size'
@@ -10,9 +21,186 @@ class CustomPagination(PageNumberPagination):
     def get_paginated_response(self, data):
         return Response({
             'total_items': self.page.paginator.count,
-            'total_pages': math.ceil(self.page.paginator.count / self.page_size),
+            'total_pages': math.ceil(self.page.paginator.count / self.page.paginator.per_page),
             'current_page': self.page.number,
             'next': self.get_next_link(),
             'previous': self.get_previous_link(),
             'results': data
         })
+
+
+class CursorEncoder(DjangoJSONEncoder):
+    # DjangoJSONEncoder обрезает время до миллисекунд, а курсору нужна точность ключа
+    def default(self, o):
+        if isinstance(o, datetime.datetime):
+            return o.isoformat()
+        return super().default(o)
+
+
+class KeysetPagination(BasePagination):
+    """
+    Keyset-пагинация по (created_at, id): без COUNT(*) и без OFFSET.
+
+    Включается параметром ?cursor= (пустое значение — первая страница),
+    без него выдача не пагинируется. Порядок можно переопределить
+    атрибутом keyset_ordering у view; последним полем должно быть
+    уникальное поле (id). Если у view есть OrderingFilter и передан
+    ?ordering=, курсор строится по нему (с id в конце), а сам порядок
+    записывается в курсор: курсор другого порядка не принимается.
+    """
+    page_size = 10
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    cursor_query_param = 'cursor'
+    ordering = ('-created_at', '-id')
+    invalid_cursor_message = 'Неверный курсор'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        if self.cursor_query_param not in request.query_params:
+            return None
+
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        self.ordering = self.get_ordering(request, queryset, view)
+        self.page_size = self.get_page_size(request)
+
+        values, reverse = self.decode_cursor(request.query_params[self.cursor_query_param], queryset)
+        ordering = self._reversed(self.ordering) if reverse else self.ordering
+
+        queryset = queryset.order_by(*ordering)
+        if values is not None:
+            queryset = queryset.filter(self._after(ordering, values))
+
+        results = list(queryset[:self.page_size + 1])
+        has_more = len(results) > self.page_size
+        results = results[:self.page_size]
+        if reverse:
+            results.reverse()
+
+        self.next_values = self.previous_values = None
+        if results:
+            if has_more or reverse:
+                self.next_values = self._key(results[-1])
+            if values is not None and (has_more or not reverse):
+                self.previous_values = self._key(results[0])
+        return results
+
+    def get_ordering(self, request, queryset, view):
+        for backend in getattr(view, 'filter_backends', ()):
+            if issubclass(backend, OrderingFilter) and request.query_params.get(backend.ordering_param):
+                ordering = tuple(backend().get_ordering(request, queryset, view) or ())
+                if ordering:
+                    # Ключ курсора должен быть уникальным: равные username/created_at различает id
+                    if not {'id', '-id'} & set(ordering):
+                        ordering += ('-id' if ordering[0].startswith('-') else 'id',)
+                    return ordering
+        return tuple(getattr(view, 'keyset_ordering', self.ordering))
+
+    def get_page_size(self, request):
+        try:
+            page_size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        if page_size <= 0:
+            return self.page_size
+        return min(page_size, self.max_page_size)
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_link(self.next_values, reverse=False),
+            'previous': self.get_link(self.previous_values, reverse=True),
+            'results': data
+        })
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'previous': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
+
+    def get_link(self, values, reverse):
+        if values is None:
+            return None
+        return replace_query_param(self.base_url, self.cursor_query_param, self.encode_cursor(values, reverse))
+
+    def encode_cursor(self, values, reverse):
+        payload = json.dumps(
+            {'o': list(self.ordering), 'v': values, 'r': reverse}, cls=CursorEncoder, separators=(',', ':')
+        )
+        return urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+    def decode_cursor(self, cursor, queryset):
+        if not cursor:
+            return None, False
+        try:
+            payload = json.loads(urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+            ordering, values, reverse = payload['o'], payload['v'], bool(payload['r'])
+        except (TypeError, ValueError, KeyError):
+            raise NotFound(self.invalid_cursor_message)
+        if ordering != list(self.ordering):
+            raise NotFound(self.invalid_cursor_message)
+        if not isinstance(values, list) or len(values) != len(self.ordering):
+            raise NotFound(self.invalid_cursor_message)
+        # Курсор приходит от клиента: каждое значение приводим к типу поля сортировки
+        try:
+            values = [
+                self._clean_value(self._field(queryset, field.lstrip('-')), value)
+                for field, value in zip(self.ordering, values)
+            ]
+        except (TypeError, ValueError, ValidationError, FieldDoesNotExist):
+            raise NotFound(self.invalid_cursor_message)
+        return values, reverse
+
+    @staticmethod
+    def _field(queryset, name):
+        # Сортировка может идти по аннотации (search_rank в поиске)
+        if name in queryset.query.annotations:
+            return queryset.query.annotations[name].output_field
+        return queryset.model._meta.get_field(name)
+
+    @staticmethod
+    def _clean_value(field, value):
+        if value is None or isinstance(value, (list, dict)):
+            raise ValueError(value)
+        return field.to_python(value)
+
+    def _key(self, obj):
+        return [getattr(obj, field.lstrip('-')) for field in self.ordering]
+
+    @staticmethod
+    def _reversed(ordering):
+        return tuple(field[1:] if field.startswith('-') else f'-{field}' for field in ordering)
+
+    @staticmethod
+    def _after(ordering, values):
+        # (a, b) > (x, y)  <=>  a > x OR (a = x AND b > y)
+        condition = Q()
+        for index, field in enumerate(ordering):
+            lookup = 'lt' if field.startswith('-') else 'gt'
+            step = Q(**{f'{field.lstrip("-")}__{lookup}': values[index]})
+            for previous, value in zip(ordering[:index], values[:index]):
+                step &= Q(**{previous.lstrip('-'): value})
+            condition |= step
+        return condition
+
+
+class CustomKeysetPagination(CustomPagination):
+    """Постраничная выдача как у CustomPagination, keyset — при ?cursor=."""
+    keyset_class = KeysetPagination
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.keyset = None
+        if self.keyset_class.cursor_query_param in request.query_params:
+            self.keyset = self.keyset_class()
+            return self.keyset.paginate_queryset(queryset, request, view)
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        if self.keyset is not None:
+            return self.keyset.get_paginated_response(data)
+        return super().get_paginated_response(data)
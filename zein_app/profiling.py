@@ -0,0 +1,236 @@
+"""
+Профилирование отдельных запросов.
+
+ProfilingMiddleware профилирует случайную долю запросов (PROFILING_SAMPLE_RATE)
+и запросы сотрудников с заголовком PROFILING_HEADER (по умолчанию X-Profile).
+Для таких запросов считаются число и общее время SQL, самые медленные
+запросы, время сериализации, рендеринга и отправки уведомлений в Telegram,
+а весь запрос проходит под cProfile.
+
+Сводка уходит в заголовок Server-Timing, полный профиль — в PROFILING_DIR:
+<id>.prof (pstats, открывается snakeviz и т.п.) и <id>.txt (SQL и дерево
+вызовов по cumulative). Если выборка выключена и заголовок не задан,
+middleware отключается целиком; иначе для остальных запросов это одна
+проверка заголовка и один random().
+
+Под ASGI профилируется только код в потоке цикла событий (вместе с
+другими запросами, которые идут в это время): SQL и остальной
+синхронный код выполняются в потоках sync_to_async и в профиль не попадают.
+"""
+import cProfile
+import io
+import os
+import pstats
+import random
+import re
+import threading
+import time
+import uuid
+from contextlib import ExitStack
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+
+SLOWEST_QUERIES = 5
+
+# Участки запроса, время которых берётся из профиля: (часть пути файла, имя функции или None — любая)
+SPANS = {
+    'serialize': [
+        ('rest_framework/serializers.py', 'data'),
+        ('rest_framework/serializers.py', 'to_representation'),
+        ('zein_app/fast_serializers.py', None),
+    ],
+    'render': [('rest_framework/renderers.py', 'render')],
+    'telegram': [(None, 'send_telegram_notification')],
+}
+
+# cProfile в одном процессе может работать только в одном потоке одновременно
+_profiler_lock = threading.Lock()
+
+
+def _matches(func, patterns):
+    filename, _, name = func
+    filename = filename.replace(os.sep, '/')
+    return any(
+        (path is None or path in filename) and (function is None or function == name)
+        for path, function in patterns
+    )
+
+
+def span_durations(stats):
+    """
+    Время участков SPANS по профилю, в секундах.
+
+    Берётся cumulative функций верхнего уровня: функция, которую вызвала
+    другая функция того же участка (вложенный сериализатор), не считается
+    второй раз.
+    """
+    durations = {}
+    for span, patterns in SPANS.items():
+        matched = {func for func in stats.stats if _matches(func, patterns)}
+        durations[span] = sum(
+            stats.stats[func][3]
+            for func in matched
+            if not any(caller in matched for caller in stats.stats[func][4])
+        )
+    return durations
+
+
+class RequestProfile:
+    def __init__(self):
+        self.queries = []
+        self.sql_time = 0.0
+
+    def record_query(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed = time.perf_counter() - started
+            self.sql_time += elapsed
+            self.queries.append((elapsed, sql))
+
+    def slowest_queries(self, count=SLOWEST_QUERIES):
+        return sorted(self.queries, key=lambda query: query[0], reverse=True)[:count]
+
+
+def server_timing(metrics):
+    """Заголовок Server-Timing из [(name, seconds или None, description)]."""
+    parts = []
+    for name, seconds, description in metrics:
+        part = name
+        if seconds is not None:
+            part += f';dur={seconds * 1000:.1f}'
+        if description:
+            part += f';desc="{description}"'
+        parts.append(part)
+    return ', '.join(parts)
+
+
+class ProfilingMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.sample_rate = getattr(settings, 'PROFILING_SAMPLE_RATE', 0.0)
+        header = getattr(settings, 'PROFILING_HEADER', 'X-Profile')
+        self.header = 'HTTP_' + header.upper().replace('-', '_') if header else None
+        self.directory = getattr(settings, 'PROFILING_DIR', None)
+        if not self.sample_rate and not self.header:
+            raise MiddlewareNotUsed
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        if not self.should_profile(request):
+            return self.get_response(request)
+        return self.profile(request)
+
+    async def __acall__(self, request):
+        if self.header and request.META.get(self.header):
+            # Для токенов без claims is_staff пользователь читается из базы
+            profile = await sync_to_async(self.is_staff)(request)
+        else:
+            profile = self.sample_rate > 0 and random.random() < self.sample_rate
+        if not profile:
+            return await self.get_response(request)
+        return await self.aprofile(request)
+
+    def should_profile(self, request):
+        if self.header and request.META.get(self.header):
+            return self.is_staff(request)
+        return self.sample_rate > 0 and random.random() < self.sample_rate
+
+    @staticmethod
+    def is_staff(request):
+        user = getattr(request, 'user', None)
+        if user is not None and user.is_authenticated:
+            return user.is_staff
+        # API ходит с JWT, а не с сессией: request.user здесь ещё анонимный
+        from rest_framework.exceptions import AuthenticationFailed
+        from rest_framework_simplejwt.exceptions import InvalidToken, TokenError
+        from .authentication import StatelessJWTAuthentication
+        try:
+            result = StatelessJWTAuthentication().authenticate(request)
+        except (AuthenticationFailed, InvalidToken, TokenError):
+            return False
+        return bool(result and result[0].is_staff)
+
+    def profile(self, request):
+        profile = RequestProfile()
+        profiler = cProfile.Profile() if _profiler_lock.acquire(blocking=False) else None
+        started = time.perf_counter()
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(profile.record_query))
+                if profiler:
+                    profiler.enable()
+                try:
+                    response = self.get_response(request)
+                finally:
+                    if profiler:
+                        profiler.disable()
+        finally:
+            if profiler:
+                _profiler_lock.release()
+        return self.finish(request, response, profile, profiler, time.perf_counter() - started)
+
+    async def aprofile(self, request):
+        profile = RequestProfile()
+        profiler = cProfile.Profile() if _profiler_lock.acquire(blocking=False) else None
+        started = time.perf_counter()
+        try:
+            if profiler:
+                profiler.enable()
+            try:
+                response = await self.get_response(request)
+            finally:
+                if profiler:
+                    profiler.disable()
+        finally:
+            if profiler:
+                _profiler_lock.release()
+        return self.finish(request, response, profile, profiler, time.perf_counter() - started, sql=False)
+
+    def finish(self, request, response, profile, profiler, total, sql=True):
+        stats = pstats.Stats(profiler) if profiler else None
+        spans = span_durations(stats) if stats else {}
+        profile_id = self.save(request, profile, stats, spans, total) if stats and self.directory else None
+
+        metrics = [('sql', profile.sql_time, f'{len(profile.queries)} queries')] if sql else []
+        metrics += [(span, seconds, None) for span, seconds in spans.items() if seconds]
+        metrics.append(('total', total, None))
+        if profile_id:
+            metrics.append(('profile', None, profile_id))
+        response['Server-Timing'] = server_timing(metrics)
+        return response
+
+    def save(self, request, profile, stats, spans, total):
+        os.makedirs(self.directory, exist_ok=True)
+        slug = re.sub(r'[^\w-]+', '-', request.path).strip('-')[:60] or 'root'
+        profile_id = f"{time.strftime('%Y%m%d-%H%M%S')}-{request.method.lower()}-{slug}-{uuid.uuid4().hex[:8]}"
+        path = os.path.join(self.directory, profile_id)
+        stats.dump_stats(path + '.prof')
+
+        report = io.StringIO()
+        report.write(f'{request.method} {request.get_full_path()}\n')
+        report.write(f'total: {total * 1000:.1f} ms\n')
+        report.write(f'sql: {len(profile.queries)} queries, {profile.sql_time * 1000:.1f} ms\n')
+        for span, seconds in spans.items():
+            report.write(f'{span}: {seconds * 1000:.1f} ms\n')
+        report.write('\nslowest queries:\n')
+        for elapsed, sql in profile.slowest_queries():
+            report.write(f'{elapsed * 1000:8.1f} ms  {sql}\n')
+        report.write('\n')
+        stats.stream = report
+        stats.sort_stats('cumulative').print_stats(40)
+        with open(path + '.txt', 'w', encoding='utf-8') as output:
+            output.write(report.getvalue())
+        return profile_id
@@ -0,0 +1,83 @@
+"""
+Ответ на вопрос викторины: общая часть QuizAPIView (views.py) и
+асинхронных view (async_views.py).
+
+Здесь нет обращений к базе: функции проверяют ответ по курсору квиза,
+строят запрос вариантов и выражения UPDATE, а выполняет их сам view —
+обычным ORM или async-ORM.
+"""
+from operator import itemgetter
+
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .fast_serializers import QUESTION_CHOICE_FIELDS
+from .models import Choice
+
+ALREADY_ANSWERED = "Вы уже ответили на этот вопрос"
+NOT_IN_QUIZ = "Этого вопроса нет в викторине: он из другой темы или пропущен без вариантов ответа"
+NOT_CURRENT = "Этот вопрос не является текущим вопросом викторины"
+
+
+def answer_error(quiz, question_id):
+    """Текст ошибки, если на этот вопрос сейчас ответить нельзя, иначе None."""
+    if question_id not in quiz.question_ids:
+        return NOT_IN_QUIZ
+    if question_id in quiz.question_ids[:quiz.position]:
+        return ALREADY_ANSWERED
+    if question_id != quiz.current_question_id:
+        return NOT_CURRENT
+    return None
+
+
+def answer_choices(quiz, question_id, choice_id):
+    """
+    Выбранный вариант и варианты следующего вопроса — одним запросом.
+    Возвращает (queryset строк values(), is_last).
+    """
+    is_last = quiz.position + 1 >= len(quiz.question_ids)
+    lookup = Q(id=choice_id, question_id=question_id)
+    if not is_last:
+        lookup |= Q(question_id=quiz.question_ids[quiz.position + 1])
+    return Choice.objects.filter(lookup).values(*QUESTION_CHOICE_FIELDS, 'is_correct'), is_last
+
+
+def pick_choice(rows, question_id, choice_id):
+    """(выбранный вариант или None, варианты следующего вопроса) из строк answer_choices."""
+    # OR по двум индексам не даёт порядка, а ORDER BY потребовал бы временного B-дерева;
+    # строк здесь единицы, сортируем в Python
+    rows = sorted(rows, key=itemgetter('id'))
+    choice = next((row for row in rows if row['id'] == choice_id and row['question_id'] == question_id), None)
+    return choice, [row for row in rows if row['question_id'] != question_id]
+
+
+def answer_updates(is_correct, is_last):
+    """Поля для Quiz.objects.filter(id=...).update(): счёт и курсор через F(), без гонок."""
+    updates = {'position': F('position') + 1}
+    if is_correct:
+        updates['score'] = F('score') + 1
+    if is_last:
+        updates['status'] = 'completed'
+        updates['completed_at'] = timezone.now()
+    return updates
+
+
+def apply_answer(quiz, updates):
+    """То же, что answer_updates, в памяти — чтобы собрать ответ без перечитывания квиза."""
+    quiz.position += 1
+    if 'score' in updates:
+        quiz.score += 1
+    if 'status' in updates:
+        quiz.status = updates['status']
+        quiz.completed_at = updates['completed_at']
+
+
+def drop_current_question(quiz):
+    """
+    Убирает из викторины текущий вопрос, удалённый или оставшийся без
+    вариантов после старта: иначе он считался бы в total_questions, хотя
+    ответить на него нельзя. Возвращает update_fields для save().
+    """
+    del quiz.question_ids[quiz.position]
+    quiz.total_questions -= 1
+    return ['question_ids', 'total_questions']
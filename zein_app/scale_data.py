@@ -0,0 +1,368 @@
+"""
+Синтетические данные для нагрузочных прогонов и проверки планов запросов.
+
+Всё, что создаёт генератор, имеет явные id начиная с ID_BASE: id вычисляются
+из номера строки (вопрос q → варианты ID_BASE + q * choices + c и т.д.),
+поэтому данные полностью определяются пресетом и seed. Сколько строк каждой
+таблицы записано, хранит JSON-файл рядом с базой (state_path(), после
+коммита каждой пачки): по нему прерванная загрузка продолжается, а
+flush_scale_data удаляет только строки генератора. В схему приложения
+генератор ничего не добавляет.
+
+SQLite выдаёт новым строкам MAX(id) + 1, поэтому обычные строки, созданные
+после загрузки, тоже получают id больше ID_BASE — за пределами записанного
+диапазона. Если такие строки заняли id, которые генератору ещё предстоит
+записать (загрузка была прервана), продолжение отказывается работать.
+
+Загрузка идёт пачками через bulk_create, каждая пачка (вместе с дочерними
+строками — вариантами или ответами) в своей транзакции. bulk_create не
+отправляет сигналы моделей, поэтому счётчики topic_count/question_count
+заполняются сразу, а триггеры полнотекстового индекса на время загрузки
+снимаются и индекс строится заново в конце.
+"""
+import json
+import os
+import random
+import tempfile
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.db import connection, transaction
+from django.utils import timezone
+
+from .catalog_cache import catalog_cache
+from .models import CustomUser, Subject, Topic, Question, Choice, Quiz, UserAnswer
+from .search import create_search_index, drop_search_index
+
+ID_BASE = 1_000_000_000
+PASSWORD = 'Scale_pass1!'
+
+SUBJECT_NAMES = [
+    'Математика', 'Физика', 'Химия', 'Биология', 'История', 'География',
+    'Литература', 'Русский язык', 'Английский язык', 'Информатика',
+]
+WORDS = [
+    'дроби', 'уравнение', 'функция', 'предел', 'интеграл', 'вектор', 'энергия', 'сила',
+    'скорость', 'молекула', 'реакция', 'кислота', 'клетка', 'организм', 'эволюция', 'империя',
+    'революция', 'война', 'материк', 'климат', 'река', 'роман', 'поэма', 'герой',
+    'падеж', 'глагол', 'причастие', 'алгоритм', 'массив', 'цикл', 'переменная', 'сеть',
+    'угол', 'треугольник', 'окружность', 'площадь', 'объём', 'давление', 'заряд', 'волна',
+]
+
+
+@dataclass(frozen=True)
+class Preset:
+    subjects: int
+    topics: int
+    questions: int
+    choices: int
+    users: int
+    quizzes: int
+    answers: int  # ответов в завершённой викторине
+
+    @property
+    def questions_per_topic(self):
+        return self.questions // self.topics
+
+
+PRESETS = {
+    # для тестов: сотни строк, создаётся за доли секунды
+    'tiny': Preset(subjects=2, topics=6, questions=60, choices=4, users=20, quizzes=100, answers=5),
+    'small': Preset(subjects=5, topics=50, questions=5_000, choices=4, users=1_000, quizzes=5_000, answers=10),
+    'medium': Preset(subjects=20, topics=500, questions=50_000, choices=4, users=20_000,
+                     quizzes=100_000, answers=10),
+    'large': Preset(subjects=50, topics=5_000, questions=500_000, choices=4, users=200_000,
+                    quizzes=1_000_000, answers=20),
+}
+
+
+def _epoch():
+    epoch = datetime(2025, 1, 1)
+    return timezone.make_aware(epoch, dt_timezone.utc) if settings.USE_TZ else epoch
+
+
+class fixed_timestamps:
+    """Отключает auto_now/auto_now_add у полей, чтобы записать заданные даты."""
+
+    def __init__(self, *fields):
+        self.fields = fields
+
+    def __enter__(self):
+        self.saved = [(field, field.auto_now, field.auto_now_add) for field in self.fields]
+        for field in self.fields:
+            field.auto_now = field.auto_now_add = False
+
+    def __exit__(self, *exc_info):
+        for field, auto_now, auto_now_add in self.saved:
+            field.auto_now, field.auto_now_add = auto_now, auto_now_add
+
+
+class ScaleDataSeeder:
+    """
+    Создаёт данные пресета: предметы, темы, вопросы с вариантами,
+    пользователей и викторины с ответами.
+
+    Повторный запуск с тем же пресетом и seed досоздаёт недостающее и даёт
+    те же строки, что и загрузка за один раз.
+    """
+
+    STAGES = ('subjects', 'topics', 'questions', 'users', 'quizzes')
+
+    def __init__(self, preset='small', seed=0, chunk_size=5000, progress=None):
+        if preset not in PRESETS:
+            raise ValueError(f"Неизвестный пресет: {preset}")
+        self.preset = PRESETS[preset]
+        self.seed = seed
+        self.chunk_size = chunk_size
+        self.progress = progress
+        self.epoch = _epoch()
+        self.report = {stage: 0 for stage in self.STAGES}
+        self.report.update(choices=0, answers=0)
+
+    def run(self):
+        p = self.preset
+        if p.questions_per_topic < p.answers:
+            raise ValueError("В теме меньше вопросов, чем ответов в викторине")
+
+        # Триггеры FTS на каждую вставку вопроса дороже самой вставки — индекс строится один раз в конце
+        drop_search_index()
+        try:
+            self._load('subjects', Subject, p.subjects, self._subjects)
+            self._load('topics', Topic, p.topics, self._topics)
+            self._load('questions', Question, p.questions, self._questions)
+            self._load('users', CustomUser, p.users, self._users)
+            self._load('quizzes', Quiz, p.quizzes, self._quizzes)
+        finally:
+            create_search_index()
+            catalog_cache.bump_version()
+        return self.report
+
+    def _load(self, stage, model, total, build):
+        state = load_state()
+        start = state.get(model._meta.db_table, 0)
+        # Вместе с вопросами пишутся варианты, с викторинами — ответы
+        tables = [(model, 1)] + {
+            'questions': [(Choice, self.preset.choices)],
+            'quizzes': [(UserAnswer, self.preset.answers)],
+        }.get(stage, [])
+        for table, per_row in tables:
+            first_id, last_id = ID_BASE + start * per_row, ID_BASE + total * per_row
+            if start < total and table.objects.filter(pk__gte=first_id, pk__lt=last_id).exists():
+                raise ValueError(
+                    f"В {table._meta.db_table} id из диапазона генератора ({first_id}–{last_id - 1}) "
+                    f"уже заняты строками, которые создал не он"
+                )
+
+        for first in range(start, total, self.chunk_size):
+            done = min(first + self.chunk_size, total)
+            with transaction.atomic():
+                build(range(first, done))
+            state.update({table._meta.db_table: done * per_row for table, per_row in tables})
+            save_state(state)
+            if self.progress:
+                self.progress(stage, done, total)
+
+    def _topic_of_question(self, q):
+        return q % self.preset.topics
+
+    def _correct_choice(self, q):
+        return (q * 7 + self.seed) % self.preset.choices
+
+    def _words(self, number, count):
+        words = []
+        for k in range(count):
+            mixed = ((number * 2654435761) ^ ((k + 1) * 40503 + self.seed)) & 0xffffffff
+            words.append(WORDS[(mixed >> 11) % len(WORDS)])
+        return ' '.join(words)
+
+    @staticmethod
+    def _subject_name(s):
+        name = SUBJECT_NAMES[s % len(SUBJECT_NAMES)]
+        return name if s < len(SUBJECT_NAMES) else f'{name} {s // len(SUBJECT_NAMES) + 1}'
+
+    def _subjects(self, rows):
+        p = self.preset
+        Subject.objects.bulk_create([
+            Subject(
+                id=ID_BASE + s,
+                name=self._subject_name(s),
+                title_ru=SUBJECT_NAMES[s % len(SUBJECT_NAMES)],
+                # темы раскладываются по предметам по кругу: t % subjects
+                topic_count=p.topics // p.subjects + (s < p.topics % p.subjects),
+            )
+            for s in rows
+        ])
+        self.report['subjects'] += len(rows)
+
+    def _topics(self, rows):
+        p = self.preset
+        Topic.objects.bulk_create([
+            Topic(
+                id=ID_BASE + t,
+                subject_id=ID_BASE + t % p.subjects,
+                name=f'{self._words(t, 2).capitalize()} {t // p.subjects + 1}',
+                question_count=p.questions_per_topic + (t < p.questions % p.topics),
+            )
+            for t in rows
+        ])
+        self.report['topics'] += len(rows)
+
+    def _questions(self, rows):
+        p = self.preset
+        with fixed_timestamps(Question._meta.get_field('created_at')):
+            Question.objects.bulk_create([
+                Question(
+                    id=ID_BASE + q,
+                    topic_id=ID_BASE + self._topic_of_question(q),
+                    text=f'Вопрос {q + 1}: {self._words(q, 8)}?',
+                    explanation=self._words(q + p.questions, 12) if q % 3 == 0 else None,
+                    created_at=self.epoch + timedelta(minutes=q),
+                )
+                for q in rows
+            ], batch_size=self.chunk_size)
+        Choice.objects.bulk_create([
+            Choice(
+                id=ID_BASE + q * p.choices + c,
+                question_id=ID_BASE + q,
+                text=f'Вариант {c + 1}: {self._words(q * p.choices + c, 2)}',
+                is_correct=c == self._correct_choice(q),
+            )
+            for q in rows
+            for c in range(p.choices)
+        ], batch_size=self.chunk_size)
+        self.report['questions'] += len(rows)
+        self.report['choices'] += len(rows) * p.choices
+
+    def _users(self, rows):
+        if not hasattr(self, '_password'):
+            # Один хэш на всех: PBKDF2 на каждого из 200k пользователей занял бы часы
+            self._password = make_password(PASSWORD)
+        CustomUser.objects.bulk_create([
+            CustomUser(
+                id=ID_BASE + u,
+                username=f'scale_user_{u}',
+                email=f'scale_user_{u}@example.com',
+                full_name=f'Ученик {u + 1}',
+                password=self._password,
+            )
+            for u in rows
+        ], batch_size=self.chunk_size)
+        self.report['users'] += len(rows)
+
+    def _quizzes(self, rows):
+        p = self.preset
+        quizzes, answers = [], []
+        for z in rows:
+            rng = random.Random(self.seed * 1_000_003 + z)
+            t = rng.randrange(p.topics)
+            in_topic = p.questions_per_topic + (t < p.questions % p.topics)
+            question_ids = [t + k * p.topics for k in rng.sample(range(in_topic), p.answers)]
+            completed = rng.random() >= 0.1
+            answered = p.answers if completed else rng.randrange(p.answers)
+            started_at = self.epoch + timedelta(seconds=rng.randrange(365 * 24 * 3600))
+
+            score = 0
+            for position, q in enumerate(question_ids[:answered]):
+                c = rng.randrange(p.choices)
+                is_correct = c == self._correct_choice(q)
+                score += is_correct
+                answers.append(UserAnswer(
+                    id=ID_BASE + z * p.answers + position,
+                    quiz_id=ID_BASE + z,
+                    question_id=ID_BASE + q,
+                    selected_choice_id=ID_BASE + q * p.choices + c,
+                    is_correct=is_correct,
+                    answered_at=started_at + timedelta(seconds=30 * (position + 1)),
+                ))
+            quizzes.append(Quiz(
+                id=ID_BASE + z,
+                user_id=ID_BASE + rng.randrange(p.users),
+                topic_id=ID_BASE + t,
+                status='completed' if completed else 'in_progress',
+                score=score,
+                total_questions=p.answers,
+                question_ids=[ID_BASE + q for q in question_ids],
+                position=answered,
+                started_at=started_at,
+                completed_at=started_at + timedelta(seconds=30 * answered) if completed else None,
+            ))
+
+        with fixed_timestamps(Quiz._meta.get_field('started_at'), UserAnswer._meta.get_field('answered_at')):
+            Quiz.objects.bulk_create(quizzes, batch_size=self.chunk_size)
+            UserAnswer.objects.bulk_create(answers, batch_size=self.chunk_size)
+        self.report['quizzes'] += len(rows)
+        self.report['answers'] += len(answers)
+
+
+def state_path():
+    """
+    Файл состояния генератора: settings.SCALE_DATA_STATE_FILE или
+    <файл базы>.scale_data.json — состояние относится к конкретной базе.
+    """
+    path = getattr(settings, 'SCALE_DATA_STATE_FILE', None)
+    return str(path) if path else f"{connection.settings_dict['NAME']}.scale_data.json"
+
+
+def load_state():
+    """{таблица: сколько строк от ID_BASE записал генератор}."""
+    try:
+        with open(state_path(), encoding='utf-8') as source:
+            return json.load(source)
+    except FileNotFoundError:
+        return {}
+
+
+def save_state(state):
+    path = state_path()
+    handle, tmp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(path)), suffix='.tmp')
+    try:
+        with os.fdopen(handle, 'w', encoding='utf-8') as output:
+            json.dump(state, output)
+        os.replace(tmp_path, path)
+    except OSError:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def flush_scale_data():
+    """
+    Удаляет всё, что создал генератор (диапазоны id из файла состояния),
+    и обычные строки, которые на них ссылаются. Обычные строки с id больше
+    ID_BASE, созданные после загрузки, остаются.
+
+    Ответы, викторины, варианты, вопросы и пользователи — миллионы строк —
+    удаляются сырым DELETE без обхода каскадов в Python; темы и предметы —
+    через ORM, чтобы удалились и строки других таблиц, которые на них ссылаются.
+    """
+    deleted = {}
+    state = load_state()
+    with transaction.atomic():
+        spans = {model: (ID_BASE, ID_BASE + state.get(model._meta.db_table, 0))
+                 for model in (Subject, Topic, Question, Choice, CustomUser, Quiz, UserAnswer)}
+        with connection.cursor() as cursor:
+            for model, columns in [
+                (UserAnswer, [('id', UserAnswer), ('quiz_id', Quiz), ('question_id', Question),
+                              ('selected_choice_id', Choice)]),
+                (Quiz, [('id', Quiz), ('user_id', CustomUser), ('topic_id', Topic)]),
+                (Choice, [('id', Choice), ('question_id', Question)]),
+                (Question, [('id', Question)]),
+                (CustomUser.groups.through, [('customuser_id', CustomUser)]),
+                (CustomUser.user_permissions.through, [('customuser_id', CustomUser)]),
+                (CustomUser, [('id', CustomUser)]),
+            ]:
+                where = ' OR '.join(f'({column} >= %s AND {column} < %s)' for column, _ in columns)
+                cursor.execute(
+                    f'DELETE FROM {connection.ops.quote_name(model._meta.db_table)} WHERE {where}',
+                    [bound for _, target in columns for bound in spans[target]]
+                )
+                deleted[model._meta.label] = cursor.rowcount
+        for model in (Topic, Subject):
+            first_id, last_id = spans[model]
+            deleted.update(model.objects.filter(pk__gte=first_id, pk__lt=last_id).delete()[1])
+    if os.path.exists(state_path()):
+        os.remove(state_path())
+    catalog_cache.bump_version()
+    return deleted
@@ -0,0 +1,191 @@
+"""
+Полнотекстовый поиск по вопросам и темам на SQLite FTS5.
+
+Индексы zein_app_question_fts (текст, пояснение, тема, предмет вопроса) и
+zein_app_topic_fts (название темы и предмета) создаются миграцией и
+обновляются триггерами на INSERT/UPDATE/DELETE, поэтому их не обходят ни
+bulk_create, ни queryset.update(). На других СУБД поиск откатывается к
+icontains без ранжирования.
+"""
+import re
+
+from django.db import connection as default_connection
+from django.db.models import F, FloatField, Q, Value
+
+MAX_TERMS = 10
+TOKENIZE = "tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3'"
+
+CREATE_SQL = [
+    f"""
+    CREATE VIRTUAL TABLE IF NOT EXISTS zein_app_question_fts
+    USING fts5(text, explanation, topic, subject, {TOKENIZE})
+    """,
+    f"""
+    CREATE VIRTUAL TABLE IF NOT EXISTS zein_app_topic_fts
+    USING fts5(name, subject, {TOKENIZE})
+    """,
+    # Веса колонок для bm25: совпадение в тексте вопроса важнее, чем в названии предмета
+    "INSERT INTO zein_app_question_fts(zein_app_question_fts, rank) VALUES ('rank', 'bm25(4.0, 1.0, 2.0, 1.0)')",
+    "INSERT INTO zein_app_topic_fts(zein_app_topic_fts, rank) VALUES ('rank', 'bm25(4.0, 1.0)')",
+    """
+    CREATE TRIGGER IF NOT EXISTS zein_app_question_fts_insert AFTER INSERT ON zein_app_question BEGIN
+        INSERT INTO zein_app_question_fts(rowid, text, explanation, topic, subject) VALUES (
+            new.id, new.text, coalesce(new.explanation, ''),
+            coalesce((SELECT name FROM zein_app_topic WHERE id = new.topic_id), ''),
+            coalesce((SELECT s.name FROM zein_app_topic t JOIN zein_app_subject s ON s.id = t.subject_id
+                      WHERE t.id = new.topic_id), '')
+        );
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS zein_app_question_fts_update
+    AFTER UPDATE OF text, explanation, topic_id ON zein_app_question BEGIN
+        DELETE FROM zein_app_question_fts WHERE rowid = old.id;
+        INSERT INTO zein_app_question_fts(rowid, text, explanation, topic, subject) VALUES (
+            new.id, new.text, coalesce(new.explanation, ''),
+            coalesce((SELECT name FROM zein_app_topic WHERE id = new.topic_id), ''),
+            coalesce((SELECT s.name FROM zein_app_topic t JOIN zein_app_subject s ON s.id = t.subject_id
+                      WHERE t.id = new.topic_id), '')
+        );
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS zein_app_question_fts_delete AFTER DELETE ON zein_app_question BEGIN
+        DELETE FROM zein_app_question_fts WHERE rowid = old.id;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS zein_app_topic_fts_insert AFTER INSERT ON zein_app_topic BEGIN
+        INSERT INTO zein_app_topic_fts(rowid, name, subject) VALUES (
+            new.id, new.name, coalesce((SELECT name FROM zein_app_subject WHERE id = new.subject_id), '')
+        );
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS zein_app_topic_fts_update
+    AFTER UPDATE OF name, subject_id ON zein_app_topic BEGIN
+        DELETE FROM zein_app_topic_fts WHERE rowid = old.id;
+        INSERT INTO zein_app_topic_fts(rowid, name, subject) VALUES (
+            new.id, new.name, coalesce((SELECT name FROM zein_app_subject WHERE id = new.subject_id), '')
+        );
+        UPDATE zein_app_question_fts
+        SET topic = new.name,
+            subject = coalesce((SELECT name FROM zein_app_subject WHERE id = new.subject_id), '')
+        WHERE rowid IN (SELECT id FROM zein_app_question WHERE topic_id = new.id);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS zein_app_topic_fts_delete AFTER DELETE ON zein_app_topic BEGIN
+        DELETE FROM zein_app_topic_fts WHERE rowid = old.id;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS zein_app_subject_fts_update
+    AFTER UPDATE OF name ON zein_app_subject BEGIN
+        UPDATE zein_app_topic_fts SET subject = new.name
+        WHERE rowid IN (SELECT id FROM zein_app_topic WHERE subject_id = new.id);
+        UPDATE zein_app_question_fts SET subject = new.name
+        WHERE rowid IN (SELECT q.id FROM zein_app_question q JOIN zein_app_topic t ON t.id = q.topic_id
+                        WHERE t.subject_id = new.id);
+    END
+    """,
+]
+
+DROP_SQL = [
+    "DROP TRIGGER IF EXISTS zein_app_question_fts_insert",
+    "DROP TRIGGER IF EXISTS zein_app_question_fts_update",
+    "DROP TRIGGER IF EXISTS zein_app_question_fts_delete",
+    "DROP TRIGGER IF EXISTS zein_app_topic_fts_insert",
+    "DROP TRIGGER IF EXISTS zein_app_topic_fts_update",
+    "DROP TRIGGER IF EXISTS zein_app_topic_fts_delete",
+    "DROP TRIGGER IF EXISTS zein_app_subject_fts_update",
+    "DROP TABLE IF EXISTS zein_app_question_fts",
+    "DROP TABLE IF EXISTS zein_app_topic_fts",
+]
+
+FILL_SQL = [
+    "DELETE FROM zein_app_question_fts",
+    """
+    INSERT INTO zein_app_question_fts(rowid, text, explanation, topic, subject)
+    SELECT q.id, q.text, coalesce(q.explanation, ''), coalesce(t.name, ''), coalesce(s.name, '')
+    FROM zein_app_question q
+    LEFT JOIN zein_app_topic t ON t.id = q.topic_id
+    LEFT JOIN zein_app_subject s ON s.id = t.subject_id
+    """,
+    "DELETE FROM zein_app_topic_fts",
+    """
+    INSERT INTO zein_app_topic_fts(rowid, name, subject)
+    SELECT t.id, t.name, coalesce(s.name, '')
+    FROM zein_app_topic t
+    LEFT JOIN zein_app_subject s ON s.id = t.subject_id
+    """,
+    "INSERT INTO zein_app_question_fts(zein_app_question_fts) VALUES ('optimize')",
+    "INSERT INTO zein_app_topic_fts(zein_app_topic_fts) VALUES ('optimize')",
+]
+
+
+def fts_enabled(connection=None):
+    return (connection or default_connection).vendor == 'sqlite'
+
+
+def _execute(connection, statements):
+    with connection.cursor() as cursor:
+        for sql in statements:
+            cursor.execute(sql)
+
+
+def create_search_index(connection=None):
+    connection = connection or default_connection
+    if fts_enabled(connection):
+        _execute(connection, CREATE_SQL + FILL_SQL)
+
+
+def drop_search_index(connection=None):
+    connection = connection or default_connection
+    if fts_enabled(connection):
+        _execute(connection, DROP_SQL)
+
+
+def rebuild_search_index(connection=None):
+    """Пересоздаёт таблицы и триггеры и заново заполняет индекс из базы."""
+    connection = connection or default_connection
+    drop_search_index(connection)
+    create_search_index(connection)
+
+
+def match_query(query):
+    """
+    Строка запроса FTS5 из пользовательского ввода: каждое слово в кавычках
+    как префикс, слова через AND. None, если слов нет.
+    """
+    terms = re.findall(r'\w+', query or '')[:MAX_TERMS]
+    if not terms:
+        return None
+    return ' '.join(f'"{term}"*' for term in terms)
+
+
+def _fallback(queryset, query, fields):
+    condition = Q()
+    for term in re.findall(r'\w+', query)[:MAX_TERMS]:
+        condition &= Q(*(Q(**{f'{field}__icontains': term}) for field in fields), _connector=Q.OR)
+    return queryset.filter(condition).annotate(search_rank=Value(0.0, output_field=FloatField()))
+
+
+def search_questions(queryset, query):
+    """Вопросы, подходящие под query, с аннотацией search_rank (меньше — релевантнее)."""
+    match = match_query(query)
+    if match is None:
+        return queryset.none()
+    if not fts_enabled():
+        return _fallback(queryset, query, ('text', 'explanation', 'topic__name', 'topic__subject__name'))
+    return queryset.filter(search_index__document=match).annotate(search_rank=F('search_index__rank'))
+
+
+def search_topics(queryset, query):
+    """Темы, подходящие под query, с аннотацией search_rank (меньше — релевантнее)."""
+    match = match_query(query)
+    if match is None:
+        return queryset.none()
+    if not fts_enabled():
+        return _fallback(queryset, query, ('name', 'subject__name'))
+    return queryset.filter(search_index__document=match).annotate(search_rank=F('search_index__rank'))
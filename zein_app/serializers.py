@@ -1,6 +1,7 @@
 import re
 from rest_framework import serializers
 from django.contrib.auth.models import User
+from .bad_passwords import is_bad_password
 from .models import BadPassword
 from .models import CustomUser
 
@@ -28,7 +29,7 @@ class RegisterSerializer(serializers.ModelSerializer):
             errors.append("Пароль должен содержать хотя бы одну цифру.")
         if not re.search(r'[@_!#$%^&*(),.?":{}|<>]', value):
             errors.append("Пароль должен содержать хотя бы один спецсимвол.")
-        if BadPassword.objects.filter(password__iexact=value).exists():
+        if is_bad_password(value):
             errors.append("Этот пароль слишком распространён. Пожалуйста, выберите другой.")
 
         if errors:
@@ -48,8 +49,7 @@ class RegisterSerializer(serializers.ModelSerializer):
             first_name=validated_data.get('first_name', ''),
             last_name=validated_data.get('last_name', '')
         )
-        user.full_name = f"{user.first_name} {user.last_name}".strip()
-        user.save()
+        # full_name заполняет CustomUser.save() из first_name/last_name
         return user
 
 
@@ -97,6 +97,7 @@ class BadPasswordSerializer(serializers.ModelSerializer):
     class Meta:
         model = BadPassword
         fields = '__all__'
+        extra_kwargs = {'password': {'required': True, 'allow_null': False, 'allow_blank': False}}
 
 
 
@@ -195,15 +196,11 @@ class AdminQuestionSerializer(serializers.ModelSerializer):
 
 
 class TopicListSerializer(serializers.ModelSerializer):
-    question_count = serializers.SerializerMethodField()
 
     class Meta:
         model = Topic
         fields = ['id', 'name', 'description', 'image', 'question_count']
 
-    def get_question_count(self, obj):
-        return obj.questions.count()
-
 
 class TopicDetailSerializer(serializers.ModelSerializer):
     questions = QuestionListSerializer(many=True, read_only=True)
@@ -214,15 +211,11 @@ class TopicDetailSerializer(serializers.ModelSerializer):
 
 
 class SubjectListSerializer(serializers.ModelSerializer):
-    topic_count = serializers.SerializerMethodField()
 
     class Meta:
         model = Subject
         fields = ['id', 'name', 'description', 'image', 'topic_count']
 
-    def get_topic_count(self, obj):
-        return obj.topics.count()
-
 
 class SubjectDetailSerializer(serializers.ModelSerializer):
     topics = TopicListSerializer(many=True, read_only=True)
@@ -251,6 +244,18 @@ class QuizAnswerSerializer(serializers.Serializer):
     choice_id = serializers.IntegerField()
 
 
+class QuizHistoryFilterSerializer(serializers.Serializer):
+    status = serializers.ChoiceField(choices=Quiz.STATUS_CHOICES, required=False)
+    topic_id = serializers.IntegerField(required=False)
+    date_from = serializers.DateField(required=False)
+    date_to = serializers.DateField(required=False)
+
+    def validate(self, attrs):
+        if 'date_from' in attrs and 'date_to' in attrs and attrs['date_from'] > attrs['date_to']:
+            raise serializers.ValidationError("date_from не может быть позже date_to")
+        return attrs
+
+
 class QuizResultSerializer(serializers.ModelSerializer):
     topic_name = serializers.ReadOnlyField(source='topic.name')
     subject_name = serializers.ReadOnlyField(source='topic.subject.name')
@@ -0,0 +1,114 @@
+"""
+Счётчики Topic.question_count и Subject.topic_count ведутся сигналами save/delete.
+
+QuerySet.update(topic=...) / update(subject=...) и bulk_create сигналов не
+шлют и счётчики не переносят: после таких массовых правок нужен
+`manage.py rebuild_counters`.
+"""
+from django.db.models import F, QuerySet
+from django.db.models.signals import pre_save, post_save, post_delete
+from django.dispatch import receiver
+
+from .authentication import forget_token_version, user_rows
+from .bad_passwords import bad_password_filter
+from .catalog_cache import catalog_cache
+from .models import CustomUser, Subject, Topic, Question, Choice, BadPassword
+
+
+def _shift_counter(model, pk, field, delta):
+    if pk is None:
+        return
+    rows = model.objects.filter(pk=pk)
+    if delta < 0:
+        rows = rows.filter(**{f'{field}__gte': -delta})
+    rows.update(**{field: F(field) + delta})
+
+
+def _remember_parent(sender, instance, field, update_fields):
+    # Для уже сохранённой записи запоминаем прежнего родителя, чтобы перенести счётчик
+    instance._counter_parent_id = None
+    if update_fields is not None and not {field, field.removesuffix('_id')} & set(update_fields):
+        # save(update_fields=...) без FK родителя не меняет — лишний SELECT не нужен
+        instance._counter_parent_id = getattr(instance, field)
+        return
+    if instance.pk and not instance._state.adding:
+        instance._counter_parent_id = (
+            sender.objects.filter(pk=instance.pk).values_list(field, flat=True).first()
+        )
+
+
+def _deleted_with_parent(origin, *parent_models):
+    # Каскад от удаляемого родителя: его строка уходит вместе с детьми, и UPDATE счётчика
+    # на каждого ребёнка был бы лишним
+    model = origin.model if isinstance(origin, QuerySet) else type(origin)
+    return issubclass(model, parent_models)
+
+
+def _move_counter(instance, created, parent_model, field, counter):
+    parent_id = getattr(instance, field)
+    if created:
+        _shift_counter(parent_model, parent_id, counter, 1)
+        return
+    old_parent_id = getattr(instance, '_counter_parent_id', None)
+    if old_parent_id != parent_id:
+        _shift_counter(parent_model, old_parent_id, counter, -1)
+        _shift_counter(parent_model, parent_id, counter, 1)
+
+
+@receiver(pre_save, sender=Question)
+def remember_question_topic(sender, instance, update_fields=None, **kwargs):
+    _remember_parent(sender, instance, 'topic_id', update_fields)
+
+
+@receiver(post_save, sender=Question)
+def update_question_count(sender, instance, created, **kwargs):
+    _move_counter(instance, created, Topic, 'topic_id', 'question_count')
+
+
+@receiver(post_delete, sender=Question)
+def decrease_question_count(sender, instance, origin=None, **kwargs):
+    if origin is not None and _deleted_with_parent(origin, Topic, Subject):
+        return
+    _shift_counter(Topic, instance.topic_id, 'question_count', -1)
+
+
+@receiver(pre_save, sender=Topic)
+def remember_topic_subject(sender, instance, update_fields=None, **kwargs):
+    _remember_parent(sender, instance, 'subject_id', update_fields)
+
+
+@receiver(post_save, sender=Topic)
+def update_topic_count(sender, instance, created, **kwargs):
+    _move_counter(instance, created, Subject, 'subject_id', 'topic_count')
+
+
+@receiver(post_delete, sender=Topic)
+def decrease_topic_count(sender, instance, origin=None, **kwargs):
+    if origin is not None and _deleted_with_parent(origin, Subject):
+        return
+    _shift_counter(Subject, instance.subject_id, 'topic_count', -1)
+
+
+@receiver(post_save, sender=Subject)
+@receiver(post_save, sender=Topic)
+@receiver(post_save, sender=Question)
+@receiver(post_save, sender=Choice)
+@receiver(post_delete, sender=Subject)
+@receiver(post_delete, sender=Topic)
+@receiver(post_delete, sender=Question)
+@receiver(post_delete, sender=Choice)
+def bump_catalog_version(sender, **kwargs):
+    catalog_cache.bump_version_on_commit()
+
+
+@receiver(post_save, sender=CustomUser)
+@receiver(post_delete, sender=CustomUser)
+def forget_cached_user(sender, instance, **kwargs):
+    user_rows.discard(instance.pk)
+    if kwargs.get('signal') is post_delete or getattr(instance, '_token_version_changed', False):
+        forget_token_version(instance.pk)
+
+
+@receiver(post_save, sender=BadPassword)
+def bump_bad_password_version(sender, **kwargs):
+    bad_password_filter.bump_version()
@@ -0,0 +1,41 @@
+import atexit
+import os
+import shutil
+import tempfile
+
+from django.conf import settings
+from django.test import override_settings
+from django.test.runner import DiscoverRunner
+
+from .metrics import store
+
+
+class TestRunner(DiscoverRunner):
+    """
+    Метрики, файловые кэши (общий кэш каталога, throttling, версии токенов)
+    и состояние генератора scale_data тестового прогона пишутся во временный
+    каталог, а не в METRICS_DIR и BASE_DIR/cache проекта и не рядом с базой,
+    и удаляются после прогона.
+    """
+
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        self.temp_dir = tempfile.mkdtemp(prefix='zein-test-')
+        caches = {
+            alias: {**config, 'LOCATION': os.path.join(self.temp_dir, f'cache-{alias}')}
+            if config['BACKEND'].endswith('FileBasedCache') else config
+            for alias, config in settings.CACHES.items()
+        }
+        self.temp_override = override_settings(
+            METRICS_DIR=os.path.join(self.temp_dir, 'metrics'),
+            SCALE_DATA_STATE_FILE=os.path.join(self.temp_dir, 'scale_data.json'),
+            CACHES=caches,
+        )
+        self.temp_override.enable()
+
+    def teardown_test_environment(self, **kwargs):
+        # Значения метрик тестов не нужны: без этого atexit-сброс записал бы их в METRICS_DIR проекта
+        atexit.unregister(store.flush)
+        self.temp_override.disable()
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+        super().teardown_test_environment(**kwargs)
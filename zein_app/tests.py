@@ -1,3 +1,1497 @@
-from django.test import TestCase
+import asyncio
+import csv
+import importlib
+import json
+import os
+import re
+import shutil
+import subprocess
+import tempfile
+import threading
+import time
+from base64 import urlsafe_b64encode
+from concurrent.futures import ThreadPoolExecutor
+from io import StringIO
+from types import SimpleNamespace
+from unittest import mock, skipUnless
+from urllib.parse import parse_qs, urlsplit
 
-# Create your tests here.
+from django.apps import apps as django_apps
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.core.cache import caches
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import CommandError, call_command
+from django.db import connection, connections
+from django.db.models import F
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import URLResolver, get_resolver, reverse
+from django.utils.http import http_date
+from rest_framework.parsers import JSONParser
+from rest_framework.request import Request
+from rest_framework.test import APIClient, APIRequestFactory
+from rest_framework_simplejwt.tokens import AccessToken
+
+from . import metrics
+from .authentication import access_token_for, token_version, user_rows, version_key, shared_cache
+from .bad_passwords import bad_password_filter, is_bad_password
+from .catalog_cache import catalog_cache
+from .db_router import ReplicaPinMiddleware, ReplicaRouter, primary_reads, replica_reads
+from .fast_serializers import question_choice_rows, question_payload
+from .scale_data import ID_BASE, PRESETS, ScaleDataSeeder, load_state, state_path
+from .models import (
+    CustomUser, Subject, Topic, Question, Choice, Quiz, UserAnswer,
+    History, BadPassword, Course, Teacher, FAQ, Contact, TelegramBot
+)
+from .serializers import QuestionDetailSerializer
+from .throttling import TokenBucketIPThrottle, failed_logins, login_failed, throttle_cache, username_ident
+
+
+class QuizAnswerTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = CustomUser.objects.create_user(username='student', password='Secret_123')
+        subject = Subject.objects.create(name='Математика', title_ru='Математика')
+        cls.topic = Topic.objects.create(subject=subject, name='Дроби')
+        for i in range(3):
+            question = Question.objects.create(topic=cls.topic, text=f'Вопрос {i}')
+            Choice.objects.create(question=question, text='Верно', is_correct=True)
+            Choice.objects.create(question=question, text='Неверно')
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def start_quiz(self):
+        response = self.client.post('/quiz/', {'topic': self.topic.id}, format='json')
+        self.assertEqual(response.status_code, 201)
+        return response.data['quiz_id'], response.data['question']
+
+    def answer(self, quiz_id, question, choice_index=0):
+        return self.client.post(f'/quiz/{quiz_id}/answer/', {
+            'question_id': question['id'],
+            'choice_id': question['choices'][choice_index]['id'],
+        }, format='json')
+
+    def test_answer_query_budget(self):
+        quiz_id, question = self.start_quiz()
+        with CaptureQueriesContext(connection) as queries:
+            response = self.answer(quiz_id, question)
+        self.assertEqual(response.status_code, 200)
+        # SAVEPOINT/RELEASE даёт atomic() внутри транзакции TestCase, в работе это BEGIN/COMMIT
+        statements = [query['sql'] for query in queries.captured_queries]
+        savepoints = [sql for sql in statements if 'SAVEPOINT' in sql]
+        real = [sql.split()[0] for sql in statements if 'SAVEPOINT' not in sql]
+        # квиз, варианты текущего и следующего вопроса, INSERT ответа, UPDATE счёта и курсора
+        self.assertEqual(real, ['SELECT', 'SELECT', 'INSERT', 'UPDATE'])
+        self.assertEqual(len(savepoints), 2)
+        self.assertTrue(response.data['is_correct'])
+        self.assertEqual(len(response.data['next_question']['choices']), 2)
+
+    def test_answer_walks_quiz_to_completion(self):
+        quiz_id, question = self.start_quiz()
+        response = self.answer(quiz_id, question)
+        response = self.answer(quiz_id, response.data['next_question'], choice_index=1)
+        self.assertFalse(response.data['is_correct'])
+        response = self.answer(quiz_id, response.data['next_question'])
+
+        self.assertEqual(response.data['message'], 'Викторина завершена')
+        quiz = Quiz.objects.get(id=quiz_id)
+        self.assertEqual(quiz.status, 'completed')
+        self.assertEqual(quiz.score, 2)
+        self.assertEqual(quiz.answers.count(), 3)
+
+    def test_repeated_answer_is_rejected(self):
+        quiz_id, question = self.start_quiz()
+        self.answer(quiz_id, question)
+        response = self.answer(quiz_id, question)
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(UserAnswer.objects.filter(quiz_id=quiz_id).count(), 1)
+        self.assertEqual(Quiz.objects.get(id=quiz_id).score, 1)
+
+    def test_question_without_choices_is_not_counted(self):
+        Question.objects.create(topic=self.topic, text='Без вариантов')
+        quiz_id, _ = self.start_quiz()
+
+        quiz = Quiz.objects.get(id=quiz_id)
+        self.assertEqual((quiz.total_questions, len(quiz.question_ids)), (3, 3))
+
+    def test_question_emptied_after_start_is_dropped(self):
+        quiz_id, question = self.start_quiz()
+        skipped_id = Quiz.objects.get(id=quiz_id).question_ids[1]
+        Choice.objects.filter(question_id=skipped_id).delete()
+
+        response = self.answer(quiz_id, question)
+        next_question = response.data['next_question']
+        self.assertNotEqual(next_question['id'], skipped_id)
+        quiz = Quiz.objects.get(id=quiz_id)
+        self.assertEqual(quiz.total_questions, 2)
+        self.assertNotIn(skipped_id, quiz.question_ids)
+
+        response = self.client.post(f'/quiz/{quiz_id}/answer/', {
+            'question_id': skipped_id, 'choice_id': question['choices'][0]['id'],
+        }, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertNotEqual(response.data['error'], 'Вы уже ответили на этот вопрос')
+
+        response = self.answer(quiz_id, next_question)
+        self.assertEqual(response.data['results']['total_questions'], 2)
+
+    def test_score_update_does_not_overwrite_concurrent_increment(self):
+        quiz_id, question = self.start_quiz()
+        create = UserAnswer.objects.create
+
+        def create_after_concurrent_answer(**kwargs):
+            # Параллельный запрос увеличил счёт уже после того, как этот запрос прочитал квиз
+            Quiz.objects.filter(id=quiz_id).update(score=F('score') + 1)
+            return create(**kwargs)
+
+        with mock.patch.object(UserAnswer.objects, 'create', side_effect=create_after_concurrent_answer):
+            self.answer(quiz_id, question)
+
+        self.assertEqual(Quiz.objects.get(id=quiz_id).score, 2)
+
+    def test_batch_answers_complete_quiz(self):
+        quiz_id, _ = self.start_quiz()
+        questions = Question.objects.filter(topic=self.topic).prefetch_related('choices')
+        payload = [
+            {'question_id': question.id, 'choice_id': question.choices.all()[index % 2].id}
+            for index, question in enumerate(reversed(questions))
+        ]
+
+        response = self.client.post(f'/quiz/{quiz_id}/answers/batch/', payload[:2], format='json')
+        self.assertEqual(response.data['answered'], 2)
+        self.assertEqual(response.data['next_question']['id'], payload[2]['question_id'])
+
+        response = self.client.post(f'/quiz/{quiz_id}/answers/batch/', payload, format='json')
+        self.assertEqual(response.data['message'], 'Викторина завершена')
+        quiz = Quiz.objects.get(id=quiz_id)
+        self.assertEqual((quiz.status, quiz.score, quiz.answers.count()), ('completed', 2, 3))
+
+
+class AsyncQuizTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = CustomUser.objects.create_user(username='student', password='Secret_123')
+        cls.other = CustomUser.objects.create_user(username='other', password='Secret_123')
+        subject = Subject.objects.create(name='Математика', title_ru='Математика')
+        cls.topic = Topic.objects.create(subject=subject, name='Дроби')
+        for i in range(3):
+            question = Question.objects.create(topic=cls.topic, text=f'Вопрос {i}')
+            Choice.objects.create(question=question, text='Верно', is_correct=True)
+            Choice.objects.create(question=question, text='Неверно')
+
+    def setUp(self):
+        # Заголовки AsyncClient(headers=...) не применяются, передаём в каждый запрос
+        self.headers = {'Authorization': f'Bearer {AccessToken.for_user(self.user)}'}
+
+    async def test_quiz_flow_under_asgi(self):
+        response = await self.async_client.post(
+            '/async/quiz/', {'topic': self.topic.id}, content_type='application/json', headers=self.headers
+        )
+        self.assertEqual(response.status_code, 201)
+        quiz_id, question = response.json()['quiz_id'], response.json()['question']
+
+        response = await self.async_client.get(f'/async/quiz/{quiz_id}/next/', headers=self.headers)
+        self.assertEqual(response.json()['question'], question)
+
+        for choice_index in (0, 1, 0):
+            response = await self.async_client.post(f'/async/quiz/{quiz_id}/answer/', {
+                'question_id': question['id'], 'choice_id': question['choices'][choice_index]['id'],
+            }, content_type='application/json', headers=self.headers)
+            self.assertEqual(response.status_code, 200)
+            question = response.json().get('next_question')
+        self.assertEqual(response.json()['message'], 'Викторина завершена')
+        self.assertEqual(response.json()['results']['score'], 2)
+
+        quiz = await Quiz.objects.aget(id=quiz_id)
+        self.assertEqual((quiz.status, quiz.score, await quiz.answers.acount()), ('completed', 2, 3))
+
+        response = await self.async_client.get(f'/async/quiz/{quiz_id}/', headers=self.headers)
+        self.assertEqual(response.json()['status'], 'completed')
+        self.assertEqual(len(response.json()['answers']), 3)
+
+    def test_responses_match_sync_endpoints(self):
+        sync_client = APIClient()
+        sync_client.force_authenticate(self.user)
+        async_client = APIClient()
+        async_client.credentials(HTTP_AUTHORIZATION=self.headers['Authorization'])
+
+        quizzes = {}
+        for client, prefix in ((sync_client, '/quiz'), (async_client, '/async/quiz')):
+            started = client.post(f'{prefix}/', {'topic': self.topic.id}, format='json').json()
+            question = started['question']
+            answered = client.post(f'{prefix}/{started["quiz_id"]}/answer/', {
+                'question_id': question['id'], 'choice_id': question['choices'][1]['id'],
+            }, format='json').json()
+            detail = client.get(f'{prefix}/{started["quiz_id"]}/').json()
+            quizzes[prefix] = (question, answered, {key: value for key, value in detail.items() if key not in (
+                'id', 'started_at', 'answers'
+            )})
+        self.assertEqual(quizzes['/quiz'], quizzes['/async/quiz'])
+
+    def test_authentication_and_ownership(self):
+        quiz = Quiz.objects.create(user=self.other, topic=self.topic, question_ids=[], total_questions=0)
+        client = APIClient()
+
+        response = client.get(f'/async/quiz/{quiz.id}/')
+        self.assertEqual(response.status_code, 401)
+        client.credentials(HTTP_AUTHORIZATION='Bearer broken')
+        self.assertEqual(client.get(f'/async/quiz/{quiz.id}/').status_code, 401)
+
+        client.credentials(HTTP_AUTHORIZATION=self.headers['Authorization'])
+        self.assertEqual(client.get(f'/async/quiz/{quiz.id}/').status_code, 404)
+        self.assertEqual(client.get('/async/quiz/').status_code, 405)
+        response = client.post('/async/quiz/', {'topic': 0}, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('topic', response.json())
+
+
+class StatelessAuthenticationTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = CustomUser.objects.create_user(username='student', password='Secret_123', email='s@example.com')
+        cls.staff = CustomUser.objects.create_user(username='staff', password='Secret_123', is_staff=True)
+
+    def setUp(self):
+        user_rows.clear()
+        # Лимиты входа хранятся в общем кэше и не откатываются вместе с транзакцией теста
+        throttle_cache().clear()
+        for user in (self.user, self.staff):
+            # Версии в файловом кэше переживают откат транзакции теста
+            shared_cache().delete(version_key(user.pk))
+            self.addCleanup(shared_cache().delete, version_key(user.pk))
+
+    def client_for(self, token):
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f'Bearer {token}')
+        return client
+
+    def login(self, username='student', password='Secret_123'):
+        response = APIClient().post('/api/auth/login/', {'username': username, 'password': password}, format='json')
+        self.assertEqual(response.status_code, 200)
+        return response.data['access']
+
+    def test_authenticated_request_skips_user_query(self):
+        client = self.client_for(self.login())
+        client.get('/quiz/')  # версия токенов попадает в общий кэш
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(client.get('/quiz/').status_code, 200)
+        self.assertFalse([query for query in queries.captured_queries if 'zein_app_customuser' in query['sql']])
+
+        # Токены старого формата по-прежнему принимаются, с чтением пользователя
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(self.client_for(AccessToken.for_user(self.user)).get('/quiz/').status_code, 200)
+        self.assertTrue([query for query in queries.captured_queries if 'zein_app_customuser' in query['sql']])
+
+    def test_full_user_is_loaded_once_when_needed(self):
+        client = self.client_for(self.login())
+        client.get('/quiz/')
+        with self.assertNumQueries(1):
+            response = client.get('/api/dashboard/')
+        self.assertEqual(response.data['user']['email'], 's@example.com')
+        with self.assertNumQueries(0):
+            client.get('/api/dashboard/')
+
+    def test_staff_claim(self):
+        self.assertEqual(self.client_for(self.login()).get('/catalog/cache-stats/').status_code, 403)
+        self.assertEqual(self.client_for(self.login('staff')).get('/catalog/cache-stats/').status_code, 200)
+
+        response = APIClient().post('/api/token/', {'username': 'staff', 'password': 'Secret_123'}, format='json')
+        token = AccessToken(response.data['access'])
+        self.assertEqual((token['is_staff'], token['ver']), (True, 0))
+
+    def test_password_change_and_deactivation_revoke_tokens(self):
+        token = self.login()
+        self.assertEqual(self.client_for(token).get('/quiz/').status_code, 200)
+
+        user = CustomUser.objects.get(pk=self.user.pk)
+        user.set_password('Changed_123')
+        user.save()
+        response = self.client_for(token).get('/quiz/')
+        self.assertEqual((response.status_code, response.data['detail'].code), (401, 'token_revoked'))
+
+        token = self.login(password='Changed_123')
+        self.assertEqual(self.client_for(token).get('/quiz/').status_code, 200)
+        # Поля, не влияющие на доступ, токены не отзывают
+        user.full_name = 'Новое имя'
+        user.save()
+        self.assertEqual(self.client_for(token).get('/quiz/').status_code, 200)
+
+        user.is_active = False
+        user.save(update_fields=['is_active'])
+        self.assertEqual(self.client_for(token).get('/quiz/').status_code, 401)
+        self.assertEqual(CustomUser.objects.get(pk=self.user.pk).token_version, 2)
+
+    def test_revoke_endpoint(self):
+        first, second = self.login(), self.login()
+        self.assertEqual(self.client_for(first).post('/api/auth/revoke/').status_code, 204)
+        self.assertEqual(self.client_for(second).get('/quiz/').status_code, 401)
+        self.assertEqual(self.client_for(self.login()).get('/quiz/').status_code, 200)
+
+
+class AuthThrottleTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = CustomUser.objects.create_user(username='student', password='Secret_123')
+
+    def setUp(self):
+        throttle_cache().clear()
+        metrics.store.reset()
+        self.addCleanup(metrics.store.reset)
+
+    def login(self, password='Secret_123', username='student', ip='10.0.0.1', url='/api/auth/login/'):
+        return APIClient(REMOTE_ADDR=ip).post(url, {'username': username, 'password': password}, format='json')
+
+    @override_settings(REST_FRAMEWORK=dict(
+        settings.REST_FRAMEWORK, DEFAULT_THROTTLE_RATES={'login_ip': '3/min', 'login_username': '100/min'}
+    ))
+    def test_ip_bucket(self):
+        for _ in range(3):
+            self.assertEqual(self.login().status_code, 200)
+        response = self.login()
+        self.assertEqual(response.status_code, 429)
+        self.assertGreater(int(response['Retry-After']), 0)
+        self.assertEqual(self.login(ip='10.0.0.2').status_code, 200)
+
+        # Корзина пополняется со временем: через 20 с — одна попытка
+        with mock.patch('rest_framework.throttling.SimpleRateThrottle.timer', return_value=time.time() + 21):
+            self.assertEqual(self.login().status_code, 200)
+            self.assertEqual(self.login().status_code, 429)
+        self.assertIn(('auth_throttled_total', (('scope', 'login_ip'),)), metrics.store.collect())
+
+    @override_settings(REST_FRAMEWORK=dict(
+        settings.REST_FRAMEWORK, DEFAULT_THROTTLE_RATES={'login_ip': '100/min', 'login_username': '2/min'}
+    ))
+    def test_username_bucket_is_shared_by_login_endpoints(self):
+        self.assertEqual(self.login(ip='10.0.0.1').status_code, 200)
+        # Имя сравнивается без учёта регистра: STUDENT расходует ту же корзину
+        self.assertEqual(self.login(ip='10.0.0.2', username='STUDENT', url='/api/token/').status_code, 401)
+        self.assertEqual(self.login(ip='10.0.0.3').status_code, 429)
+        self.assertEqual(self.login(ip='10.0.0.3', url='/api/token/').status_code, 429)
+        self.assertEqual(self.login(ip='10.0.0.3', username='other').status_code, 401)
+
+    @override_settings(AUTH_FAILED_LOGIN_LIMIT=3)
+    def test_failed_logins_skip_password_check(self):
+        for _ in range(2):
+            self.assertEqual(self.login('wrong').status_code, 401)
+        self.assertEqual(self.login(url='/api/token/', password='wrong').status_code, 401)
+
+        with mock.patch('zein_app.views.authenticate') as authenticate:
+            response = self.login()
+        self.assertEqual(response.status_code, 429)
+        authenticate.assert_not_called()
+        self.assertEqual(metrics.store.collect()[('auth_throttled_total', (('scope', 'failed_login'),))], 1)
+
+    @override_settings(AUTH_FAILED_LOGIN_LIMIT=2)
+    def test_successful_login_resets_failures(self):
+        self.assertEqual(self.login('wrong').status_code, 401)
+        self.assertEqual(self.login().status_code, 200)
+        self.assertEqual(self.login('wrong').status_code, 401)
+        self.assertEqual(self.login().status_code, 200)
+
+    def concurrently(self, call, count=20):
+        """call() из count потоков, стартующих одновременно."""
+        barrier = threading.Barrier(count)
+
+        def attempt(_):
+            barrier.wait()
+            return call()
+
+        with ThreadPoolExecutor(max_workers=count) as pool:
+            return list(pool.map(attempt, range(count)))
+
+    @override_settings(REST_FRAMEWORK=dict(
+        settings.REST_FRAMEWORK, DEFAULT_THROTTLE_RATES={'login_ip': '5/min', 'login_username': '100/min'}
+    ))
+    def test_concurrent_attempts_do_not_overdraw_bucket(self):
+        request = Request(APIRequestFactory().post(
+            '/api/auth/login/', {'username': 'student'}, format='json', REMOTE_ADDR='10.0.0.1'
+        ))
+        view = SimpleNamespace(throttle_scope='login')
+        allowed = self.concurrently(lambda: TokenBucketIPThrottle().allow_request(request, view))
+        self.assertEqual(allowed.count(True), 5)
+
+    def test_concurrent_failures_are_all_counted(self):
+        request = Request(
+            APIRequestFactory().post('/api/auth/login/', {'username': 'student'}, format='json'),
+            parsers=[JSONParser()],
+        )
+        # Тело разбирается до потоков
+        ident = username_ident(request)
+        self.concurrently(lambda: login_failed(request))
+        self.assertEqual(failed_logins(ident)[0], 20)
+
+    @override_settings(REST_FRAMEWORK=dict(
+        settings.REST_FRAMEWORK, DEFAULT_THROTTLE_RATES={'register_ip': '2/hour', 'register_username': '100/hour'}
+    ))
+    def test_register_is_throttled(self):
+        client = APIClient(REMOTE_ADDR='10.0.0.1')
+        statuses = [
+            client.post('/api/auth/register/', {
+                'username': f'new{i}', 'email': f'new{i}@example.com', 'password': 'Strong_Passw0rd!'
+            }, format='json').status_code
+            for i in range(3)
+        ]
+        self.assertEqual(statuses, [201, 201, 429])
+
+
+class FastSerializerTests(TestCase):
+
+    def test_question_payload_matches_model_serializer(self):
+        subject = Subject.objects.create(name='Литература', title_ru='Литература')
+        topic = Topic.objects.create(subject=subject, name='Поэзия')
+        question = Question.objects.create(topic=topic, text='Автор?', image='questions/poet.png')
+        Choice.objects.create(question=question, text='Пушкин', is_correct=True)
+        Choice.objects.create(question=question, text='Лермонтов')
+
+        rows = list(question_choice_rows(question_id=question.id))
+        self.assertEqual(question_payload(rows), QuestionDetailSerializer(question).data)
+
+
+class QuizHistoryTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = CustomUser.objects.create_user(username='student', password='Secret_123')
+        subject = Subject.objects.create(name='Биология', title_ru='Биология')
+        cls.topics = [Topic.objects.create(subject=subject, name=f'Тема {i}') for i in range(3)]
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def create_quizzes(self, count):
+        for i in range(count):
+            Quiz.objects.create(
+                user=self.user,
+                topic=self.topics[i % 3],
+                status='completed' if i % 2 else 'in_progress'
+            )
+
+    def test_history_query_count_does_not_grow(self):
+        self.create_quizzes(3)
+        with CaptureQueriesContext(connection) as small:
+            self.client.get('/quiz/')
+        self.create_quizzes(20)
+        with CaptureQueriesContext(connection) as large:
+            response = self.client.get('/quiz/?page_size=50')
+
+        self.assertEqual(len(response.data['results']), 23)
+        self.assertEqual(len(small), len(large))
+
+    def test_history_filters(self):
+        self.create_quizzes(6)
+        response = self.client.get(f'/quiz/?status=completed&topic_id={self.topics[1].id}')
+        self.assertEqual(response.data['total_items'], 1)
+
+        response = self.client.get('/quiz/?date_from=2000-01-01&date_to=2000-01-02')
+        self.assertEqual(response.data['total_items'], 0)
+        response = self.client.get('/quiz/?status=unknown')
+        self.assertEqual(response.status_code, 400)
+
+
+class CatalogCounterTests(TestCase):
+
+    def setUp(self):
+        catalog_cache.clear()
+
+    def test_counters_follow_question_and_topic_changes(self):
+        subject = Subject.objects.create(name='Физика', title_ru='Физика')
+        first = Topic.objects.create(subject=subject, name='Механика')
+        second = Topic.objects.create(subject=subject, name='Оптика')
+        question = Question.objects.create(topic=first, text='Вопрос')
+        Question.objects.create(topic=first, text='Ещё вопрос')
+
+        question.topic = second
+        question.save()
+        second.delete()
+
+        subject.refresh_from_db()
+        first.refresh_from_db()
+        self.assertEqual((subject.topic_count, first.question_count), (1, 1))
+
+    def test_save_without_parent_field_skips_parent_lookup(self):
+        subject = Subject.objects.create(name='Биология', title_ru='Биология')
+        topic = Topic.objects.create(subject=subject, name='Клетка')
+        question = Question.objects.create(topic=topic, text='Вопрос')
+
+        question.text = 'Новый текст'
+        with CaptureQueriesContext(connection) as queries:
+            question.save(update_fields=['text'])
+        self.assertFalse([query for query in queries.captured_queries if query['sql'].startswith('SELECT')])
+        topic.refresh_from_db()
+        self.assertEqual(topic.question_count, 1)
+
+    def test_cascade_delete_skips_counters_of_deleted_parents(self):
+        subject = Subject.objects.create(name='Астрономия', title_ru='Астрономия')
+        kept = Topic.objects.create(subject=subject, name='Планеты')
+        topic = Topic.objects.create(subject=subject, name='Звёзды')
+        Question.objects.bulk_create([Question(topic=topic, text=str(i)) for i in range(3)])
+
+        with CaptureQueriesContext(connection) as queries:
+            topic.delete()
+        counter_updates = [query['sql'] for query in queries.captured_queries if query['sql'].startswith('UPDATE')]
+        self.assertEqual(len(counter_updates), 1)
+        self.assertIn('"zein_app_subject"', counter_updates[0])
+
+        subject.refresh_from_db()
+        self.assertEqual(subject.topic_count, 1)
+        self.assertTrue(Topic.objects.filter(id=kept.id).exists())
+
+    def test_rebuild_counters_after_bulk_create(self):
+        subject = Subject.objects.create(name='Химия', title_ru='Химия')
+        topic = Topic.objects.create(subject=subject, name='Кислоты')
+        Question.objects.bulk_create([Question(topic=topic, text=str(i)) for i in range(5)])
+
+        call_command('rebuild_counters', stdout=StringIO())
+
+        topic.refresh_from_db()
+        self.assertEqual(topic.question_count, 5)
+        response = APIClient().get(f'/subjects/{subject.id}/')
+        self.assertEqual(response.data['topics'][0]['question_count'], 5)
+
+
+class CatalogCacheTests(TestCase):
+
+    def setUp(self):
+        catalog_cache.clear()
+
+    def test_catalog_is_served_from_cache_until_it_changes(self):
+        before = catalog_cache.stats()
+        with self.captureOnCommitCallbacks(execute=True):
+            subject = Subject.objects.create(name='История', title_ru='История')
+            Topic.objects.create(subject=subject, name='Древний мир')
+
+        self.client.get(f'/subjects/{subject.id}/')
+        with self.assertNumQueries(0):
+            response = self.client.get(f'/subjects/{subject.id}/')
+        self.assertEqual(len(response.data['topics']), 1)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Topic.objects.create(subject=subject, name='Средние века')
+
+        response = self.client.get(f'/subjects/{subject.id}/')
+        self.assertEqual(len(response.data['topics']), 2)
+        stats = catalog_cache.stats()
+        self.assertEqual((stats['hits'] - before['hits'], stats['misses'] - before['misses']), (1, 2))
+
+    def test_conditional_get_returns_not_modified(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            subject = Subject.objects.create(name='География', title_ru='География')
+
+        response = self.client.get('/subjects/')
+        etag = response['ETag']
+        # Только ETag: Last-Modified с точностью в секунду не видит изменений в ту же секунду
+        self.assertNotIn('Last-Modified', response)
+
+        with self.assertNumQueries(0):
+            response = self.client.get('/subjects/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            subject.save()
+        response = self.client.get('/subjects/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        # If-Modified-Since сразу после изменения больше не даёт устаревший 304
+        response = self.client.get('/subjects/', HTTP_IF_MODIFIED_SINCE=http_date(time.time() + 1))
+        self.assertEqual(response.status_code, 200)
+
+
+class SearchTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.subject = Subject.objects.create(name='Математика', title_ru='Математика')
+        cls.fractions = Topic.objects.create(subject=cls.subject, name='Дроби')
+        cls.equations = Topic.objects.create(subject=cls.subject, name='Уравнения')
+        cls.exact = Question.objects.create(topic=cls.fractions, text='Сложите дроби 1/2 и 1/3')
+        cls.mention = Question.objects.create(
+            topic=cls.equations, text='Решите уравнение', explanation='Сначала избавьтесь от дроби'
+        )
+        Question.objects.bulk_create([Question(topic=cls.equations, text='Квадратное уравнение')])
+
+    def setUp(self):
+        catalog_cache.clear()
+
+    def test_questions_are_ranked_by_relevance(self):
+        response = self.client.get('/questions/', {'search': 'дроб'})
+        self.assertEqual([question['id'] for question in response.data], [self.exact.id, self.mention.id])
+
+        response = self.client.get('/questions/', {'search': 'квадрат'})
+        self.assertEqual(len(response.data), 1)
+
+        response = self.client.get('/questions/', {'search': 'дроб', 'cursor': '', 'page_size': 1})
+        self.assertEqual([question['id'] for question in response.data['results']], [self.exact.id])
+        response = self.client.get(response.data['next'])
+        self.assertEqual([question['id'] for question in response.data['results']], [self.mention.id])
+
+    def test_index_follows_renames(self):
+        Subject.objects.filter(pk=self.subject.pk).update(name='Алгебра')
+        Topic.objects.filter(pk=self.fractions.pk).update(name='Доли')
+
+        response = self.client.get('/questions/', {'search': 'алгебра доли'})
+        self.assertEqual([question['id'] for question in response.data], [self.exact.id])
+        response = self.client.get('/topics/', {'search': 'алгеб'})
+        self.assertEqual(len(response.data), 2)
+
+    def test_admin_search_uses_index(self):
+        admin = CustomUser.objects.create_superuser(username='admin', password='Secret_123')
+        self.client.force_login(admin)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/admin/zein_app/question/', {'q': 'дроби'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['cl'].result_count, 2)
+        self.assertFalse(any('LIKE' in query['sql'] for query in queries.captured_queries))
+
+    def test_rebuild_command(self):
+        with connection.cursor() as cursor:
+            cursor.execute('DELETE FROM zein_app_question_fts')
+        call_command('rebuild_search_index', stdout=StringIO())
+        response = self.client.get('/questions/', {'search': 'уравнение'})
+        self.assertEqual(len(response.data), 2)
+
+
+class KeysetPaginationTests(TestCase):
+
+    def test_cursor_walks_users_without_count(self):
+        for i in range(5):
+            CustomUser.objects.create_user(username=f'user{i}', password='Secret_123')
+
+        seen = []
+        url = '/users/?cursor=&page_size=2'
+        while url:
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.get(url)
+            self.assertFalse(any('COUNT' in query['sql'] for query in queries.captured_queries))
+            seen += [user['username'] for user in response.data['results']]
+            url = response.data['next']
+
+        self.assertEqual(seen, [f'user{i}' for i in reversed(range(5))])
+        previous = self.client.get(response.data['previous'])
+        self.assertEqual([user['username'] for user in previous.data['results']], ['user2', 'user1'])
+
+    def test_forged_cursor_is_not_found(self):
+        client = APIClient()
+        client.force_authenticate(CustomUser.objects.create_user(username='student', password='Secret_123'))
+        forged = [
+            {'v': ['abc', 1], 'r': False},
+            {'v': [None, 'x'], 'r': False},
+            {'v': [{'a': 1}, [1]], 'r': True},
+            {'v': [1], 'r': False},
+            {'v': 'abc', 'r': False},
+        ]
+        orderings = {'/users/': ['-created_at', '-id'], '/quiz/': ['-started_at', '-id']}
+        for url, ordering in orderings.items():
+            for payload in forged + [{'o': ['username', 'id'], 'v': ['abc', 1], 'r': False}]:
+                # Порядок верный, чтобы до проверки значений курсор доходил
+                payload = {'o': ordering, **payload}
+                cursor = urlsafe_b64encode(json.dumps(payload).encode()).decode().rstrip('=')
+                response = client.get(f'{url}?cursor={cursor}')
+                self.assertEqual(response.status_code, 404, (url, payload))
+            self.assertEqual(client.get(f'{url}?cursor=not-base64!').status_code, 404)
+
+    def test_cursor_follows_requested_ordering(self):
+        for name in ('delta', 'alpha', 'charlie', 'bravo', 'echo'):
+            CustomUser.objects.create_user(username=name, password='Secret_123')
+
+        seen = []
+        url = '/users/?ordering=username&cursor=&page_size=2'
+        while url:
+            response = self.client.get(url)
+            seen += [user['username'] for user in response.data['results']]
+            url = response.data['next']
+
+        self.assertEqual(seen, ['alpha', 'bravo', 'charlie', 'delta', 'echo'])
+        # Курсор порядка username не годится для порядка по умолчанию
+        first_page = self.client.get('/users/?ordering=username&cursor=&page_size=2')
+        cursor = parse_qs(urlsplit(first_page.data['next']).query)['cursor'][0]
+        response = self.client.get('/users/', {'cursor': cursor})
+        self.assertEqual(response.status_code, 404)
+
+    def test_page_numbers_respect_page_size_override(self):
+        for i in range(5):
+            CustomUser.objects.create_user(username=f'user{i}', password='Secret_123')
+
+        response = self.client.get('/users/?page_size=2')
+        self.assertEqual(response.data['total_pages'], 3)
+
+
+@skipUnless(connection.vendor == 'sqlite', 'EXPLAIN QUERY PLAN есть только в SQLite')
+class QueryPlanTests(TestCase):
+    """Запросы горячих эндпоинтов должны идти по индексам: без SCAN всей таблицы и без сортировки во временном B-дереве."""
+
+    @classmethod
+    def setUpTestData(cls):
+        # Данные генератора: у ученика уже есть история викторин, в темах — десятки вопросов
+        ScaleDataSeeder('tiny').run()
+        cls.user = CustomUser.objects.get(pk=ID_BASE)
+        cls.admin = CustomUser.objects.create_superuser(username='admin', password='Secret_123')
+        cls.subject = Subject.objects.get(pk=ID_BASE)
+        cls.topic = Topic.objects.get(pk=ID_BASE)
+
+    def setUp(self):
+        catalog_cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def plan_problems(self, sql, allow_sort=False):
+        with connection.cursor() as cursor:
+            cursor.execute('EXPLAIN QUERY PLAN ' + sql)
+            details = [row[-1] for row in cursor.fetchall()]
+        problems = [
+            detail for detail in details
+            if detail.startswith('SCAN ') and ' USING ' not in detail and 'VIRTUAL TABLE' not in detail
+        ]
+        if not allow_sort:
+            problems += [detail for detail in details if 'TEMP B-TREE' in detail]
+        return problems
+
+    def assertIndexedPlans(self, request, allow_sort=False):
+        catalog_cache.clear()
+        with CaptureQueriesContext(connection) as queries:
+            response = request()
+        self.assertLess(response.status_code, 300)
+        for query in queries.captured_queries:
+            if query['sql'].startswith(('SELECT', 'UPDATE', 'DELETE')):
+                self.assertEqual(self.plan_problems(query['sql'], allow_sort), [], query['sql'])
+        return response
+
+    def test_catalog_plans(self):
+        question_id = Question.objects.values_list('id', flat=True).first()
+        requests = {
+            'subjects': lambda: self.client.get('/subjects/'),
+            'subject': lambda: self.client.get(f'/subjects/{self.subject.id}/'),
+            'topics': lambda: self.client.get('/topics/', {'subject_id': self.subject.id}),
+            'topic': lambda: self.client.get(f'/topics/{self.topic.id}/'),
+            'questions': lambda: self.client.get('/questions/', {'topic_id': self.topic.id}),
+            'questions cursor': lambda: self.client.get('/questions/', {'topic_id': self.topic.id, 'cursor': ''}),
+            'question': lambda: self.client.get(f'/questions/{question_id}/'),
+        }
+        for name, request in requests.items():
+            with self.subTest(name):
+                self.assertIndexedPlans(request)
+
+        self.client.force_authenticate(self.admin)
+        with self.subTest('admin questions'):
+            self.assertIndexedPlans(lambda: self.client.get('/questions/', {'topic_id': self.topic.id}))
+        with self.subTest('search'):
+            # Ранжирование по bm25 считается на лету, сортировка здесь неизбежна
+            self.assertIndexedPlans(lambda: self.client.get('/questions/', {'search': 'дроби'}), allow_sort=True)
+
+    def test_quiz_plans(self):
+        response = self.assertIndexedPlans(
+            lambda: self.client.post('/quiz/', {'topic': self.topic.id}, format='json')
+        )
+        quiz_id, question = response.data['quiz_id'], response.data['question']
+
+        self.assertIndexedPlans(lambda: self.client.get(f'/quiz/{quiz_id}/next/'))
+        response = self.assertIndexedPlans(lambda: self.client.post(f'/quiz/{quiz_id}/answer/', {
+            'question_id': question['id'], 'choice_id': question['choices'][0]['id'],
+        }, format='json'))
+        question = response.data['next_question']
+        self.assertIndexedPlans(lambda: self.client.post(f'/quiz/{quiz_id}/answers/batch/', [
+            {'question_id': question['id'], 'choice_id': question['choices'][1]['id']},
+        ], format='json'))
+        self.assertIndexedPlans(lambda: self.client.get(f'/quiz/{quiz_id}/'))
+
+        history_filters = [
+            {}, {'cursor': ''}, {'status': 'completed'}, {'topic_id': self.topic.id},
+            {'status': 'in_progress', 'topic_id': self.topic.id, 'date_from': '2020-01-01'},
+        ]
+        for params in history_filters:
+            with self.subTest(params=params):
+                self.assertIndexedPlans(lambda: self.client.get('/quiz/', params))
+
+
+class ScaleDataTests(TestCase):
+
+    def setUp(self):
+        # Состояние генератора — файл, а не таблица: откат транзакции теста его не вернёт
+        tmp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmp_dir)
+        override = override_settings(SCALE_DATA_STATE_FILE=os.path.join(tmp_dir, 'scale_data.json'))
+        override.enable()
+        self.addCleanup(override.disable)
+
+    def snapshot(self):
+        return {
+            model.__name__: list(model.objects.filter(pk__gte=ID_BASE).order_by('pk').values_list(*fields))
+            for model, fields in [
+                (Subject, ('id', 'name', 'topic_count')),
+                (Topic, ('id', 'subject_id', 'name', 'question_count')),
+                (Question, ('id', 'topic_id', 'text', 'created_at')),
+                (Choice, ('id', 'question_id', 'is_correct')),
+                (CustomUser, ('id', 'username')),
+                (Quiz, ('id', 'user_id', 'topic_id', 'status', 'score', 'question_ids', 'position', 'started_at')),
+                (UserAnswer, ('id', 'quiz_id', 'question_id', 'selected_choice_id', 'is_correct')),
+            ]
+        }
+
+    def test_seed_is_deterministic_and_resumable(self):
+        tiny = PRESETS['tiny']
+
+        def interrupt(stage, done, total):
+            if stage == 'questions' and done >= 24:
+                raise KeyboardInterrupt
+
+        with self.assertRaises(KeyboardInterrupt):
+            ScaleDataSeeder('tiny', seed=7, chunk_size=8, progress=interrupt).run()
+        self.assertEqual(Question.objects.filter(pk__gte=ID_BASE).count(), 24)
+        self.assertFalse(Quiz.objects.filter(pk__gte=ID_BASE).exists())
+
+        call_command('seed_scale_data', '--preset', 'tiny', '--seed', '7', '--chunk-size', '5', stdout=StringIO())
+        resumed = self.snapshot()
+        self.assertEqual(len(resumed['Question']), tiny.questions)
+        self.assertEqual(len(resumed['Choice']), tiny.questions * tiny.choices)
+        self.assertEqual(len(resumed['Quiz']), tiny.quizzes)
+
+        # Счётчики, которые генератор пишет сам, совпадают с настоящими
+        self.assertEqual(Topic.objects.get(pk=ID_BASE).question_count,
+                         Question.objects.filter(topic_id=ID_BASE).count())
+        self.assertEqual(Subject.objects.get(pk=ID_BASE).topic_count,
+                         Topic.objects.filter(subject_id=ID_BASE).count())
+        for quiz in Quiz.objects.filter(pk__gte=ID_BASE)[:10]:
+            self.assertEqual(quiz.score, quiz.answers.filter(is_correct=True).count())
+            self.assertEqual(quiz.position, quiz.answers.count())
+        self.assertTrue(Question.objects.filter(search_index__document='"дроби"*').exists())
+
+        call_command('seed_scale_data', '--flush', stdout=StringIO())
+        self.assertFalse(Question.objects.filter(pk__gte=ID_BASE).exists())
+        self.assertFalse(CustomUser.objects.filter(pk__gte=ID_BASE).exists())
+
+        ScaleDataSeeder('tiny', seed=7).run()
+        self.assertEqual(self.snapshot(), resumed)
+        call_command('seed_scale_data', '--flush', stdout=StringIO())
+        ScaleDataSeeder('tiny', seed=8).run()
+        self.assertNotEqual(self.snapshot()['UserAnswer'], resumed['UserAnswer'])
+
+    def test_flush_keeps_rows_created_after_seeding(self):
+        ScaleDataSeeder('tiny').run()
+        self.assertEqual(load_state()['zein_app_question'], PRESETS['tiny'].questions)
+        # SQLite выдаёт MAX(id) + 1: обычные строки попадают выше ID_BASE
+        subject = Subject.objects.create(name='Своя', title_ru='Своя')
+        topic = Topic.objects.create(subject=subject, name='Своя тема')
+        question = Question.objects.create(topic=topic, text='Свой вопрос')
+        user = CustomUser.objects.create_user(username='real', password='Secret_123')
+        self.assertGreater(question.pk, ID_BASE)
+        self.assertGreater(user.pk, ID_BASE)
+        # Викторина обычного ученика по теме генератора удаляется вместе с темой
+        Quiz.objects.create(user=user, topic_id=ID_BASE)
+
+        call_command('seed_scale_data', '--flush', stdout=StringIO())
+        self.assertFalse(os.path.exists(state_path()))
+        self.assertEqual(list(Question.objects.filter(pk__gte=ID_BASE)), [question])
+        self.assertEqual(list(CustomUser.objects.filter(pk__gte=ID_BASE)), [user])
+        self.assertEqual(list(Subject.objects.filter(pk__gte=ID_BASE)), [subject])
+        self.assertFalse(Quiz.objects.exists())
+
+    def test_resume_refuses_ids_taken_by_other_rows(self):
+        def interrupt(stage, done, total):
+            if stage == 'questions' and done >= 24:
+                raise KeyboardInterrupt
+
+        with self.assertRaises(KeyboardInterrupt):
+            ScaleDataSeeder('tiny', chunk_size=8, progress=interrupt).run()
+        question = Question.objects.create(topic_id=ID_BASE, text='Свой вопрос')
+        self.assertEqual(question.pk, ID_BASE + 24)
+
+        with self.assertRaises(CommandError):
+            call_command('seed_scale_data', '--preset', 'tiny', stdout=StringIO())
+        self.assertTrue(Question.objects.filter(pk=question.pk, text='Свой вопрос').exists())
+
+
+@skipUnless(connection.vendor == 'sqlite', 'Настройки соединения SQLite')
+class SQLiteConnectionTests(TestCase):
+
+    def pragma(self, name):
+        with connection.cursor() as cursor:
+            cursor.execute(f'PRAGMA {name}')
+            return cursor.fetchone()[0]
+
+    def test_connection_is_tuned(self):
+        self.assertEqual(connection.transaction_mode, 'IMMEDIATE')
+        self.assertEqual(self.pragma('synchronous'), 1)  # NORMAL
+        self.assertEqual(self.pragma('cache_size'), settings.SQLITE_CACHE_SIZE)
+        self.assertEqual(self.pragma('temp_store'), 2)  # MEMORY
+        # Тестовая база в памяти: WAL для неё не включается, но и ошибки нет
+        self.assertIn(self.pragma('journal_mode'), ('wal', 'memory'))
+        # journal_mode пишется в файл базы: его включает миграция, а не каждое соединение
+        self.assertNotIn('journal_mode', connection.settings_dict['OPTIONS']['init_command'])
+
+    def test_migration_switches_file_to_wal(self):
+        tmp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmp_dir)
+        database = connections['default'].__class__(dict(connection.settings_dict, NAME=os.path.join(tmp_dir, 'wal.sqlite3')))
+        self.addCleanup(database.close)
+        migration = importlib.import_module('zein_app.migrations.0010_sqlite_wal').Migration
+        forwards = migration.operations[0]
+
+        forwards.code(django_apps, SimpleNamespace(connection=database))
+        with database.cursor() as cursor:
+            self.assertEqual(cursor.execute('PRAGMA journal_mode').fetchone()[0], 'wal')
+        forwards.reverse_code(django_apps, SimpleNamespace(connection=database))
+        with database.cursor() as cursor:
+            self.assertEqual(cursor.execute('PRAGMA journal_mode').fetchone()[0], 'delete')
+
+
+@mock.patch('zein_app.db_router.replica_configured', return_value=True)
+class ReplicaRouterTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.subject = Subject.objects.create(name='Математика', title_ru='Математика')
+
+    def setUp(self):
+        catalog_cache.clear()
+        ReplicaPinMiddleware.cache().clear()
+        self.router = ReplicaRouter()
+        patcher = mock.patch.object(ReplicaRouter, 'in_write_transaction', return_value=False)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def record_decisions(self):
+        """Запоминает решения роутера, но сами запросы оставляет на default (реплики в тестах нет)."""
+        decisions = []
+        route = ReplicaRouter.db_for_read
+
+        def spy(router, model, **hints):
+            decisions.append((model.__name__, route(router, model, **hints)))
+            return None
+
+        patcher = mock.patch.object(ReplicaRouter, 'db_for_read', autospec=True, side_effect=spy)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        return decisions
+
+    def test_only_marked_catalog_reads_go_to_replica(self, configured):
+        self.assertIsNone(self.router.db_for_read(Subject))
+        with replica_reads():
+            self.assertEqual(self.router.db_for_read(Subject), 'replica')
+            self.assertIsNone(self.router.db_for_read(CustomUser))
+            with primary_reads():
+                self.assertIsNone(self.router.db_for_read(Subject))
+            with mock.patch.object(ReplicaRouter, 'in_write_transaction', return_value=True):
+                self.assertIsNone(self.router.db_for_read(Subject))
+        self.assertEqual(self.router.db_for_write(Subject), 'default')
+
+        configured.return_value = False
+        with replica_reads():
+            self.assertIsNone(self.router.db_for_read(Subject))
+
+    def test_views_read_from_replica_until_client_writes(self, configured):
+        decisions = self.record_decisions()
+        client = APIClient()
+        client.get('/topics/', {'search': 'дроби'})
+        self.assertIn(('Topic', 'replica'), decisions)
+
+        decisions.clear()
+        with mock.patch('zein_app.views.send_telegram_notification'):
+            client.post('/api/requests/', {'name': 'Иван', 'phone_number': '+998901234567'}, format='json')
+        client.get('/topics/', {'search': 'дроби'})
+        self.assertEqual({db for _, db in decisions}, {None})
+
+        # Закрепление за default действует REPLICA_LAG_SECONDS
+        ReplicaPinMiddleware.cache().clear()
+        decisions.clear()
+        client.get('/topics/', {'search': 'дроби'})
+        self.assertIn(('Topic', 'replica'), decisions)
+
+    async def test_pin_under_asgi(self, configured):
+        with mock.patch('zein_app.views.send_telegram_notification'):
+            response = await self.async_client.post(
+                '/api/requests/', {'name': 'Иван', 'phone_number': '+998901234567'}, content_type='application/json'
+            )
+        self.assertEqual(response.status_code, 201)
+        self.assertTrue(await ReplicaPinMiddleware.cache().aget('replica-pin:ip:127.0.0.1'))
+
+    def test_catalog_cache_is_not_filled_from_stale_replica(self, configured):
+        decisions = self.record_decisions()
+        catalog_cache.bump_version()
+        APIClient().get('/subjects/')
+        self.assertEqual({db for _, db in decisions}, {None})
+
+        catalog_cache.clear()
+        decisions.clear()
+        with mock.patch('zein_app.db_router.replica_is_fresh', return_value=True), \
+                mock.patch('zein_app.catalog_cache.replica_is_fresh', return_value=True):
+            APIClient().get('/subjects/')
+        self.assertIn(('Subject', 'replica'), decisions)
+
+
+class ExportTests(TestCase):
+
+    def test_export_streams_for_staff_only(self):
+        staff = CustomUser.objects.create_user(username='analyst', password='Secret_123', is_staff=True)
+        subject = Subject.objects.create(name='Алгебра', title_ru='Алгебра')
+        topic = Topic.objects.create(subject=subject, name='Уравнения')
+        Quiz.objects.create(user=staff, topic=topic, status='completed', score=2, total_questions=3)
+
+        client = APIClient()
+        self.assertEqual(client.get('/exports/quizzes/').status_code, 401)
+
+        client.force_authenticate(staff)
+        response = client.get(f'/exports/quizzes/?output=csv&topic_id={topic.id}')
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual(lines[0].split(',')[:3], ['quiz_id', 'user_id', 'username'])
+        self.assertIn('Алгебра', lines[1])
+
+    def test_export_command_rejects_unknown_status(self):
+        with self.assertRaisesMessage(CommandError, "invalid choice: 'done'"):
+            call_command('export_quizzes', 'quizzes', '--status', 'done', stdout=StringIO())
+
+
+class QuestionImportTests(TestCase):
+
+    def write_csv(self, rows):
+        path = os.path.join(self.tmp_dir, 'questions.csv')
+        with open(path, 'w', encoding='utf-8', newline='') as output:
+            writer = csv.writer(output)
+            writer.writerow(['subject', 'topic', 'question', 'explanation', 'choices', 'correct'])
+            writer.writerows(rows)
+        return path
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmp_dir)
+
+    def test_import_questions_command(self):
+        path = self.write_csv([
+            ['Математика', 'Дроби', '1/2 + 1/2?', '', '1|2', '1|0'],
+            ['Математика', 'Дроби', '1/3 + 1/3?', 'Сложите числители', '2/3|2/6', '1|0'],
+            ['Математика', 'Дроби', 'Без правильного', '', 'a|b', '0|0'],
+        ])
+
+        call_command('import_questions', path, '--dry-run', stdout=StringIO(), stderr=StringIO())
+        self.assertFalse(Question.objects.exists())
+
+        call_command('import_questions', path, stdout=StringIO(), stderr=StringIO())
+        topic = Topic.objects.get(name='Дроби')
+        self.assertEqual(topic.question_count, 2)
+        self.assertEqual(topic.subject.topic_count, 1)
+        self.assertEqual(Choice.objects.filter(question__topic=topic, is_correct=True).count(), 2)
+
+
+class BadPasswordFilterTests(TestCase):
+
+    def setUp(self):
+        bad_password_filter.clear()
+        throttle_cache().clear()
+        self.tmp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmp_dir)
+
+    def test_lookup_hits_database_only_for_candidates(self):
+        BadPassword.objects.create(password='Qwerty_123!')
+        bad_password_filter.prefixes()
+
+        with self.assertNumQueries(0):
+            self.assertFalse(is_bad_password('Unique_Passw0rd!'))
+        with self.assertNumQueries(1):
+            self.assertTrue(is_bad_password('QWERTY_123!'))
+
+        # Удаление версию не меняет: префикс остаётся, но запрос к базе его отсекает
+        BadPassword.objects.all().delete()
+        with self.assertNumQueries(1):
+            self.assertFalse(is_bad_password('qwerty_123!'))
+
+    def test_new_passwords_rebuild_filter(self):
+        bad_password_filter.prefixes()
+        BadPassword.objects.bulk_create([BadPassword(password='Bulk_Passw0rd!')])
+        self.assertTrue(is_bad_password('bulk_passw0rd!'))
+
+        response = APIClient().post('/api/auth/register/', {
+            'username': 'newbie', 'email': 'newbie@example.com', 'password': 'Bulk_Passw0rd!'
+        }, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('распространён', str(response.data['password']))
+
+        BadPassword.objects.create(password='Saved_Passw0rd!')
+        self.assertTrue(is_bad_password('SAVED_PASSW0RD!'))
+        self.assertEqual(bad_password_filter.stats()['size'], 2)
+
+    def test_load_bad_passwords_command(self):
+        BadPassword.objects.create(password='123456')
+        path = os.path.join(self.tmp_dir, 'passwords.txt')
+        with open(path, 'w', encoding='utf-8') as output:
+            output.write('Qwerty123\nqwerty123\n\n123456\r\nпароль\n')
+
+        call_command('load_bad_passwords', path, '--chunk-size', '2', stdout=StringIO())
+
+        self.assertEqual(BadPassword.objects.count(), 3)
+        self.assertFalse(BadPassword.objects.exclude(password='123456').filter(password__isnull=False).exists())
+        for password in ('QWERTY123', '123456', 'ПАРОЛЬ'):
+            self.assertTrue(is_bad_password(password), password)
+        self.assertFalse(is_bad_password('Secret_123!'))
+
+
+class QueryBudgetTests(TestCase):
+    """
+    Бюджет SQL-запросов для каждого маршрута zein_app/urls.py и bot_zein/urls.py.
+
+    Маршруты прогоняются дважды: на SMALL и на LARGE строк в каждой таблице.
+    Число запросов не должно превышать бюджет и не должно расти вместе с
+    данными. QUERY_BUDGET_REPORT=1 печатает число запросов и время ответа.
+    """
+    SMALL = 10
+    LARGE = 10_000
+    # Документация API, а не рабочие эндпоинты
+    EXCLUDED_ROUTES = {'schema-json', 'schema-swagger-ui', 'schema-redoc'}
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.password_hash = make_password('Secret_123')
+        cls.student = CustomUser.objects.create(username='student', password=cls.password_hash)
+        cls.admin = CustomUser.objects.create(
+            username='admin', password=cls.password_hash, is_staff=True, is_superuser=True
+        )
+        cls.subject = Subject.objects.create(name='Математика', title_ru='Математика')
+        cls.topic = Topic.objects.create(subject=cls.subject, name='Дроби')
+        cls.finished = Quiz.objects.create(user=cls.student, topic=cls.topic, status='completed')
+
+    def setUp(self):
+        self.client = APIClient()
+        self.rows = 0
+        self.report = []
+        throttle_cache().clear()
+        # Версия токенов в общем кэше: иначе первый запрос по JWT посчитал бы лишний SELECT
+        token_version(self.student.pk)
+
+    def grow(self, count):
+        """Досоздаёт строки до count в каждой таблице, которую читают эндпоинты."""
+        new = range(self.rows, count)
+        self.rows = count
+
+        Subject.objects.bulk_create([Subject(name=f'Предмет {i}', title_ru=f'Предмет {i}') for i in new])
+        Topic.objects.bulk_create([Topic(subject=self.subject, name=f'Тема {i}') for i in new])
+        questions = Question.objects.bulk_create([Question(topic=self.topic, text=f'Вопрос {i}') for i in new])
+        choices = Choice.objects.bulk_create([
+            Choice(question=question, text=text, is_correct=is_correct)
+            for question in questions
+            for text, is_correct in (('Верно', True), ('Неверно', False))
+        ])
+        UserAnswer.objects.bulk_create([
+            UserAnswer(quiz=self.finished, question_id=choice.question_id, selected_choice=choice, is_correct=True)
+            for choice in choices if choice.is_correct
+        ])
+        self.finished.question_ids += [question.id for question in questions]
+        self.finished.total_questions = self.finished.score = len(self.finished.question_ids)
+        self.finished.save()
+
+        users = CustomUser.objects.bulk_create([
+            CustomUser(username=f'user{i}', password=self.password_hash) for i in new
+        ])
+        Quiz.objects.bulk_create([
+            Quiz(user=self.student, topic=self.topic, status='completed', score=1, total_questions=2) for _ in new
+        ])
+        History.objects.bulk_create([
+            History(user=users[0], total_question=10, correct=7, failed=3, score=7.0, percent=70.0) for _ in new
+        ])
+        BadPassword.objects.bulk_create([BadPassword(password=f'password{i}') for i in new])
+        Course.objects.bulk_create([
+            Course(language='English', duration_months=6, level='B1', price=100) for _ in new
+        ])
+        Teacher.objects.bulk_create([
+            Teacher(name=f'Учитель {i}', subject='English', experience_years=5, photo='teachers/t.jpg') for i in new
+        ])
+        FAQ.objects.bulk_create([FAQ(question=f'Вопрос {i}', answer='Ответ', order=i) for i in new])
+        Contact.objects.bulk_create([Contact(type='phone', value=f'+99890{i:07d}') for i in new])
+        TelegramBot.objects.bulk_create([TelegramBot(username=f'bot{i}', token=f'token{i}') for i in new])
+
+    def routes(self, suffix):
+        """(маршрут, метод, kwargs, данные, пользователь, бюджет запросов)."""
+        question = Question.objects.filter(topic=self.topic).order_by('id').first()
+        choice = question.choices.order_by('id').first()
+        upload = SimpleUploadedFile('questions.csv', (
+            'subject,topic,question,choices,correct\n'
+            f'Импорт {suffix},Тема,Вопрос 1,a|b,1|0\n'
+            f'Импорт {suffix},Тема,Вопрос 2,a|b,0|1\n'
+        ).encode())
+
+        routes = [
+            ('api-root', 'get', {}, None, None, 0),
+            ('auth_register', 'post', {}, {
+                'username': f'new_{suffix}', 'email': f'{suffix}@example.com', 'password': 'Secret_123!'
+            }, None, 3),
+            ('auth_login', 'post', {}, {'username': 'student', 'password': 'Secret_123'}, None, 1),
+            ('auth_revoke', 'post', {}, None, self.admin, 1),
+            ('token_obtain_pair', 'post', {}, {'username': 'student', 'password': 'Secret_123'}, None, 1),
+            ('dashboard', 'get', {}, None, self.student, 0),
+            ('subject-list', 'get', {}, None, None, 1),
+            ('subject-detail', 'get', {'pk': self.subject.id}, None, None, 2),
+            ('topic-list', 'get', {}, None, None, 1),
+            ('topic-detail', 'get', {'pk': self.topic.id}, None, None, 2),
+            ('question-list', 'get', {}, {'topic_id': self.topic.id, 'cursor': ''}, None, 1),
+            ('question-detail', 'get', {'pk': question.id}, None, None, 2),
+            ('question-import-questions', 'post', {}, {'file': upload}, self.admin, 13),
+            ('submit-answer', 'post', {'pk': question.id}, {'choice_id': choice.id}, None, 2),
+            ('history-list', 'get', {}, {'cursor': ''}, None, 1),
+            ('history-detail', 'get', {'pk': History.objects.values_list('id', flat=True).first()}, None, None, 1),
+            ('customuser-list', 'get', {}, None, None, 4),
+            ('customuser-detail', 'get', {'pk': self.student.id}, None, None, 3),
+            ('badpassword-list', 'get', {}, None, None, 1),
+            ('badpassword-detail', 'get', {'pk': BadPassword.objects.values_list('id', flat=True).first()},
+             None, None, 1),
+            ('course-list', 'get', {}, None, None, 1),
+            ('course-detail', 'get', {'pk': Course.objects.values_list('id', flat=True).first()}, None, None, 1),
+            ('teacher-list', 'get', {}, None, None, 1),
+            ('teacher-detail', 'get', {'pk': Teacher.objects.values_list('id', flat=True).first()}, None, None, 1),
+            ('faq-list', 'get', {}, None, None, 1),
+            ('faq-detail', 'get', {'pk': FAQ.objects.values_list('id', flat=True).first()}, None, None, 1),
+            ('contact-list', 'get', {}, None, None, 1),
+            ('contact-detail', 'get', {'pk': Contact.objects.values_list('id', flat=True).first()}, None, None, 1),
+            ('telegrambot-list', 'get', {}, None, None, 1),
+            ('telegrambot-detail', 'get', {'pk': TelegramBot.objects.values_list('id', flat=True).first()},
+             None, None, 1),
+            ('request-create', 'post', {}, {'name': 'Иван', 'phone_number': '+998901234567'}, None, 1),
+            ('catalog-cache-stats', 'get', {}, None, self.admin, 0),
+            ('metrics', 'get', {}, None, None, 0),
+            ('export', 'get', {'kind': 'answers'}, {'output': 'csv'}, self.admin, 1),
+            ('quiz-create', 'get', {}, None, self.student, 2),
+            ('quiz-detail', 'get', {'quiz_id': self.finished.id}, None, self.student, 2),
+            ('quiz-create', 'post', {}, {'topic': self.topic.id}, self.student, 4),
+            ('async-quiz-detail', 'get', {'quiz_id': self.finished.id}, None, self.student, 2),
+            ('async-quiz-create', 'post', {}, {'topic': self.topic.id}, self.student, 4),
+        ]
+        return routes
+
+    def quiz_routes(self, quiz_id, question):
+        return [
+            ('quiz-next-question', 'get', {'quiz_id': quiz_id}, None, self.student, 2),
+            ('quiz-answer', 'post', {'quiz_id': quiz_id}, {
+                'question_id': question['id'], 'choice_id': question['choices'][0]['id'],
+            }, self.student, 6),
+        ]
+
+    def async_quiz_routes(self, quiz_id, question):
+        return [
+            ('async-quiz-next-question', 'get', {'quiz_id': quiz_id}, None, self.student, 2),
+            ('async-quiz-answer', 'post', {'quiz_id': quiz_id}, {
+                'question_id': question['id'], 'choice_id': question['choices'][0]['id'],
+            }, self.student, 6),
+        ]
+
+    def call(self, name, method, kwargs, data, user, budget):
+        self.client.force_authenticate(user)
+        # async-view не проходят через DRF, force_authenticate на них не действует
+        if name.startswith('async-') and user:
+            self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {access_token_for(user)}')
+        else:
+            self.client.credentials()
+        catalog_cache.clear()
+        send = getattr(self.client, method)
+        with CaptureQueriesContext(connection) as queries:
+            started = time.perf_counter()
+            if method == 'get':
+                response = send(reverse(name, kwargs=kwargs), data)
+            elif name == 'question-import-questions':
+                response = send(reverse(name, kwargs=kwargs), data, format='multipart')
+            else:
+                response = send(reverse(name, kwargs=kwargs), data, format='json')
+            if response.streaming:
+                b''.join(response.streaming_content)
+            elapsed = time.perf_counter() - started
+
+        label = f'{method.upper()} {name}'
+        self.assertLess(response.status_code, 300, f'{label}: {getattr(response, "data", None)}')
+        self.assertLessEqual(
+            len(queries), budget,
+            f'{label}: {len(queries)} запросов при бюджете {budget}\n'
+            + '\n'.join(query['sql'] for query in queries.captured_queries)
+        )
+        self.report.append((self.rows, label, len(queries), budget, elapsed))
+        return label, len(queries), response
+
+    def run_routes(self, suffix):
+        counts = {}
+        for route in self.routes(suffix):
+            label, count, response = self.call(*route)
+            counts[label] = count
+            if route[:2] == ('quiz-create', 'post'):
+                quiz_id, question = response.data['quiz_id'], response.data['question']
+            if route[:2] == ('async-quiz-create', 'post'):
+                async_quiz_id, async_question = response.json()['quiz_id'], response.json()['question']
+
+        for route in self.async_quiz_routes(async_quiz_id, async_question):
+            label, count, response = self.call(*route)
+            counts[label] = count
+
+        for route in self.quiz_routes(quiz_id, question):
+            label, count, response = self.call(*route)
+            counts[label] = count
+
+        next_question = response.data['next_question']
+        label, counts['POST quiz-answer-batch'], _ = self.call('quiz-answer-batch', 'post', {'quiz_id': quiz_id}, [
+            {'question_id': next_question['id'], 'choice_id': next_question['choices'][0]['id']},
+        ], self.student, 8)
+        return counts
+
+    def route_names(self, patterns):
+        for pattern in patterns:
+            if isinstance(pattern, URLResolver):
+                if pattern.app_name != 'admin':
+                    yield from self.route_names(pattern.url_patterns)
+            elif pattern.name:
+                yield pattern.name
+
+    @mock.patch('zein_app.views.send_telegram_notification')
+    def test_query_counts_do_not_grow_with_data(self, send_notification):
+        self.grow(self.SMALL)
+        small = self.run_routes('small')
+        self.grow(self.LARGE)
+        large = self.run_routes('large')
+
+        covered = {label.split(' ', 1)[1] for label in small}
+        uncovered = set(self.route_names(get_resolver().url_patterns)) - covered - self.EXCLUDED_ROUTES
+        self.assertEqual(uncovered, set(), 'Маршруты без бюджета запросов')
+        self.assertEqual(small, large)
+
+        if os.environ.get('QUERY_BUDGET_REPORT'):
+            for rows, label, count, budget, elapsed in self.report:
+                print(f'{rows:>6} {label:<40} {count:>3}/{budget:<3} {elapsed * 1000:8.1f} ms')
+
+
+class ProfilingTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.staff = CustomUser.objects.create_user(username='staff', password='Secret_123', is_staff=True)
+        cls.student = CustomUser.objects.create_user(username='student', password='Secret_123')
+        subject = Subject.objects.create(name='Математика', title_ru='Математика')
+        cls.topic = Topic.objects.create(subject=subject, name='Дроби')
+        question = Question.objects.create(topic=cls.topic, text='1/2 + 1/2?')
+        Choice.objects.create(question=question, text='1', is_correct=True)
+
+    def setUp(self):
+        catalog_cache.clear()
+        self.tmp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmp_dir)
+        override = override_settings(PROFILING_DIR=self.tmp_dir)
+        override.enable()
+        self.addCleanup(override.disable)
+
+    def get_questions(self, user=None, **headers):
+        client = APIClient()
+        if user:
+            client.credentials(HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(user)}')
+        return client.get('/questions/', {'topic_id': self.topic.id}, **headers)
+
+    def test_staff_header_profiles_request(self):
+        response = self.get_questions(self.staff, HTTP_X_PROFILE='1')
+        self.assertEqual(response.status_code, 200)
+        timing = response['Server-Timing']
+        self.assertRegex(timing, r'sql;dur=[\d.]+;desc="\d+ queries"')
+        self.assertIn('serialize;dur=', timing)
+        self.assertIn('total;dur=', timing)
+
+        profile_id = re.search(r'profile;desc="([^"]+)"', timing).group(1)
+        self.assertEqual(sorted(os.listdir(self.tmp_dir)), [profile_id + '.prof', profile_id + '.txt'])
+        with open(os.path.join(self.tmp_dir, profile_id + '.txt'), encoding='utf-8') as report:
+            self.assertIn('slowest queries:', report.read())
+
+    def test_staff_session_header_profiles_request(self):
+        self.client.force_login(self.staff)
+        response = self.client.get('/subjects/', HTTP_X_PROFILE='1')
+        self.assertIn('total;dur=', response['Server-Timing'])
+
+    def test_header_is_ignored_for_students_and_anonymous(self):
+        for user in (self.student, None):
+            response = self.get_questions(user, HTTP_X_PROFILE='1')
+            self.assertNotIn('Server-Timing', response)
+        self.assertEqual(os.listdir(self.tmp_dir), [])
+
+    @override_settings(PROFILING_SAMPLE_RATE=1.0)
+    def test_sampled_requests_are_profiled(self):
+        self.assertIn('sql;dur=', self.get_questions()['Server-Timing'])
+
+    @override_settings(PROFILING_SAMPLE_RATE=0.0, PROFILING_HEADER=None)
+    def test_disabled_middleware_is_not_loaded(self):
+        self.assertNotIn('Server-Timing', self.get_questions(self.staff, HTTP_X_PROFILE='1'))
+
+
+class MetricsTests(TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmp_dir)
+        override = override_settings(METRICS_DIR=self.tmp_dir)
+        override.enable()
+        self.addCleanup(override.disable)
+        metrics.store.reset()
+        self.addCleanup(metrics.store.reset)
+
+    def scrape(self):
+        response = APIClient().get('/metrics')
+        self.assertEqual(response.status_code, 200)
+        return response.content.decode()
+
+    def test_requests_are_exported_by_route_name(self):
+        subject = Subject.objects.create(name='Математика', title_ru='Математика')
+        client = APIClient()
+        client.get('/subjects/')
+        client.get(f'/subjects/{subject.id}/')
+        client.get('/subjects/')
+
+        text = self.scrape()
+        self.assertIn('http_requests_total{method="GET",route="subject-list",status="200"} 2', text)
+        self.assertIn('http_request_duration_seconds_count{method="GET",route="subject-detail"} 1', text)
+        self.assertIn('http_request_duration_seconds_bucket{method="GET",route="subject-list",le="+Inf"} 2', text)
+        self.assertRegex(text, r'http_request_sql_queries_bucket\{method="GET",route="subject-detail",le="2\.0"\} 1')
+        self.assertIn('http_response_size_bytes_count{method="GET",route="subject-list"} 2', text)
+        self.assertIn('# TYPE catalog_cache_hit_ratio gauge', text)
+        self.assertNotIn('route="metrics"', text)
+
+    def test_values_of_all_processes_are_summed(self):
+        other = metrics.MetricsStore()
+        other.inc('http_requests_total', {'route': 'quiz-answer', 'method': 'POST', 'status': '200'}, 5)
+        other.observe('bot_handler_duration_seconds', {'handler': 'start_command'}, 0.2)
+        other.flush()
+        metrics.store.inc('http_requests_total', {'route': 'quiz-answer', 'method': 'POST', 'status': '200'}, 2)
+
+        text = self.scrape()
+        self.assertIn('http_requests_total{method="POST",route="quiz-answer",status="200"} 7', text)
+        self.assertIn('bot_handler_duration_seconds_bucket{handler="start_command",le="0.25"} 1', text)
+        self.assertIn('bot_handler_duration_seconds_bucket{handler="start_command",le="0.1"} 0', text)
+
+    def test_files_of_finished_processes_are_removed(self):
+        finished = subprocess.Popen(['true'])
+        finished.wait()
+        path = os.path.join(self.tmp_dir, f'metrics-{finished.pid}-deadbeef.json')
+        with open(path, 'w', encoding='utf-8') as output:
+            json.dump([{'name': 'http_requests_total', 'labels': {'route': 'gone'}, 'value': 3}], output)
+
+        self.assertNotIn('route="gone"', self.scrape())
+        self.assertFalse(os.path.exists(path))
+
+    def test_bot_handler_errors_are_counted(self):
+        @metrics.observe_handler
+        async def broken_handler(update, context):
+            raise RuntimeError
+
+        with self.assertRaises(RuntimeError):
+            asyncio.run(broken_handler(None, None))
+        text = self.scrape()
+        self.assertIn('bot_handler_errors_total{handler="broken_handler"} 1', text)
+        self.assertIn('bot_handler_duration_seconds_count{handler="broken_handler"} 1', text)
+
+    def test_metrics_are_not_public(self):
+        self.assertEqual(APIClient(REMOTE_ADDR='10.0.0.1').get('/metrics').status_code, 403)
+
+
+class TestRunnerMetricsDirTests(TestCase):
+
+    def test_run_writes_metrics_to_temporary_dir(self):
+        # zein_app.test_runner.TestRunner подменяет METRICS_DIR на время прогона
+        self.assertNotEqual(str(settings.METRICS_DIR), str(settings.BASE_DIR / 'metrics'))
+        self.assertTrue(str(settings.METRICS_DIR).startswith(tempfile.gettempdir()))
+
+    def test_run_keeps_file_cache_in_temporary_dir(self):
+        location = settings.CACHES[settings.CATALOG_CACHE_ALIAS]['LOCATION']
+        self.assertEqual(os.path.dirname(location), os.path.dirname(settings.METRICS_DIR))
+        self.assertEqual(caches[settings.CATALOG_CACHE_ALIAS]._dir, os.path.abspath(location))
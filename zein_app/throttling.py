@@ -0,0 +1,198 @@
+"""
+Ограничение попыток входа и регистрации до хэширования пароля.
+
+Каждая попытка LoginView, /api/token/ и RegisterView стоит полного PBKDF2,
+поэтому перебор паролей занимает процессор всех воркеров. Троттлы DRF
+проверяются до view:
+
+* TokenBucket*Throttle — token bucket по IP и по имени пользователя.
+  Лимиты задаются по endpoint в REST_FRAMEWORK['DEFAULT_THROTTLE_RATES']
+  ключами <throttle_scope>_ip и <throttle_scope>_username; '5/min' —
+  корзина на 5 попыток, которая пополняется на 5 за минуту.
+* FailedLoginThrottle — после AUTH_FAILED_LOGIN_LIMIT неудачных входов
+  подряд имя пользователя отклоняется без authenticate(), пока не пройдёт
+  AUTH_FAILED_LOGIN_TIMEOUT секунд. Успешный вход сбрасывает счётчик.
+
+Состояние хранится в общем кэше (settings.CATALOG_CACHE_ALIAS), поэтому
+лимиты общие для всех воркеров. Чтение и запись состояния идут под
+throttle_lock: у FileBasedCache нет атомарных операций (add и incr там тоже
+get + set), и без блокировки одновременные попытки расходовали бы один и
+тот же жетон. Отклонённые попытки считает метрика auth_throttled_total{scope=...}.
+"""
+import hashlib
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows: блокировка только между потоками процесса
+    fcntl = None
+
+from django.conf import settings
+from django.core.cache import caches
+from rest_framework.settings import api_settings
+from rest_framework.throttling import BaseThrottle, SimpleRateThrottle
+
+from . import metrics
+
+FAILED_LOGIN_KEY = 'throttle:failed-login:%s'
+LOCK_FILE = 'throttle.lock'
+
+_thread_lock = threading.Lock()
+
+
+def throttle_cache():
+    return caches[getattr(settings, 'CATALOG_CACHE_ALIAS', 'default')]
+
+
+@contextmanager
+def throttle_lock(cache):
+    """
+    Одна блокировка на все ключи троттлинга: между потоками — threading.Lock,
+    между процессами — flock на файле в каталоге FileBasedCache. Под ней
+    только чтение и запись маленькой записи кэша, поэтому ждать почти не приходится.
+    """
+    with _thread_lock:
+        directory = getattr(cache, '_dir', None)
+        if directory is None or fcntl is None:
+            yield
+            return
+        os.makedirs(directory, exist_ok=True)
+        # Не *.djcache: clear() и вытеснение FileBasedCache этот файл не трогают
+        with open(os.path.join(directory, LOCK_FILE), 'a') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def username_ident(request):
+    username = request.data.get('username') if hasattr(request.data, 'get') else None
+    if not isinstance(username, str) or not username:
+        return None
+    # Имя из запроса может быть любой длины и с любыми символами
+    return hashlib.md5(username.lower().encode(), usedforsecurity=False).hexdigest()
+
+
+class TokenBucketThrottle(SimpleRateThrottle):
+    """
+    Token bucket вместо скользящего окна SimpleRateThrottle: в кэше только
+    (число жетонов, время), без списка отметок всех запросов.
+    """
+    cache_format = 'throttle:%(scope)s:%(ident)s'
+    scope_suffix = None
+
+    def __init__(self):
+        # Scope берётся из view.throttle_scope, как у ScopedRateThrottle
+        self.wait_seconds = None
+
+    @property
+    def cache(self):
+        return throttle_cache()
+
+    def allow_request(self, request, view):
+        scope = getattr(view, 'throttle_scope', None)
+        if scope is None:
+            return True
+        self.scope = f'{scope}_{self.scope_suffix}'
+        self.rate = api_settings.DEFAULT_THROTTLE_RATES.get(self.scope)
+        if self.rate is None:
+            return True
+        self.num_requests, self.duration = self.parse_rate(self.rate)
+
+        self.key = self.get_cache_key(request, view)
+        if self.key is None:
+            return True
+
+        cache = self.cache
+        with throttle_lock(cache):
+            self.now = self.timer()
+            tokens, updated = cache.get(self.key, (self.num_requests, self.now))
+            tokens = min(self.num_requests, tokens + (self.now - updated) * self.num_requests / self.duration)
+            if tokens >= 1:
+                cache.set(self.key, (tokens - 1, self.now), timeout=self.duration)
+                return True
+        self.wait_seconds = (1 - tokens) * self.duration / self.num_requests
+        return self.throttle_failure()
+
+    def throttle_failure(self):
+        metrics.store.inc('auth_throttled_total', {'scope': self.scope})
+        return False
+
+    def wait(self):
+        return self.wait_seconds
+
+
+class TokenBucketIPThrottle(TokenBucketThrottle):
+    scope_suffix = 'ip'
+
+    def get_cache_key(self, request, view):
+        return self.cache_format % {'scope': self.scope, 'ident': self.get_ident(request)}
+
+
+class TokenBucketUsernameThrottle(TokenBucketThrottle):
+    scope_suffix = 'username'
+
+    def get_cache_key(self, request, view):
+        ident = username_ident(request)
+        if ident is None:
+            return None
+        return self.cache_format % {'scope': self.scope, 'ident': ident}
+
+
+def failed_login_limit():
+    return getattr(settings, 'AUTH_FAILED_LOGIN_LIMIT', 10)
+
+
+def failed_login_timeout():
+    return getattr(settings, 'AUTH_FAILED_LOGIN_TIMEOUT', 15 * 60)
+
+
+def failed_logins(ident):
+    """(число неудачных входов, время сброса счётчика) для имени пользователя."""
+    return throttle_cache().get(FAILED_LOGIN_KEY % ident, (0, None))
+
+
+def login_failed(request):
+    ident = username_ident(request)
+    if ident is None:
+        return
+    cache = throttle_cache()
+    with throttle_lock(cache):
+        now = time.time()
+        count, expires = failed_logins(ident)
+        # Срок считается от первой неудачи: следующие попытки его не продлевают
+        if expires is None:
+            expires = now + failed_login_timeout()
+        cache.set(FAILED_LOGIN_KEY % ident, (count + 1, expires), timeout=max(1, int(expires - now)))
+
+
+def login_succeeded(request):
+    ident = username_ident(request)
+    if ident is not None:
+        throttle_cache().delete(FAILED_LOGIN_KEY % ident)
+
+
+class FailedLoginThrottle(BaseThrottle):
+    """Отклоняет вход по имени, для которого подряд было слишком много неудачных попыток."""
+    scope = 'failed_login'
+
+    def __init__(self):
+        self.wait_seconds = None
+
+    def allow_request(self, request, view):
+        ident = username_ident(request)
+        if ident is None:
+            return True
+        count, expires = failed_logins(ident)
+        if count < failed_login_limit():
+            return True
+        self.wait_seconds = max(0, expires - time.time())
+        metrics.store.inc('auth_throttled_total', {'scope': self.scope})
+        return False
+
+    def wait(self):
+        return self.wait_seconds
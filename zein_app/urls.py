@@ -12,7 +12,8 @@ from .views import RequestCreateAPIView
 from .views import submit_answer
 
 
-from .views import SubjectViewSet, TopicViewSet, QuestionViewSet, QuizAPIView
+from .views import SubjectViewSet, TopicViewSet, QuestionViewSet, QuizAPIView, CatalogCacheStatsView, ExportAPIView
+from . import async_views
 
 router = DefaultRouter()
 router.register(r'subjects', SubjectViewSet)
@@ -37,11 +38,19 @@ router.register(r'bots', TelegramBotViewSet)
 urlpatterns = [
     path('', include(router.urls)),
 
-    path('quiz/', QuizAPIView.as_view(), name='quiz-create'),
-    path('quiz/<int:quiz_id>/', QuizAPIView.as_view(), name='quiz-detail'),
-    path('quiz/<int:quiz_id>/next/', QuizAPIView.next_question, name='quiz-next-question'),
-    path('quiz/<int:quiz_id>/answer/', QuizAPIView.answer, name='quiz-answer'),
+    path('quiz/', QuizAPIView.as_view({'get': 'get', 'post': 'post'}), name='quiz-create'),
+    path('quiz/<int:quiz_id>/', QuizAPIView.as_view({'get': 'get'}), name='quiz-detail'),
+    path('quiz/<int:quiz_id>/next/', QuizAPIView.as_view({'get': 'next_question'}), name='quiz-next-question'),
+    path('quiz/<int:quiz_id>/answer/', QuizAPIView.as_view({'post': 'answer'}), name='quiz-answer'),
+    path('quiz/<int:quiz_id>/answers/batch/', QuizAPIView.as_view({'post': 'answer_batch'}), name='quiz-answer-batch'),
+    # Те же шаги викторины на async-view для ASGI
+    path('async/quiz/', async_views.quiz_start, name='async-quiz-create'),
+    path('async/quiz/<int:quiz_id>/', async_views.quiz_result, name='async-quiz-detail'),
+    path('async/quiz/<int:quiz_id>/next/', async_views.quiz_next_question, name='async-quiz-next-question'),
+    path('async/quiz/<int:quiz_id>/answer/', async_views.quiz_answer, name='async-quiz-answer'),
     path('questions/<int:pk>/submit/', submit_answer, name='submit-answer'),
+    path('catalog/cache-stats/', CatalogCacheStatsView.as_view(), name='catalog-cache-stats'),
+    path('exports/<str:kind>/', ExportAPIView.as_view(), name='export'),
     path('api/requests/', RequestCreateAPIView.as_view(), name='request-create'),
 ] + static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
 
@@ -1,6 +1,7 @@
 from django.shortcuts import render
 from rest_framework import viewsets
-from .pagination import CustomPagination
+from .pagination import CustomPagination, CustomKeysetPagination, KeysetPagination
+from .db_router import ReplicaReadsMixin, replica_reads
 from rest_framework import filters
 
 
@@ -11,7 +12,12 @@ from rest_framework import generics
 from rest_framework.response import Response
 from rest_framework.permissions import AllowAny
 # from rest_framework_simplejwt.tokens import RefreshToken
-from rest_framework_simplejwt.tokens import AccessToken
+from .authentication import access_token_for, revoke_tokens
+from .throttling import (
+    FailedLoginThrottle, TokenBucketIPThrottle, TokenBucketUsernameThrottle, login_failed, login_succeeded
+)
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.views import TokenObtainPairView as BaseTokenObtainPairView
 
 
 from django.contrib.auth import get_user_model
@@ -30,10 +36,15 @@ class RegisterView(generics.CreateAPIView):
     queryset = User.objects.all()
     # permission_classes = (AllowAny,)
     serializer_class = RegisterSerializer
+    throttle_scope = 'register'
+    throttle_classes = (TokenBucketIPThrottle, TokenBucketUsernameThrottle)
 
 
 class LoginView(generics.GenericAPIView):
     serializer_class = LoginSerializer
+    # Лимиты проверяются до authenticate(), см. zein_app.throttling
+    throttle_scope = 'login'
+    throttle_classes = (TokenBucketIPThrottle, TokenBucketUsernameThrottle, FailedLoginThrottle)
 
     def post(self, request, *args, **kwargs):
         username = request.data.get('username')
@@ -41,7 +52,8 @@ class LoginView(generics.GenericAPIView):
         user = authenticate(username=username, password=password)
 
         if user is not None:
-            access_token = AccessToken.for_user(user)
+            login_succeeded(request)
+            access_token = access_token_for(user)
             return Response({
                 'access': str(access_token),
                 'user': UserSerializer(user).data
@@ -54,9 +66,34 @@ class LoginView(generics.GenericAPIView):
             #     'user': user_serializer.data
             # })
         else:
+            login_failed(request)
             return Response({'detail': "Invalid credentials"}, status=401)
 
 
+class TokenObtainPairView(BaseTokenObtainPairView):
+    """/api/token/ с теми же лимитами, что и LoginView: пароль проверяется так же дорого."""
+    throttle_scope = 'login'
+    throttle_classes = (TokenBucketIPThrottle, TokenBucketUsernameThrottle, FailedLoginThrottle)
+
+    def post(self, request, *args, **kwargs):
+        try:
+            response = super().post(request, *args, **kwargs)
+        except AuthenticationFailed:
+            login_failed(request)
+            raise
+        login_succeeded(request)
+        return response
+
+
+class RevokeTokensView(APIView):
+    """Выход на всех устройствах: ранее выданные access-токены пользователя перестают действовать."""
+    permission_classes = (IsAuthenticated,)
+
+    def post(self, request):
+        revoke_tokens(request.user.pk)
+        return Response(status=204)
+
+
 class DashboardView(APIView):
     permission_classes = (IsAuthenticated,)
 
@@ -98,9 +135,9 @@ from .serializers import (
 
 
 class CustomUserViewSet(viewsets.ModelViewSet):
-    queryset = CustomUser.objects.all()
+    queryset = CustomUser.objects.prefetch_related('groups', 'user_permissions')
     serializer_class = CustomUserSerializer
-    pagination_class = CustomPagination
+    pagination_class = CustomKeysetPagination
     filter_backends = [filters.OrderingFilter]
     ordering_fields = ['username', 'created_at']
     ordering = ['username']
@@ -123,9 +160,11 @@ class BadPasswordViewSet(viewsets.ModelViewSet):
 
 
 
-class HistoryViewSet(viewsets.ModelViewSet):
+class HistoryViewSet(ReplicaReadsMixin, viewsets.ModelViewSet):
     queryset = History.objects.all()
     serializer_class = HistorySerializer
+    pagination_class = KeysetPagination
+    keyset_ordering = ('-id',)
 
 
 
@@ -181,10 +220,16 @@ def submit_answer(request, pk):
 
 
 
+from datetime import timedelta
+
+from django.db import IntegrityError, transaction
+from django.db.models import Prefetch
+from django.http import Http404, StreamingHttpResponse
 from django.shortcuts import get_object_or_404
 from django.utils import timezone
 from rest_framework import viewsets, status, permissions
 from rest_framework.decorators import action
+from rest_framework.parsers import MultiPartParser
 from rest_framework.response import Response
 
 
@@ -193,12 +238,21 @@ from .serializers import (
     SubjectListSerializer, SubjectDetailSerializer,
     TopicListSerializer, TopicDetailSerializer,
     QuestionListSerializer, QuestionDetailSerializer, AdminQuestionSerializer,
-    QuizCreateSerializer, QuizAnswerSerializer, QuizResultSerializer, QuizDetailSerializer
+    QuizCreateSerializer, QuizAnswerSerializer, QuizResultSerializer, QuizDetailSerializer,
+    QuizHistoryFilterSerializer
 )
 from .permissions import IsAdminOrReadOnly
+from .catalog_cache import CatalogCacheMixin, catalog_cache
+from .importers import ImportFormatError, QuestionImporter, detect_format, read_rows
+from .exports import CONTENT_TYPES, EXPORT_FORMATS, EXPORTS, stream_export
+from .fast_serializers import question_choice_rows, question_payload, quiz_result_payload
+from .quiz_flow import (
+    ALREADY_ANSWERED, answer_choices, answer_error, answer_updates, apply_answer, drop_current_question, pick_choice
+)
+from .search import search_questions, search_topics
 
 
-class SubjectViewSet(viewsets.ModelViewSet):
+class SubjectViewSet(ReplicaReadsMixin, CatalogCacheMixin, viewsets.ModelViewSet):
     queryset = Subject.objects.all()
     permission_classes = [AllowAny]
     # permission_classes = [IsAdminOrReadOnly]
@@ -209,10 +263,11 @@ class SubjectViewSet(viewsets.ModelViewSet):
         return SubjectDetailSerializer
 
 
-class TopicViewSet(viewsets.ModelViewSet):
+class TopicViewSet(ReplicaReadsMixin, CatalogCacheMixin, viewsets.ModelViewSet):
     queryset = Topic.objects.all()
     # permission_classes = [IsAdminOrReadOnly]
     permission_classes = [AllowAny]
+    uncached_query_params = ('search',)
 
     def get_serializer_class(self):
         if self.action == 'list':
@@ -221,16 +276,32 @@ class TopicViewSet(viewsets.ModelViewSet):
 
     def get_queryset(self):
         queryset = Topic.objects.all()
+        if self.action == 'retrieve':
+            queryset = queryset.prefetch_related(
+                Prefetch('questions', queryset=Question.objects.order_by('created_at', 'id'))
+            )
         subject_id = self.request.query_params.get('subject_id', None)
         if subject_id is not None:
             queryset = queryset.filter(subject_id=subject_id)
+        search = self.request.query_params.get('search', None)
+        if search is not None:
+            queryset = search_topics(queryset, search).order_by('search_rank', 'id')
         return queryset
 
 
-class QuestionViewSet(viewsets.ModelViewSet):
+class QuestionViewSet(ReplicaReadsMixin, CatalogCacheMixin, viewsets.ModelViewSet):
     queryset = Question.objects.all()
     # permission_classes = [IsAdminOrReadOnly]
     permission_classes = [AllowAny]
+    pagination_class = KeysetPagination
+    uncached_query_params = ('search',)
+
+    @property
+    def keyset_ordering(self):
+        # При поиске курсор идёт по рангу совпадения
+        if 'search' in self.request.query_params:
+            return ('search_rank', 'id')
+        return KeysetPagination.ordering
 
     def get_serializer_class(self):
         if self.request.user.is_staff:
@@ -240,25 +311,90 @@ class QuestionViewSet(viewsets.ModelViewSet):
         return QuestionDetailSerializer
 
     def get_queryset(self):
-        queryset = Question.objects.all()
+        queryset = Question.objects.order_by('created_at', 'id')
+        if self.get_serializer_class() is not QuestionListSerializer:
+            queryset = queryset.prefetch_related(
+                Prefetch('choices', queryset=Choice.objects.order_by('question_id', 'id'))
+            )
         topic_id = self.request.query_params.get('topic_id', None)
         if topic_id is not None:
             queryset = queryset.filter(topic_id=topic_id)
+        search = self.request.query_params.get('search', None)
+        if search is not None:
+            queryset = search_questions(queryset, search).order_by('search_rank', 'id')
         return queryset
 
+    @action(detail=False, methods=['post'], url_path='import',
+            permission_classes=[permissions.IsAdminUser], parser_classes=[MultiPartParser])
+    def import_questions(self, request):
+        upload = request.FILES.get('file')
+        if upload is None:
+            return Response({"error": "Передайте файл в поле file"}, status=status.HTTP_400_BAD_REQUEST)
+
+        dry_run = request.data.get('dry_run', '').lower() in ('1', 'true', 'yes')
+        importer = QuestionImporter(dry_run=dry_run)
+        try:
+            file_format = request.data.get('file_format') or detect_format(upload.name)
+            report = importer.run(read_rows(upload, file_format))
+        except (ImportFormatError, ValueError) as error:
+            return Response({"error": str(error)}, status=status.HTTP_400_BAD_REQUEST)
+
+        return Response(report, status=status.HTTP_200_OK if dry_run else status.HTTP_201_CREATED)
+
+
+class CatalogCacheStatsView(APIView):
+    permission_classes = [permissions.IsAdminUser]
+
+    def get(self, request):
+        return Response(catalog_cache.stats())
 
-class QuizAPIView(APIView):
+
+class ExportAPIView(APIView):
+    permission_classes = [permissions.IsAdminUser]
+
+    def get(self, request, kind):
+        if kind not in EXPORTS:
+            return Response({"error": "Неизвестный тип выгрузки"}, status=status.HTTP_404_NOT_FOUND)
+
+        export_format = request.query_params.get('output', 'ndjson')
+        if export_format not in EXPORT_FORMATS:
+            return Response(
+                {"error": f"Формат выгрузки должен быть одним из: {', '.join(EXPORT_FORMATS)}"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        filters_serializer = QuizHistoryFilterSerializer(data=request.query_params)
+        filters_serializer.is_valid(raise_exception=True)
+
+        response = StreamingHttpResponse(
+            stream_export(kind, export_format, **filters_serializer.validated_data),
+            content_type=CONTENT_TYPES[export_format]
+        )
+        response['Content-Disposition'] = f'attachment; filename="{kind}.{export_format}"'
+        return response
+
+
+class QuizAPIView(viewsets.ViewSet):
     # permission_classes = [permissions.IsAuthenticated]
     permission_classes = [AllowAny]
+    keyset_ordering = ('-started_at', '-id')
+
+    def _get_current_question(self, quiz):
+        while quiz.current_question_id is not None:
+            rows = list(question_choice_rows(question_id=quiz.current_question_id))
+            if rows:
+                return question_payload(rows)
+            quiz.save(update_fields=drop_current_question(quiz))
+        return None
 
     def post(self, request):
         serializer = QuizCreateSerializer(data=request.data)
         if serializer.is_valid():
             topic_id = serializer.validated_data['topic'].id
 
-            questions = Question.objects.filter(topic_id=topic_id)
+            question_ids = list(Quiz.questions_for_topic(topic_id))
 
-            if not questions.exists():
+            if not question_ids:
                 return Response(
                     {"error": "В данной теме нет вопросов"},
                     status=status.HTTP_400_BAD_REQUEST
@@ -267,22 +403,20 @@ class QuizAPIView(APIView):
             quiz = Quiz.objects.create(
                 user=request.user,
                 topic_id=topic_id,
-                total_questions=questions.count()
+                total_questions=len(question_ids),
+                question_ids=question_ids
             )
 
-            first_question = questions.first()
-            question_serializer = QuestionDetailSerializer(first_question)
-
             return Response({
                 "quiz_id": quiz.id,
-                "question": question_serializer.data
+                "question": self._get_current_question(quiz)
             }, status=status.HTTP_201_CREATED)
 
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
     @action(detail=True, methods=['get'])
     def next_question(self, request, quiz_id):
-        quiz = get_object_or_404(Quiz, id=quiz_id, user=request.user)
+        quiz = get_object_or_404(Quiz.objects.select_related('topic__subject'), id=quiz_id, user=request.user)
 
         if quiz.status == 'completed':
             return Response(
@@ -290,32 +424,26 @@ class QuizAPIView(APIView):
                 status=status.HTTP_400_BAD_REQUEST
             )
 
-        all_questions = Question.objects.filter(topic=quiz.topic)
-
-        answered_question_ids = UserAnswer.objects.filter(quiz=quiz).values_list('question_id', flat=True)
-
-        next_question = all_questions.exclude(id__in=answered_question_ids).first()
+        next_question = self._get_current_question(quiz)
 
         if next_question:
-            question_serializer = QuestionDetailSerializer(next_question)
             return Response({
                 "quiz_id": quiz.id,
-                "question": question_serializer.data
+                "question": next_question
             })
         else:
             quiz.status = 'completed'
             quiz.completed_at = timezone.now()
             quiz.save()
 
-            result_serializer = QuizResultSerializer(quiz)
             return Response({
                 "message": "Викторина завершена",
-                "results": result_serializer.data
+                "results": quiz_result_payload(quiz)
             })
 
     @action(detail=True, methods=['post'])
     def answer(self, request, quiz_id):
-        quiz = get_object_or_404(Quiz, id=quiz_id, user=request.user)
+        quiz = get_object_or_404(Quiz.objects.select_related('topic__subject'), id=quiz_id, user=request.user)
 
         if quiz.status == 'completed':
             return Response(
@@ -328,65 +456,185 @@ class QuizAPIView(APIView):
             question_id = serializer.validated_data['question_id']
             choice_id = serializer.validated_data['choice_id']
 
-            question = get_object_or_404(Question, id=question_id, topic=quiz.topic)
+            error = answer_error(quiz, question_id)
+            if error:
+                return Response({"error": error}, status=status.HTTP_400_BAD_REQUEST)
+
+            # Выбранный вариант и варианты следующего вопроса читаем одним запросом
+            choices, is_last = answer_choices(quiz, question_id, choice_id)
+            choice, next_rows = pick_choice(choices, question_id, choice_id)
+            if choice is None:
+                raise Http404
 
-            choice = get_object_or_404(Choice, id=choice_id, question=question)
+            is_correct = choice['is_correct']
+            updates = answer_updates(is_correct, is_last)
 
-            if UserAnswer.objects.filter(quiz=quiz, question=question).exists():
+            try:
+                with transaction.atomic():
+                    UserAnswer.objects.create(
+                        quiz=quiz,
+                        question_id=question_id,
+                        selected_choice_id=choice_id,
+                        is_correct=is_correct
+                    )
+                    Quiz.objects.filter(id=quiz.id).update(**updates)
+            except IntegrityError:
                 return Response(
-                    {"error": "Вы уже ответили на этот вопрос"},
+                    {"error": ALREADY_ANSWERED},
                     status=status.HTTP_400_BAD_REQUEST
                 )
 
-            is_correct = choice.is_correct
-            UserAnswer.objects.create(
-                quiz=quiz,
-                question=question,
-                selected_choice=choice,
-                is_correct=is_correct
-            )
-
-            if is_correct:
-                quiz.score += 1
-                quiz.save()
+            apply_answer(quiz, updates)
 
-            all_questions = Question.objects.filter(topic=quiz.topic)
+            if is_last:
+                return Response({
+                    "message": "Викторина завершена",
+                    "is_correct": is_correct,
+                    "results": quiz_result_payload(quiz)
+                })
 
-            answered_question_ids = UserAnswer.objects.filter(quiz=quiz).values_list('question_id', flat=True)
+            if next_rows:
+                next_question = question_payload(next_rows)
+            else:
+                next_question = self._get_current_question(quiz)
 
-            if all_questions.count() == len(answered_question_ids):
+            if next_question is None:
                 quiz.status = 'completed'
                 quiz.completed_at = timezone.now()
-                quiz.save()
+                quiz.save(update_fields=['status', 'completed_at'])
 
-                result_serializer = QuizResultSerializer(quiz)
                 return Response({
                     "message": "Викторина завершена",
                     "is_correct": is_correct,
-                    "results": result_serializer.data
+                    "results": quiz_result_payload(quiz)
                 })
-            else:
-                next_question = all_questions.exclude(id__in=answered_question_ids).first()
-                question_serializer = QuestionDetailSerializer(next_question)
 
-                return Response({
-                    "is_correct": is_correct,
-                    "next_question": question_serializer.data
-                })
+            return Response({
+                "is_correct": is_correct,
+                "next_question": next_question
+            })
 
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
+    @action(detail=True, methods=['post'], url_path='answers/batch')
+    def answer_batch(self, request, quiz_id):
+        quiz = get_object_or_404(Quiz.objects.select_related('topic__subject'), id=quiz_id, user=request.user)
+
+        if quiz.status == 'completed':
+            return Response(
+                {"error": "Эта викторина уже завершена"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        serializer = QuizAnswerSerializer(data=request.data, many=True, allow_empty=False)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+        answers = {}
+        for item in serializer.validated_data:
+            answers.setdefault(item['question_id'], item['choice_id'])
+
+        quiz_question_ids = set(quiz.question_ids)
+        choices = {
+            choice_id: (question_id, is_correct)
+            for choice_id, question_id, is_correct in Choice.objects.filter(
+                id__in=answers.values(),
+                question__topic_id=quiz.topic_id
+            ).values_list('id', 'question_id', 'is_correct')
+        }
+
+        errors = [
+            {"question_id": question_id, "choice_id": choice_id}
+            for question_id, choice_id in answers.items()
+            if question_id not in quiz_question_ids or choices.get(choice_id, (None,))[0] != question_id
+        ]
+        if errors:
+            return Response(
+                {"error": "Неверный вопрос или вариант ответа", "invalid": errors},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        with transaction.atomic():
+            UserAnswer.objects.bulk_create([
+                UserAnswer(
+                    quiz=quiz,
+                    question_id=question_id,
+                    selected_choice_id=choice_id,
+                    is_correct=choices[choice_id][1]
+                )
+                for question_id, choice_id in answers.items()
+            ], ignore_conflicts=True)
+
+            answered = dict(UserAnswer.objects.filter(quiz=quiz).values_list('question_id', 'is_correct'))
+
+            # Отвеченные вопросы переносим в начало, чтобы курсор указывал на первый неотвеченный
+            quiz.question_ids = (
+                [question_id for question_id in quiz.question_ids if question_id in answered]
+                + [question_id for question_id in quiz.question_ids if question_id not in answered]
+            )
+            quiz.position = len(answered)
+            quiz.score = sum(answered.values())
+            update_fields = ['question_ids', 'position', 'score']
+            if quiz.current_question_id is None:
+                quiz.status = 'completed'
+                quiz.completed_at = timezone.now()
+                update_fields += ['status', 'completed_at']
+            quiz.save(update_fields=update_fields)
+
+        next_question = None
+        if quiz.status != 'completed':
+            next_question = self._get_current_question(quiz)
+
+        if next_question is None:
+            if quiz.status != 'completed':
+                quiz.status = 'completed'
+                quiz.completed_at = timezone.now()
+                quiz.save(update_fields=['status', 'completed_at'])
+
+            return Response({
+                "message": "Викторина завершена",
+                "results": quiz_result_payload(quiz)
+            })
+
+        return Response({
+            "answered": quiz.position,
+            "score": quiz.score,
+            "next_question": next_question
+        })
+
+    @replica_reads()
     def get(self, request, quiz_id=None):
         user = request.user
 
         if quiz_id:
-            quiz = get_object_or_404(Quiz, id=quiz_id, user=user)
+            quiz = get_object_or_404(
+                Quiz.objects.select_related('topic__subject').prefetch_related(
+                    Prefetch('answers', queryset=UserAnswer.objects.order_by('id'))
+                ),
+                id=quiz_id,
+                user=user
+            )
             serializer = QuizDetailSerializer(quiz)
             return Response(serializer.data)
         else:
-            quizzes = Quiz.objects.filter(user=user)
-            serializer = QuizResultSerializer(quizzes, many=True)
-            return Response(serializer.data)
+            filters_serializer = QuizHistoryFilterSerializer(data=request.query_params)
+            filters_serializer.is_valid(raise_exception=True)
+            history_filters = filters_serializer.validated_data
+
+            quizzes = Quiz.objects.filter(user=user).select_related('topic__subject').order_by('-started_at', '-id')
+            if 'status' in history_filters:
+                quizzes = quizzes.filter(status=history_filters['status'])
+            if 'topic_id' in history_filters:
+                quizzes = quizzes.filter(topic_id=history_filters['topic_id'])
+            if 'date_from' in history_filters:
+                quizzes = quizzes.filter(started_at__gte=history_filters['date_from'])
+            if 'date_to' in history_filters:
+                quizzes = quizzes.filter(started_at__lt=history_filters['date_to'] + timedelta(days=1))
+
+            paginator = CustomKeysetPagination()
+            page = paginator.paginate_queryset(quizzes, request, view=self)
+            serializer = QuizResultSerializer(page, many=True)
+            return paginator.get_paginated_response(serializer.data)
 
 
 